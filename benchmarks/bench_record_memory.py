@@ -0,0 +1,41 @@
+from pathlib import Path
+import argparse
+import gc
+import sys
+import tracemalloc
+
+sys.path.insert(0,str(Path(__file__).resolve().parent.parent))
+from reelRecords_model import ReelRecords_model
+from synthetic_data import make_rows
+
+""" Measure the memory held by a loaded stocktake: the records and the barcode/state indexes.
+    usage: python benchmarks/bench_record_memory.py [--sizes 10000 100000 1000000]
+    The spreadsheet rows are freed before measuring, so only what the records model keeps is counted."""
+
+def measure(size:int)->tuple[int,int]:
+    """ -> (bytes held after loading size reels, extra bytes held after building a report)"""
+    rows = make_rows(size)
+    gc.collect()
+    tracemalloc.start()
+    records = ReelRecords_model()
+    records.set_records(rows,filepath="stock.xlsx")
+    del rows
+    gc.collect()
+    loaded,_ = tracemalloc.get_traced_memory()
+    report = records.get_report()
+    del report
+    gc.collect()
+    after_report,_ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded,after_report - loaded
+
+def main(argv:list[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Records model memory benchmark")
+    parser.add_argument("--sizes",type=int,nargs="+",default=[10000,100000,1000000])
+    args = parser.parse_args(argv)
+    for size in args.sizes:
+        loaded,report_extra = measure(size)
+        print(f"{size:>8} reels  {loaded/1e6:>8.1f} MB  {loaded/size:>6.0f} bytes/reel  +{report_extra/1e6:.1f} MB kept after get_report")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,191 @@
+from pathlib import Path
+from datetime import datetime
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0,str(Path(__file__).resolve().parent.parent))
+from reelRecords_model import ReelRecords_model
+from stocktake_presenter import Stocktake_presenter, VERSION
+from headless import Headless_view, Headless_sound_model, Headless_scanner_model, Temp_file_model
+from synthetic_data import make_rows
+
+""" Scan throughput and latency benchmark. Drives Stocktake_presenter with the headless stand-ins in headless.py on
+    synthetic stocktakes and reports ingest time, per scan latency, report, search and save/load times and peak RSS as json.
+    usage: python benchmarks/bench_scan_throughput.py [--sizes 1000 10000 100000 1000000] [--scans 2000] [-o results.json]
+    Each size runs in its own process so its peak RSS isn't hidden by a bigger size run before it."""
+
+def percentiles(seconds:list[float])->dict:
+    """ p50/p99/max/mean of a list of durations, in microseconds"""
+    ordered = sorted(seconds)
+    def at(fraction):
+        return ordered[min(len(ordered) - 1,int(fraction * len(ordered)))] * 1e6
+    return {"p50_us":round(at(0.50),1),"p99_us":round(at(0.99),1),"max_us":round(ordered[-1] * 1e6,1),
+            "mean_us":round(sum(ordered) / len(ordered) * 1e6,1),"count":len(ordered)}
+
+def timed(func)->float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def peak_rss_mb()->float|None:
+    """ Peak resident set size of this process in MB, None where the resource module isn't available (windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024),1)   # bytes on macOS, KB on linux
+
+def make_scans(rows:list[list],count:int,seed:int=1)->list[str]:
+    """ A scan stream that is mostly known reels scanned for the first time, with some duplicates,
+        reels that aren't in the stocktake and barcodes of the wrong format"""
+    rand = random.Random(seed)
+    unscanned = [row[0] for row in rows]
+    rand.shuffle(unscanned)
+    scans = list()
+    for _ in range(count):
+        kind = rand.random()
+        if kind < 0.10 and scans:
+            scans.append(rand.choice(scans))
+        elif kind < 0.15:
+            scans.append(str(9900000000 + rand.randrange(10**8)))
+        elif kind < 0.20:
+            scans.append(str(rand.randrange(10**6)))
+        elif unscanned:
+            scans.append(unscanned.pop())
+    return scans
+
+def run_size(size:int,scan_count:int,burst:int)->dict:
+    """ Run every measurement on a stocktake of size reels. -> results for this size"""
+    result = {"size":size}
+    rows = make_rows(size)
+
+    records = ReelRecords_model()
+    result["set_records_s"] = round(timed(lambda: records.set_records(rows,filepath="stock.xlsx")),4)
+    del records
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_model = Temp_file_model(Path(tmp))
+        file_model.add_spreadsheet("stock.xlsx",rows)
+        view = Headless_view()
+        presenter = Stocktake_presenter(file_model,ReelRecords_model(),view,Headless_scanner_model(),Headless_sound_model())
+        result["autoload_s"] = round(timed(lambda: presenter.handle_autoload(["stock.xlsx"])),4)
+        presenter.persistence.flush()
+
+        # single scans, as typed in by the scanner
+        scans = make_scans(rows,scan_count)
+        latencies = list()
+        for barcode in scans:
+            start = time.perf_counter()
+            presenter.barcode_scanned(barcode)
+            latencies.append(time.perf_counter() - start)
+        result["barcode_scanned"] = percentiles(latencies)
+        result["barcode_scanned"]["scans_per_s"] = round(len(latencies) / sum(latencies))
+        flush_s = timed(presenter.persistence.flush)
+        result["persistence_flush_after_scans_s"] = round(flush_s,4)
+
+        # bursts, as delivered by the scanner model
+        scans = make_scans(rows,scan_count,seed=2)
+        latencies = list()
+        for i in range(0,len(scans),burst):
+            chunk = scans[i:i + burst]
+            start = time.perf_counter()
+            presenter.barcodes_scanned(chunk)
+            latencies.append((time.perf_counter() - start) / len(chunk))
+        result["barcodes_scanned_per_scan"] = percentiles(latencies)
+        result["barcodes_scanned_per_scan"]["burst"] = burst
+        presenter.persistence.flush()
+
+        result["get_report_s"] = round(min(timed(presenter.records_model.get_report) for _ in range(3)),4)
+
+        # typing a search one box at a time, then a width and weight search
+        sample = rows[len(rows) // 2]
+        searches = [dict(barcode=sample[0][:n]) for n in range(1,len(sample[0]) + 1)]
+        searches += [dict(width=str(sample[1])[:2]),dict(width=str(sample[1]),weight=str(sample[2])[:1]),dict(barcode="  2",weight="2")]
+        latencies = list()
+        for filters in searches:
+            view.set_search_filters(**filters)
+            start = time.perf_counter()
+            presenter.search_by_filter()
+            view.run_pending()      # the debounced search runs from after()
+            latencies.append(time.perf_counter() - start)
+        result["search_by_filter"] = percentiles(latencies)
+        result["exit_search_s"] = round(timed(presenter._exit_search_mode),4)
+
+        # save / load round trips through the file model
+        records = presenter.records_model
+        for name,serialise,save,load in (("compact",records.to_compact_bytes,file_model.save_progress_bytes,file_model.load_progress_bytes),
+                                         ("json",records.to_json_str,file_model.save_progress,file_model.load_progress)):
+            start = time.perf_counter()
+            data = serialise()
+            save("bench_save",data)
+            save_s = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = ReelRecords_model()
+            snapshot = load(str(file_model.full_path_save_dir / "bench_save"))    # saves are named, loads take the full path
+            if name == "compact":
+                loaded.load_from_snapshot(snapshot)
+            else:
+                loaded.load_from_json_str(snapshot)
+            load_s = time.perf_counter() - start
+            result[f"save_{name}_s"] = round(save_s,4)
+            result[f"load_{name}_s"] = round(load_s,4)
+            result[f"save_{name}_bytes"] = len(data)
+            del loaded,snapshot,data
+
+        presenter.persistence.close()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def git_commit()->str|None:
+    try:
+        return subprocess.run(["git","rev-parse","--short","HEAD"],capture_output=True,text=True,
+                              cwd=Path(__file__).resolve().parent,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def main(argv:list[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="ReelStock scan throughput and latency benchmark")
+    parser.add_argument("--sizes",type=int,nargs="+",default=[1000,10000,100000,1000000],help="stocktake sizes in reels")
+    parser.add_argument("--scans",type=int,default=2000,help="scans to time for each size")
+    parser.add_argument("--burst",type=int,default=20,help="scans per barcodes_scanned call when timing bursts")
+    parser.add_argument("-o","--output",help="write the json results to this file as well as printing them")
+    parser.add_argument("--single",type=int,help=argparse.SUPPRESS)     # run one size in this process and print its result
+    args = parser.parse_args(argv)
+
+    if args.single is not None:
+        print(json.dumps(run_size(args.single,args.scans,args.burst)))
+        return
+
+    results = list()
+    for size in args.sizes:
+        completed = subprocess.run([sys.executable,__file__,"--single",str(size),"--scans",str(args.scans),"--burst",str(args.burst)],
+                                   capture_output=True,text=True)
+        if completed.returncode != 0:
+            print(completed.stderr,file=sys.stderr)
+            results.append({"size":size,"error":completed.stderr.strip().splitlines()[-1:]})
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        scan = result["barcode_scanned"]
+        print(f"{size:>8} reels  ingest {result['set_records_s']*1000:>8.1f} ms  scan p50 {scan['p50_us']:>7.1f} us p99 {scan['p99_us']:>8.1f} us"
+              f"  report {result['get_report_s']*1000:>7.1f} ms  search p99 {result['search_by_filter']['p99_us']/1000:>7.1f} ms"
+              f"  peak rss {result['peak_rss_mb']} MB",file=sys.stderr)
+
+    report = {"version":VERSION,"commit":git_commit(),"date":datetime.now().isoformat(timespec="seconds"),
+              "python":platform.python_version(),"platform":platform.platform(),"machine":platform.machine(),
+              "scans":args.scans,"results":results}
+    text = json.dumps(report,indent=2)
+    if args.output:
+        with open(args.output,"w",encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0,str(Path(__file__).resolve().parent.parent))
+from fileAccess_model import FileAccess_model
+from reelRecords_model import ReelRecords_model
+from synthetic_data import make_rows, write_xlsx
+
+""" Compare spreadsheet ingest time and peak memory of the streaming xlsx reader against the pandas reader.
+    usage: python benchmarks/bench_xlsx_ingest.py [--sizes 1000 20000 100000]
+    The pandas reader is skipped if pandas isn't installed."""
+
+def measure(load)->tuple[float,int]:
+    """ Run load() twice and return (seconds, peak bytes allocated by python while it ran)
+        Time and memory are measured in separate runs as tracemalloc slows allocation heavy code down a lot"""
+    start = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    load()
+    _,peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds,peak
+
+def main(argv:list[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Spreadsheet ingest benchmark")
+    parser.add_argument("--sizes",type=int,nargs="+",default=[1000,20000,100000])
+    args = parser.parse_args(argv)
+
+    file_model = FileAccess_model()
+    try:
+        import pandas
+        readers = ["streaming","pandas"]
+    except ImportError:
+        readers = ["streaming"]
+        print("pandas is not installed, only the streaming reader is measured")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = write_xlsx(Path(tmp) / f"stock_{size}.xlsx",make_rows(size))
+            for reader in readers:
+                def load():
+                    records = ReelRecords_model()
+                    if reader == "streaming":
+                        records.set_records(file_model.iter_rows(str(path)),filepath=str(path))
+                    else:
+                        records.set_records(file_model._openXLSL(str(path)),filepath=str(path))
+                seconds,peak = measure(load)
+                print(f"{size:>8} rows  {reader:<10} {seconds*1000:>9.1f} ms  peak {peak/1e6:>7.1f} MB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
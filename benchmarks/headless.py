@@ -0,0 +1,136 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0,str(Path(__file__).resolve().parent.parent))
+from fileAccess_model import FileAccess_model
+
+""" Headless stand-ins for the view, sound, file and scanner models so Stocktake_presenter can be driven without a display,
+    audio device or scanner. They implement the interfaces in stocktake_presenter.py and do as little as possible."""
+
+class Headless_view:
+    """ A view that draws nothing. after() callbacks are queued and run by run_pending(), standing in for the Tk main loop.
+        Search filters are set with set_search_filters. The file dialog returns filepath and every yes/no popup gets answer_yes"""
+    def __init__(self):
+        self._pending:dict[int,object] = dict()
+        self._next_id = 0
+        self.messages:list[str] = list()
+        self.filepath = ""
+        self.answer_yes = False
+        self.barcode_filter = [""] * 10
+        self.width_filter = [""] * 4
+        self.weight_filter = [""] * 4
+
+    def set_search_filters(self,barcode:str="",width:str="",weight:str="")->None:
+        """ Fill the search boxes, one character per box. Spaces leave a box empty"""
+        def boxes(text,count):
+            return [c.strip() for c in text.ljust(count)[:count]]
+        self.barcode_filter = boxes(barcode,10)
+        self.width_filter = boxes(width,4)
+        self.weight_filter = boxes(weight,4)
+
+    def run_pending(self)->None:
+        """ Run the after() callbacks queued so far, in the order they were queued"""
+        pending,self._pending = self._pending,dict()
+        for func in pending.values():
+            func()
+
+    def after(self,ms:int,func)->str:
+        self._next_id += 1
+        self._pending[self._next_id] = func
+        return str(self._next_id)
+    def after_cancel(self,id:str)->None:
+        self._pending.pop(int(id),None)
+    def after_idle(self,func)->str:
+        return self.after(0,func)
+
+    def get_search_filter_barcode(self)->list[str]:
+        return self.barcode_filter
+    def get_search_filter_width(self)->list[str]:
+        return self.width_filter
+    def get_search_filter_weight(self)->list[str]:
+        return self.weight_filter
+    def append_message(self,message:str)->None:
+        self.messages.append(message)
+    def is_voice_enabled(self)->bool:
+        return True
+    def display_popup_yes_no(self,title:str,message:str,detail:str)->bool:
+        return self.answer_yes
+
+    def mode_selection_window(self,presenter)->None: ...
+    def create_ui(self,presenter)->None: ...
+    def mainloop(self)->None: ...
+    def setTitle(self,title:str)->None: ...
+    def display_records(self,rows,found_barcodes=None,unknown_barcodes=None)->None: ...
+    def detach_records(self,barcodes)->None: ...
+    def reattach_records(self,barcodes)->None: ...
+    def unknown_reel_found(self,barcode:str)->None: ...
+    def known_reel_found(self,barcode:str)->None: ...
+    def reels_found(self,known_barcodes,unknown_barcodes,jump_to:str=None)->None: ...
+    def clear_found(self,barcode:str)->None: ...
+    def delete_record(self,barcode:str)->None: ...
+    def display_popup(self,title:str,message:str)->None: ...
+    def jump_to_barcode(self,barcode:str)->None: ...
+    def highlight_barcode(self,barcode:str)->None: ...
+    def show_report(self,found_count,unknown_count,missing_count,columns)->None: ...
+    def fill_report_table(self,table,reels,count)->None:
+        for _ in reels: ...
+    def show_progress(self,counts,progress)->None: ...
+    def set_file_legend(self,fileID)->None: ...
+    def copy_lines_to_clipboard(self,lines)->None: ...
+    def alert_bell(self)->None: ...
+    def close(self)->None: ...
+    def get_filepath(self)->str:
+        return self.filepath
+    def create_filepath(self)->str:
+        return ""
+    def get_export_filepath(self,title:str)->str:
+        return ""
+
+class Headless_sound_model:
+    """ Plays nothing"""
+    def start(self)->None: ...
+    def interrupt(self)->None: ...
+    def play_duplicate_bc(self,wait_time:int=0): ...
+    def play_unknown_bc(self,wait_time:int=0): ...
+    def play_found_bc(self,wait_time:int=0): ...
+    def play_incorrect_bc(self,wait_time:int=0): ...
+    def play_good(self,wait_time:int=0): ...
+    def play_bad(self,wait_time:int=0): ...
+    def play_and(self,wait_time:int=0): ...
+
+class Headless_scanner_model:
+    """ A scanner that never reads anything. Scans are passed straight to the presenter by the benchmark"""
+    def startScanner(self,presenter)->None: ...
+    def stopScanner(self)->None: ...
+    def get_scans(self)->list:
+        return []
+
+class Temp_file_model(FileAccess_model):
+    """ The real file model with its save, log and archive directories moved into directory.
+        Spreadsheets are not read, get_rows returns the rows given to add_spreadsheet for that path"""
+    def __init__(self,directory:Path):
+        directory = Path(directory)
+        self.full_path_save_dir = directory / self.SAVE_DIR
+        self.full_path_log_dir = directory / self.LOG_DIR
+        self.full_path_archive_dir = directory / self.ARCHIVE_DIR
+        for folder in (self.full_path_save_dir,self.full_path_log_dir,self.full_path_archive_dir):
+            folder.mkdir(parents=True,exist_ok=True)
+        super().__init__()
+        self._spreadsheets:dict[str,list[list]] = dict()
+
+    def add_spreadsheet(self,filepath:str,rows:list[list])->None:
+        self._spreadsheets[filepath] = rows
+
+    def get_rows(self,filepath:str)->list[list]:
+        if filepath not in self._spreadsheets:
+            raise FileNotFoundError(filepath)
+        return self._spreadsheets[filepath]
+
+    def get_rows_many(self,filepaths:list[str])->list:
+        results = list()
+        for filepath in filepaths:
+            try:
+                results.append(self.get_rows(filepath))
+            except FileNotFoundError as e:
+                results.append(e)
+        return results
@@ -0,0 +1,56 @@
+from pathlib import Path
+from xml.sax.saxutils import escape
+import random
+import zipfile
+
+""" Synthetic stocktake data in the shape of assets/test_data/big_data.XLSX for the benchmarks"""
+
+HEADER = ["Material","Material Description","Batch width","RSS Supplier Reel ID","Batch","Production Date","Own stock unit","Unrestricted Own Stock(KG)"]
+MATERIALS = [("CWTK185M","Coated White Top Kraft 185 Metsa Board"),("CWTL125A","Coated White Liner 125 Saica"),
+             ("CWTL135A","Coated White Liner 135 Saica"),("CWTL140J","Coated White Liner 140 Jian"),
+             ("CWTL200J","Coated White Liner 200 Jian"),("HP185","HP Kraft 185"),("HP200","HP Kraft 200"),
+             ("WCSS140","Snowlotus 140"),("WCSS200","Snowlotus 200"),("WCSS235","Snowlotus 235"),("WCSS125","Snowlutus 125")]
+WIDTHS = [1750,2100,2200,2300,2500]
+
+def make_rows(count:int,seed:int=0,first_barcode:int=6120000000)->list[list]:
+    """ Return count [barcode, width, weight, material] rows, as FileAccess_model.get_rows would.
+        Barcodes are unique 10 digit strings, rows are grouped by material like a SAP export"""
+    rand = random.Random(seed)
+    rows = list()
+    for i in range(count):
+        material,_ = MATERIALS[(i * len(MATERIALS)) // max(count,1)]
+        rows.append([str(first_barcode + i * 30),rand.choice(WIDTHS),rand.randint(1400,3100),material])
+    return rows
+
+def write_xlsx(path:Path,rows:list[list])->Path:
+    """ Write rows from make_rows to a minimal xlsx file with the same columns as a SAP export"""
+    descriptions = dict(MATERIALS)
+    strings:dict[str,int] = dict()
+    def s(value)->str:
+        index = strings.setdefault(str(value),len(strings))
+        return f'<c t="s"><v>{index}</v></c>'
+    def n(value)->str:
+        return f'<c><v>{value}</v></c>'
+
+    sheet_rows = ["<row>" + "".join(s(h) for h in HEADER) + "</row>"]
+    for barcode,width,weight,material in rows:
+        sheet_rows.append("<row>" + s(material) + s(descriptions.get(material,material)) + s(width) + s(barcode) + s(barcode)
+                          + n(45811) + n(1) + n(weight) + "</row>")
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    with zipfile.ZipFile(path,"w",zipfile.ZIP_DEFLATED) as book:
+        book.writestr("[Content_Types].xml",'<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                      '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/>'
+                      '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                      '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+        book.writestr("_rels/.rels",'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                      '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        book.writestr("xl/workbook.xml",f'<?xml version="1.0" encoding="UTF-8"?><workbook {ns} {rel_ns}><sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        book.writestr("xl/_rels/workbook.xml.rels",'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                      '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+                      '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>')
+        book.writestr("xl/worksheets/sheet1.xml",f'<?xml version="1.0" encoding="UTF-8"?><worksheet {ns}><sheetData>' + "".join(sheet_rows) + "</sheetData></worksheet>")
+        book.writestr("xl/sharedStrings.xml",f'<?xml version="1.0" encoding="UTF-8"?><sst {ns} count="{len(strings)}" uniqueCount="{len(strings)}">'
+                      + "".join(f"<si><t>{escape(string)}</t></si>" for string in strings) + "</sst>")
+    return path
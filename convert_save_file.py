@@ -0,0 +1,34 @@
+from reelRecords_model import ReelRecords_model
+import argparse
+import sys
+
+""" Convert stocktake save files between the json and compact snapshot formats.
+    usage: python convert_save_file.py save_file_2025-10-19_10-00-00 [--json] [-o output_path]
+    By default the save file is converted to the compact format in place."""
+
+def convert(source:str,dest:str,to_json:bool=False)->tuple[int,int]:
+    """ Convert the save file at source and write it to dest
+        -> (size of source in bytes, size of dest in bytes)"""
+    with open(source,"rb") as f:
+        data = f.read()
+    records = ReelRecords_model()
+    records.load_from_snapshot(data)
+    if to_json:
+        out = records.to_json_str().encode("utf-8")
+    else:
+        out = records.to_compact_bytes()
+    with open(dest,"wb") as f:
+        f.write(out)
+    return len(data),len(out)
+
+def main(argv:list[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Convert ReelStock save files between json and the compact snapshot format")
+    parser.add_argument("source",help="save file to convert (json or compact, detected automatically)")
+    parser.add_argument("-o","--output",help="where to write the converted file. Defaults to overwriting source")
+    parser.add_argument("--json",action="store_true",help="convert to json instead of the compact format")
+    args = parser.parse_args(argv)
+    source_size,dest_size = convert(args.source,args.output or args.source,to_json=args.json)
+    print(f"{args.source}: {source_size} bytes -> {dest_size} bytes")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,8 +1,18 @@
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import multiprocessing
 import os, sys
+import time
 from pathlib import Path
+import hashlib
+import marshal
+import posixpath
+import re
 import shutil
+import zipfile
+from xml.etree.ElementTree import iterparse, ParseError
+from xml.parsers import expat
+from scanLog_model import ScanLog_model
 
 """ Put all file i/o functions in here"""
 
@@ -20,6 +30,172 @@ def ensure_dir(p: Path) -> Path:
     return p
 
 
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def _xlsx_first_sheet_path(book:zipfile.ZipFile)->str:
+    """ Path inside the xlsx zip of the first worksheet in the workbook"""
+    rel_id = None
+    with book.open("xl/workbook.xml") as f:
+        for _,elem in iterparse(f):
+            if elem.tag == _MAIN_NS + "sheet":
+                rel_id = elem.get(_REL_NS + "id")
+                break
+    with book.open("xl/_rels/workbook.xml.rels") as f:
+        for _,elem in iterparse(f):
+            if elem.tag == _PKG_REL_NS + "Relationship" and elem.get("Id") == rel_id:
+                target = elem.get("Target")
+                if target.startswith("/"):
+                    return target.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl",target))
+    return "xl/worksheets/sheet1.xml"
+
+def _xlsx_shared_strings(book:zipfile.ZipFile)->list[str]:
+    """ The shared string table of an xlsx file. Rich text strings are joined into plain text"""
+    strings = list()
+    if "xl/sharedStrings.xml" not in book.namelist():
+        return strings
+    with book.open("xl/sharedStrings.xml") as f:
+        for _,elem in iterparse(f):
+            if elem.tag == _MAIN_NS + "si":
+                strings.append("".join(t.text or "" for t in elem.iter(_MAIN_NS + "t")))
+                elem.clear()
+    return strings
+
+def _column_letters(cell_ref:str,column_number:int)->str:
+    """ "AB12" -> "AB". Cells without a reference are named from their 1 based column_number"""
+    if cell_ref:
+        return cell_ref.rstrip("0123456789")
+    letters = ""
+    while column_number:
+        column_number,remainder = divmod(column_number - 1,26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+class _SheetRowReader:
+    """ expat callbacks that turn worksheet xml into rows of the wanted column values.
+        The first row is the header row and is used to work out which column letters are wanted"""
+    ROW = _MAIN_NS[1:] + "row"      # expat names are "namespace}tag" with namespace_separator="}"
+    CELL = _MAIN_NS[1:] + "c"
+    VALUE = _MAIN_NS[1:] + "v"
+    TEXT = _MAIN_NS[1:] + "t"
+
+    def __init__(self,shared_strings:list[str],column_names:list[str]):
+        self.shared_strings = shared_strings
+        self.column_names = column_names
+        self.wanted:dict[str,int] = None    # column letters -> position in the row, None until the header row is read
+        self.header:dict[str,str] = dict()  # column letters -> header name
+        self.rows:list[list] = list()       # completed rows waiting to be yielded
+        self.row_values:list = None
+        self.column_number = 0
+        self.cell_letters = None
+        self.cell_type = None
+        self.cell_text:list[str] = None     # text of the current cell when it is a wanted cell, else None
+        self.collecting = False
+
+    def start(self,name,attrs):
+        if name == self.CELL:
+            self.column_number += 1
+            letters = _column_letters(attrs.get("r"),self.column_number)
+            if self.wanted is None or letters in self.wanted:
+                self.cell_letters = letters
+                self.cell_type = attrs.get("t","n")
+                self.cell_text = []
+        elif name == self.VALUE or name == self.TEXT:
+            self.collecting = self.cell_text is not None
+        elif name == self.ROW:
+            self.row_values = [None] * len(self.column_names)
+            self.column_number = 0
+
+    def data(self,text):
+        if self.collecting:
+            self.cell_text.append(text)
+
+    def end(self,name):
+        if name == self.VALUE or name == self.TEXT:
+            self.collecting = False
+        elif name == self.CELL:
+            if self.cell_text is not None:
+                value = _xlsx_cell_value(self.cell_type,"".join(self.cell_text),self.shared_strings)
+                if self.wanted is None:
+                    self.header[self.cell_letters] = value
+                else:
+                    self.row_values[self.wanted[self.cell_letters]] = value
+                self.cell_text = None
+        elif name == self.ROW:
+            if self.wanted is None:
+                letters_by_name = {value: letters for letters,value in self.header.items()}
+                missing = [column_name for column_name in self.column_names if column_name not in letters_by_name]
+                if missing:
+                    raise ValueError(f"Spreadsheet is missing columns: {missing}")
+                self.wanted = {letters_by_name[column_name]: i for i,column_name in enumerate(self.column_names)}
+            else:
+                self.rows.append(self.row_values)
+
+def iter_xlsx_rows(filepath,column_names:list[str],chunk_size:int=1 << 16):
+    """ Stream the values of the named columns out of the first sheet of an xlsx file, one row at a time.
+        The first row of the sheet holds the column names. Only cells in the wanted columns are decoded,
+        memory use is bounded by the shared string table rather than the size of the sheet.
+        filepath - path to the xlsx file
+        column_names:list[str] - header names of the columns wanted
+        yields a list of cell values (str, or None for an empty cell) in the order of column_names"""
+    try:
+        book = zipfile.ZipFile(filepath)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"{filepath} is not an xlsx file") from e
+    with book:
+        try:
+            shared_strings = _xlsx_shared_strings(book)
+            sheet = book.open(_xlsx_first_sheet_path(book))
+        except (KeyError,ParseError) as e:
+            raise ValueError(f"{filepath} is not a valid xlsx file") from e
+        with sheet:
+            reader = _SheetRowReader(shared_strings,column_names)
+            parser = expat.ParserCreate(namespace_separator="}")
+            parser.StartElementHandler = reader.start
+            parser.EndElementHandler = reader.end
+            parser.CharacterDataHandler = reader.data
+            parser.buffer_text = True
+            while True:
+                chunk = sheet.read(chunk_size)
+                try:
+                    parser.Parse(chunk,not chunk)
+                except expat.ExpatError as e:
+                    raise ValueError(f"{filepath} is not a valid xlsx file") from e
+                yield from reader.rows
+                reader.rows.clear()
+                if not chunk:
+                    break
+
+def _xlsx_cell_value(cell_type:str,text:str,shared_strings:list[str])->str|None:
+    """ Decode the text of a cell to a string. Whole numbers stored as floats ("2300.0") are returned without the decimal"""
+    if not text:
+        return None
+    if cell_type == "s":
+        return shared_strings[int(text)] or None
+    if cell_type == "n" and not text.isdigit():
+        try:
+            number = float(text)
+        except ValueError:
+            return text
+        if number.is_integer():
+            return str(int(number))
+    return text
+
+def _to_int(value)->int:
+    """ Convert a spreadsheet cell value to an int. Raises ValueError for empty cells like int(NaN) did with pandas"""
+    if value is None:
+        raise ValueError("Empty cell where a number was expected")
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+def _get_rows_in_worker(filepath):
+    """ Process pool entry point for FileAccess_model.get_rows_many. Module level so it can be pickled"""
+    return FileAccess_model().get_rows(filepath)
+
 def resource_path(rel):
     """gets correct filepath for assets weather we used pyinstaller onefile or ondfolder"""
     base = getattr(sys, "_MEIPASS", None) or (
@@ -38,16 +214,54 @@ class FileAccess_model:
     full_path_log_dir = ensure_dir(app_dir() / LOG_DIR)
     full_path_archive_dir = ensure_dir(app_dir() / ARCHIVE_DIR)
 
+    JOURNAL_SUFFIX = ".journal"     # scan events since the last snapshot are appended to <save file>.journal
+    TMP_SUFFIX = ".tmp"             # snapshots are written to <save file>.tmp and then renamed over the save file
+
+    CACHE_DIR = "xlsx_cache"        # parsed spreadsheet rows are cached in <save dir>/xlsx_cache
+    CACHE_SUFFIX = ".rows"
+    CACHE_MAX_BYTES = 64 * 1024 * 1024  # least recently used cache files are deleted once the cache is bigger than this
+    CACHE_FORMAT = b"RSRC1" + bytes([marshal.version])   # cache files are marshal dumps, which are only readable by a matching marshal version
+
+    SCAN_LOG_DURABILITY = "interval"    # when the scan log is fsync'd: "event", "count" (every SCAN_LOG_FSYNC_EVERY lines) or "interval"
+    SCAN_LOG_FSYNC_EVERY = 50
+    SCAN_LOG_FSYNC_INTERVAL_MS = 1000
+
+    def __init__(self):
+        self._journal_files = dict()    # journal path -> open append handle, kept open so each event is a single write + fsync
+        self._scan_log = ScanLog_model(self.full_path_log_dir,durability=self.SCAN_LOG_DURABILITY,
+                                       fsync_every=self.SCAN_LOG_FSYNC_EVERY,fsync_interval_ms=self.SCAN_LOG_FSYNC_INTERVAL_MS)
+
+    COLUMN_NAMES = ['Batch', 'Batch width', 'Unrestricted Own Stock(KG)', 'Material']   # spreadsheet columns for barcode, width, weight, material
+
+    def iter_rows(self,filepath):
+        """ Stream [barcode, width, weight, material] rows from an excel spreadsheet without loading the whole sheet.
+            Can be passed straight to ReelRecords_model.set_records.
+            Old style .xls files (not a zip) fall back to the pandas reader when pandas is installed"""
+        if not zipfile.is_zipfile(filepath):
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(filepath)
+            yield from self._openXLSL(filepath)
+            return
+        for barcode,width,weight,material in iter_xlsx_rows(filepath,self.COLUMN_NAMES):
+            if barcode is None: # ignore rows that have no value for the barcode.
+                continue
+            yield [str(barcode),_to_int(width),_to_int(weight),str(material)]
+
     def _openXLSL(self,filepath):
         """ Open an excel spreadsheet file with pandas
+            Only used for formats the streaming reader can't handle, and by the ingest benchmark for comparison.
             filepath:str - path to the excel file that is to be opened
             -> list of rows where each row is a list of column values
             """  
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ValueError(f"{filepath} is not an xlsx file and pandas is not installed to read it") from e
         df = pd.read_excel(filepath)
         rows = list()
         #columns of data we want are labeled 'RSS Supplier Reel ID', 'Batch width', 'Unrestricted Own Stock(KG)', 'Material'  
         #column_indexes = df.columns.get_indexer(['RSS Supplier Reel ID', 'Batch width', 'Unrestricted Own Stock(KG)', 'Material'])
-        column_indexes = df.columns.get_indexer(['Batch', 'Batch width', 'Unrestricted Own Stock(KG)', 'Material'])
+        column_indexes = df.columns.get_indexer(self.COLUMN_NAMES)
 
         for row in df.itertuples(index=False):
             if not pd.isna(row[column_indexes[0]]): # ignore rows that have no value for the barcode.(empty cells return a float NaN)
@@ -56,53 +270,206 @@ class FileAccess_model:
 
     def get_rows(self,filepath):
         """ Get records from an excel spreadsheet
-            returns a list of row data where each row data is a list of column values"""
-        rows = self._openXLSL(filepath)
+            returns a list of row data where each row data is a list of column values
+            Rows are cached on disk keyed by the file's size, modification time and content hash,
+            so re-opening an unchanged spreadsheet doesn't parse it again"""
+        cache_path = self._cache_path(filepath)
+        rows = self._read_cached_rows(cache_path)
+        if rows is None:
+            rows = list(self.iter_rows(filepath))
+            self._write_cached_rows(cache_path,rows)
         return rows
+
+    def get_rows_many(self,filepaths:list[str])->list:
+        """ Get rows from several spreadsheets, parsing them in parallel worker processes.
+            Workers are started with spawn on every platform. Forking (the linux default) copies locks held by the
+            persistence and scanner threads into the child, where they can never be released
+            -> one entry per filepath in the same order: the list of rows, or the exception raised while reading that file"""
+        if len(filepaths) <= 1:
+            results = list()
+            for filepath in filepaths:
+                try:
+                    results.append(self.get_rows(filepath))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        with ProcessPoolExecutor(max_workers=min(len(filepaths),os.cpu_count() or 1),mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_get_rows_in_worker,filepath) for filepath in filepaths]
+            return [future.exception() or future.result() for future in futures]
+
+    def _cache_dir(self)->Path:
+        return ensure_dir(self.full_path_save_dir / self.CACHE_DIR)
+
+    def _cache_path(self,filepath)->Path:
+        """ Cache file path for a spreadsheet: <size>_<mtime>_<content hash>.rows"""
+        stat = os.stat(filepath)    # raises FileNotFoundError for a missing file like the readers do
+        digest = hashlib.blake2b(digest_size=16)
+        with open(filepath,"rb") as f:
+            for block in iter(lambda: f.read(1 << 20),b""):
+                digest.update(block)
+        return self._cache_dir() / f"{stat.st_size}_{stat.st_mtime_ns}_{digest.hexdigest()}{self.CACHE_SUFFIX}"
+
+    def _read_cached_rows(self,cache_path:Path)->list[list]|None:
+        """ Return cached rows or None if there is no usable cache file"""
+        try:
+            with open(cache_path,"rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(self.CACHE_FORMAT):
+            return None
+        try:
+            rows = marshal.loads(data[len(self.CACHE_FORMAT):])
+        except (EOFError,ValueError,TypeError):
+            return None
+        try:
+            os.utime(cache_path)    # mark as recently used for the LRU eviction
+        except OSError:
+            pass                    # the rows were read, refreshing the LRU time is best effort
+        return rows
+
+    def _write_cached_rows(self,cache_path:Path,rows:list[list])->None:
+        """ Store parsed rows in the cache and evict least recently used entries. Caching is best effort, failures are ignored"""
+        try:
+            self._write_atomic(cache_path,self.CACHE_FORMAT + marshal.dumps(rows),"wb")
+            self._evict_cache()
+        except (OSError,ValueError) as e:
+            print(f"Failed to cache spreadsheet rows: {e}")
+
+    def _evict_cache(self)->None:
+        """ Delete least recently used cache files until the cache is no bigger than CACHE_MAX_BYTES"""
+        entries = [(f.stat(),f) for f in self._cache_dir().glob("*" + self.CACHE_SUFFIX)]
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        total = sum(stat.st_size for stat,_ in entries)
+        for stat,f in entries[:-1]:     # always keep the newest entry
+            if total <= self.CACHE_MAX_BYTES:
+                break
+            os.remove(f)
+            total -= stat.st_size
     
     def save_progress(self,filepath,json_records)->None:
-        """ Save the jsong string to the file specified in filepath"""
+        """ Save the jsong string to the file specified in filepath
+            The file is written to a temporary file first and renamed so a crash mid write never leaves a half written save file"""
+        self._write_atomic(filepath,json_records,"w")
+
+    def save_progress_bytes(self,filepath,data:bytes)->None:
+        """ Save a binary (compact format) snapshot to the file specified in filepath"""
+        self._write_atomic(filepath,data,"wb")
+
+    def _write_atomic(self,filepath,data,mode:str)->None:
+        """ Write data to a temporary file in the save directory, fsync it and rename it over filepath"""
         save_path = self.full_path_save_dir / filepath
-        with open(save_path,"w") as f:
-            f.write(json_records)
+        tmp_path = save_path.with_name(save_path.name + self.TMP_SUFFIX)
+        with open(tmp_path,mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path,save_path)
+
+    def _journal_path(self,filepath)->Path:
+        """ Path of the journal that belongs to the save file filepath"""
+        save_path = self.full_path_save_dir / filepath
+        return save_path.with_name(save_path.name + self.JOURNAL_SUFFIX)
+
+    def append_journal(self,filepath,event:str)->None:
+        """ Append a single scan event line to the journal of the save file filepath and fsync it to disk.
+            The file handle is kept open between events so the cost doesn't depend on the size of the stocktake"""
+        self.append_journal_many(filepath,[event])
+
+    def append_journal_many(self,filepath,events:list[str])->None:
+        """ Append several scan event lines to the journal of the save file filepath with a single write and fsync"""
+        journal_path = self._journal_path(filepath)
+        f = self._journal_files.get(journal_path)
+        if f is None:
+            f = open(journal_path,"a",encoding="utf-8")
+            self._journal_files[journal_path] = f
+        f.write("".join(event + "\n" for event in events))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def load_journal(self,filepath)->str:
+        """ Return the journal text for the save file filepath or '' if there is no journal"""
+        journal_path = self._journal_path(filepath)
+        if not journal_path.exists():
+            return ""
+        with open(journal_path,"r",encoding="utf-8") as f:
+            return f.read()
+
+    def clear_journal(self,filepath)->None:
+        """ Remove the journal of the save file filepath. Done once a snapshot containing every journaled event has been saved"""
+        journal_path = self._journal_path(filepath)
+        f = self._journal_files.pop(journal_path,None)
+        if f is not None:
+            f.close()
+        if journal_path.exists():
+            os.remove(journal_path)
+
+    def close_journals(self)->None:
+        """ Close any journal files that are still open"""
+        for f in self._journal_files.values():
+            f.close()
+        self._journal_files = dict()
+
+    def close_files(self)->None:
+        """ Close the journal and scan log files that are kept open between writes. Call before the app exits"""
+        self.close_journals()
+        self._scan_log.close()
+
+    def _get_save_files(self)->list[Path]:
+        """ Return snapshot save files in the save directory. Journals and temporary files are not included"""
+        folder = self.full_path_save_dir
+        if not folder.exists():
+            return []
+        return [f for f in folder.glob("save_file_*") if not f.name.endswith((self.JOURNAL_SUFFIX,self.TMP_SUFFIX))]
             
     def load_progress(self,filepath:str)->str:
         with open(filepath,"r") as f:
             json_string = f.read()
         return json_string
 
-    def log_scanned_barcode(self, barcode: str):
+    def load_progress_bytes(self,filepath:str)->bytes:
+        """ Return the raw contents of a save file. Used when the save file may be in either the json or compact format"""
+        with open(filepath,"rb") as f:
+            return f.read()
+
+    def log_scanned_barcode(self, barcode: str, outcome: str = "found", timestamp: float = None):
         """Append a barcode to a daily log file for emergency recovery."""
         # e.g. logs/2025-09-21.txt
-        filename = self.full_path_log_dir / f'{datetime.now().strftime("%Y-%m-%d")}.txt'
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(barcode + "\n")
+        self.log_scanned_barcodes([(timestamp or time.time(), outcome, barcode)])
+
+    def log_scanned_barcodes(self, entries: list[tuple[float, str, str]]):
+        """Append several (time.time(), outcome, barcode) scans to the daily log file with one write."""
+        self._scan_log.write(entries)
     
     def get_latest_save_path(self) -> str:
         """Return the newest save file path from ./save_files, or '' if none."""
-        folder = self.full_path_save_dir
-        if not folder.exists():
-            return ""
-        files = list(folder.glob("save_file_*"))
+        files = self._get_save_files()
         if not files:
             return ""
         latest = max(files, key=lambda p: p.stat().st_mtime)
         return str(latest)
     
     def delete_file(self,filepath):
+        f = self._journal_files.pop(Path(filepath),None)    # journals are held open, close it first so it can be removed on windows
+        if f is not None:
+            f.close()
         os.remove(filepath)
 
     def get_old_save_paths(self,num_of_files_to_keep:int)->list[str]:
-        """get a list of files paths excluding the num_of_files_to_keep number of most recently modified files"""
-        folder = self.full_path_save_dir
-        if not folder.exists():
-            return ""
-        files = list(folder.glob("save_file_*"))
+        """get a list of files paths excluding the num_of_files_to_keep number of most recently modified files
+            The journals of the old save files are included"""
+        files = self._get_save_files()
         if not files:
             return ""
         files.sort(key=lambda p: p.stat().st_mtime)
-        files = [str(f) for f in files[:-3]]
-        return files
+        old_files = list()
+        for f in files[:-3]:
+            old_files.append(str(f))
+            journal_path = self._journal_path(f.name)
+            if journal_path.exists():
+                old_files.append(str(journal_path))
+        return old_files
     
     def cleanup_save_files(self):
         """Delete all but a reasonable number of save files"""
@@ -113,6 +480,7 @@ class FileAccess_model:
 
     def delete_save_files(self):
         """delete all save files"""
+        self.close_journals()
         folder = self.full_path_save_dir
         files = list(folder.glob("save_file_*"))
         for file in files:
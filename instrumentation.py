@@ -0,0 +1,103 @@
+from __future__ import annotations
+from collections import deque
+from typing import Callable
+import functools
+import threading
+import time
+
+""" Opt-in timing of the hot paths. Turned on by setting REELSTOCK_INSTRUMENT=1 (see main.py).
+    Methods are timed by replacing them on the object with a timing wrapper with instrument(), so when instrumentation
+    is off nothing is wrapped and there is no cost at all."""
+
+class Timing_recorder:
+    """ Keeps the most recent durations of each timed step in a ring buffer and the steps of the last scan.
+
+        A step wrapped with scan=True (the presenter's barcodes_scanned) is a scan. Every step timed on the same thread
+        while a scan is running is part of its breakdown, which is passed to on_scan when the scan finishes."""
+
+    def __init__(self,capacity:int=4096):
+        self.capacity = capacity
+        self._durations:dict[str,deque[float]] = dict()   # step name -> ring buffer of the last capacity durations in seconds
+        self._counts:dict[str,int] = dict()                # step name -> total times the step ran
+        self._lock = threading.Lock()
+        self._scan_thread:int = None
+        self._breakdown:list[tuple[str,float]] = None
+        self.last_breakdown:list[tuple[str,float]] = list()
+        self.on_scan:Callable[[list[tuple[str,float]]],None] = None
+
+    def record(self,name:str,duration:float)->None:
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self.capacity)
+                self._counts[name] = 0
+            durations.append(duration)
+            self._counts[name] += 1
+        if self._breakdown is not None and threading.get_ident() == self._scan_thread:
+            self._breakdown.append((name,duration))
+
+    def wrap(self,name:str,func:Callable,scan:bool=False)->Callable:
+        """ Return func wrapped so each call is timed as the step name"""
+        record = self.record
+        perf_counter = time.perf_counter
+        if scan:
+            @functools.wraps(func)
+            def timed_scan(*args,**kwargs):
+                if self._breakdown is not None:     # nested scan, eg. barcode_scanned calling barcodes_scanned
+                    return func(*args,**kwargs)
+                self._scan_thread = threading.get_ident()
+                self._breakdown = list()
+                start = perf_counter()
+                try:
+                    return func(*args,**kwargs)
+                finally:
+                    duration = perf_counter() - start
+                    breakdown,self._breakdown = self._breakdown,None
+                    record(name,duration)
+                    self.last_breakdown = [(name,duration)] + breakdown
+                    if self.on_scan is not None:
+                        self.on_scan(self.last_breakdown)
+            return timed_scan
+
+        @functools.wraps(func)
+        def timed(*args,**kwargs):
+            start = perf_counter()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                record(name,perf_counter() - start)
+        return timed
+
+    def histogram_text(self)->str:
+        """ A text histogram of the recorded durations of each step, in power of two microsecond buckets"""
+        with self._lock:
+            steps = [(name,sorted(durations),self._counts[name]) for name,durations in self._durations.items()]
+        lines = list()
+        for name,durations,count in sorted(steps):
+            if not durations:
+                continue
+            p50 = durations[len(durations) // 2] * 1e6
+            p99 = durations[min(len(durations) - 1,int(len(durations) * 0.99))] * 1e6
+            lines.append(f"{name}: {count} calls, last {len(durations)}: p50 {p50:.1f} us  p99 {p99:.1f} us  max {durations[-1]*1e6:.1f} us")
+            buckets:dict[int,int] = dict()
+            for duration in durations:
+                bucket = max(0,int(duration * 1e6)).bit_length()    # 0: <1us, 1: 1us, 2: 2-3us, 3: 4-7us ...
+                buckets[bucket] = buckets.get(bucket,0) + 1
+            most = max(buckets.values())
+            for bucket in range(min(buckets),max(buckets) + 1):
+                low = 0 if bucket == 0 else 1 << (bucket - 1)
+                bar = "#" * round(40 * buckets.get(bucket,0) / most)
+                lines.append(f"  {low:>9} us {buckets.get(bucket,0):>7} {bar}")
+        return "\n".join(lines)
+
+def instrument(recorder:Timing_recorder,obj,method_names:list[str],prefix:str,scan:str=None):
+    """ Time the methods method_names of obj by replacing them on obj with wrappers. Missing methods are skipped
+        prefix - step names are "<prefix>.<method name>"
+        scan - name of the method that is a scan, see Timing_recorder
+        -> obj"""
+    for method_name in method_names:
+        method = getattr(obj,method_name,None)
+        if method is None:
+            continue
+        setattr(obj,method_name,recorder.wrap(f"{prefix}.{method_name}",method,scan=method_name == scan))
+    return obj
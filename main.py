@@ -4,20 +4,50 @@ from stocktake_presenter import Stocktake_presenter
 from fileAccess_model import FileAccess_model
 from scanner_z3678_model import Scanner_z3678_model
 from sound_model import Sound_model
+from instrumentation import Timing_recorder, instrument
+import os
 import sys
 from pathlib import Path
+from multiprocessing import freeze_support
+from datetime import datetime
+import atexit
+
+def enable_instrumentation(presenter:Stocktake_presenter)->Timing_recorder:
+    """ Time the hot paths of a scan, show the last scan's breakdown over the window and write a histogram of every step to the log directory on exit"""
+    recorder = Timing_recorder()
+    instrument(recorder,presenter,["barcodes_scanned","search_by_filter","handle_report_btn"],"presenter",scan="barcodes_scanned")
+    instrument(recorder,presenter.records_model,["scan_barcodes","to_json_str","to_compact_bytes","get_report","match_records_filtered","get_match_delta"],"records")
+    instrument(recorder,presenter.view,["reels_found","append_message","display_records","detach_records","reattach_records","jump_to_barcode","highlight_barcode"],"view")
+    instrument(recorder,presenter.persistence,["save_snapshot","append_journal_many","log_scanned_barcodes"],"queue")
+    instrument(recorder,presenter.file_model,["save_progress","save_progress_bytes","append_journal_many","log_scanned_barcodes"],"disk")  # on the persistence thread
+    instrument(recorder,presenter.sound_model,["interrupt","play_good","play_bad","play_found_bc","play_unknown_bc","play_duplicate_bc","play_incorrect_bc","play_and"],"sound")
+    player = presenter.sound_model.player
+    make_backend = player.make_backend
+    player.make_backend = lambda: instrument(recorder,make_backend(),["load","play"],"audio")    # on the sound player thread
+    recorder.on_scan = presenter.view.show_timing_overlay
+
+    def dump():
+        text = recorder.histogram_text()
+        print(text)
+        with open(presenter.file_model.full_path_log_dir / f'timings_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.txt',"w",encoding="utf-8") as f:
+            f.write(text + "\n")
+    atexit.register(dump)
+    return recorder
 
 def main() -> None:
     sound_model = Sound_model()
     reelRecords_model = ReelRecords_model()
     fileAccess_model = FileAccess_model()
     tk_view = Tk_view(test_scan_enabled=False)
-    scanner_z3768_model = Scanner_z3678_model()
+    scanner_z3768_model = Scanner_z3678_model(device=os.environ.get("REELSTOCK_SCANNER")) # eg. /dev/ttyACM0. Unset: scans are typed into the window
     stocktake_presenter = Stocktake_presenter(fileAccess_model,reelRecords_model,tk_view,scanner_z3768_model,sound_model)
     file_paths = [str(Path(p)) for p in sys.argv[1:]] # get file paths for files dragged and dropped onto exed
     stocktake_presenter.set_file_paths(file_paths)
+    if os.environ.get("REELSTOCK_INSTRUMENT") == "1":
+        enable_instrumentation(stocktake_presenter)
   
     stocktake_presenter.run()
 
 if __name__ == "__main__":
+    freeze_support()    # spreadsheets are parsed in worker processes, needed for the pyinstaller exe on windows
     main()
\ No newline at end of file
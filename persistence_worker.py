@@ -0,0 +1,154 @@
+from __future__ import annotations
+from collections import deque
+from typing import Protocol
+import threading
+import time
+
+""" Runs save file, journal and log writes on a background thread so scan handling on the Tk thread never waits on the disk"""
+
+class File_model(Protocol):
+    """ The file model functions used by the persistence worker"""
+    def save_progress(self,filepath:str,json_records:str)->None:
+        ...
+    def save_progress_bytes(self,filepath:str,data:bytes)->None:
+        ...
+    def clear_journal(self,filepath:str)->None:
+        ...
+    def append_journal_many(self,filepath:str,events:list[str])->None:
+        ...
+    def log_scanned_barcodes(self,entries:list[tuple[float,str,str]])->None:
+        ...
+    def get_old_save_paths(self,num_of_files_to_keep:int)->list[str]:
+        ...
+    def delete_file(self,filepath)->None:
+        ...
+    def close_files(self)->None:
+        ...
+
+class Persistence_worker:
+    """ A single background thread that performs file writes in the order they were requested.
+
+        - consecutive snapshot requests for the same save file are coalesced, only the newest is written
+        - consecutive journal events for the same save file are written with a single write + fsync
+        - consecutive log barcodes are appended to the daily log with a single open/write
+        Errors are collected and can be fetched with get_errors() from the Tk thread (eg. polled with after())"""
+
+    MAX_QUEUED = 10000      # put() blocks if the disk falls this far behind
+    MAX_BATCH = 500         # most journal events / log lines written in one go
+
+    def __init__(self,file_model:File_model):
+        self.file_model = file_model
+        self._queue:deque[tuple] = deque()
+        self._condition = threading.Condition()
+        self._unfinished = 0        # queued + in progress tasks, flush() waits for this to reach 0
+        self._errors:list[str] = list()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run,name="persistence_worker",daemon=True)
+        self._thread.start()
+
+    """ Requests, called from the Tk thread"""
+    def save_snapshot(self,filepath:str,data:bytes|str)->None:
+        """ Write a snapshot to filepath and then clear the journal of filepath (the snapshot holds every journaled event)
+            data - bytes for a compact snapshot, str for json"""
+        with self._condition:
+            if self._queue and self._queue[-1][0] == "snapshot" and self._queue[-1][1] == filepath:
+                self._queue[-1] = ("snapshot",filepath,data)    # not started yet, the newer snapshot replaces it
+                return
+        self._put(("snapshot",filepath,data))
+
+    def append_journal(self,filepath:str,event:str)->None:
+        self._put(("journal",filepath,[event]))
+
+    def append_journal_many(self,filepath:str,events:list[str])->None:
+        """ Append several events to the journal as one request"""
+        self._put(("journal",filepath,list(events)))
+
+    def log_scanned_barcode(self,barcode:str,outcome:str,timestamp:float=None)->None:
+        """ Log a scan to the daily scan log
+            timestamp - time.time() of the scan. Defaults to now, not when the line is written"""
+        self._put(("log",None,[(timestamp or time.time(),outcome,barcode)]))
+
+    def log_scanned_barcodes(self,entries:list[tuple[float,str,str]])->None:
+        """ Log several (time.time(), outcome, barcode) scans as one request"""
+        self._put(("log",None,list(entries)))
+
+    def delete_old_saves(self,num_of_files_to_keep:int)->None:
+        self._put(("cleanup",None,num_of_files_to_keep))
+
+    def flush(self,timeout:float=None)->bool:
+        """ Wait until every request so far has been written. -> False if the timeout expired first"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._unfinished == 0,timeout)
+
+    def close(self,timeout:float=None)->None:
+        """ Write everything still queued, close the files the file model keeps open and stop the worker thread"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def get_errors(self)->list[str]:
+        """ Return and forget the errors that have happened since the last call"""
+        with self._condition:
+            errors,self._errors = self._errors,list()
+        return errors
+
+    def _put(self,task:tuple)->None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Persistence worker has been closed")
+            self._condition.wait_for(lambda: len(self._queue) < self.MAX_QUEUED)
+            self._queue.append(task)
+            self._unfinished += 1
+            self._condition.notify_all()
+
+    """ Worker thread"""
+    def _take_batch(self)->list[tuple]|None:
+        """ Wait for work and take the next task plus any directly following tasks it can be batched with"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return None
+            batch = [self._queue.popleft()]
+            kind,filepath,_ = batch[0]
+            if kind in ("journal","log"):
+                while self._queue and len(batch) < self.MAX_BATCH and self._queue[0][0] == kind and self._queue[0][1] == filepath:
+                    batch.append(self._queue.popleft())
+            self._condition.notify_all()    # wake any put() waiting for space
+            return batch
+
+    def _run(self)->None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                try:
+                    self.file_model.close_files()
+                except Exception as e:
+                    print(f"Failed to close files: {e}")
+                return
+            try:
+                self._write(batch)
+            except Exception as e:
+                with self._condition:
+                    self._errors.append(f"Failed to write {batch[0][0]} {batch[0][1] or ''}: {e}")
+            finally:
+                with self._condition:
+                    self._unfinished -= len(batch)
+                    self._condition.notify_all()
+
+    def _write(self,batch:list[tuple])->None:
+        kind,filepath,payload = batch[0]
+        if kind == "snapshot":
+            if isinstance(payload,bytes):
+                self.file_model.save_progress_bytes(filepath,payload)
+            else:
+                self.file_model.save_progress(filepath,payload)
+            self.file_model.clear_journal(filepath)
+        elif kind == "journal":
+            self.file_model.append_journal_many(filepath,[event for task in batch for event in task[2]])
+        elif kind == "log":
+            self.file_model.log_scanned_barcodes([entry for task in batch for entry in task[2]])
+        elif kind == "cleanup":
+            for f in self.file_model.get_old_save_paths(num_of_files_to_keep=payload):
+                self.file_model.delete_file(f)
@@ -0,0 +1,66 @@
+from fileAccess_model import FileAccess_model
+from reelRecords_model import ReelRecords_model
+from scanLog_model import read_scan_log
+from errors import DuplicateBarcodeError
+from datetime import datetime
+import argparse
+import sys
+
+""" Rebuild a stocktake save file from the daily scan logs, for when the save files have been lost.
+    usage: python rebuild_from_scan_log.py logs/2025-10-19.txt logs/2025-10-20.txt --xlsx export.xlsx [-o output_path]
+    The spreadsheets exported from sap are loaded first (in the order given, as when they were dragged onto the exe)
+    and then every scan in the logs is replayed on top of them in order."""
+
+def replay_scan_log(records:ReelRecords_model,entries:list[tuple[str,str,str]])->int:
+    """ Replay scan log entries from read_scan_log on top of records
+        -> number of entries replayed"""
+    for _,outcome,barcode in entries:
+        if outcome == "unfound":
+            if records.barcode_exists(barcode):
+                records.mark_as_not_found(barcode)
+        elif outcome == "deleted":
+            records.delete_record(barcode)
+        else:   # a scan. Duplicate scans are replayed too, they are harmless and the reel may have been cleared since
+            if not records.barcode_exists(barcode):
+                records.insert_unknown_reel(barcode)
+            records.mark_as_found(barcode)
+    return len(entries)
+
+def rebuild(log_paths:list[str],xlsx_paths:list[str],file_model:FileAccess_model=None)->ReelRecords_model:
+    """ Load the spreadsheets and replay the scan logs, returning the rebuilt records"""
+    file_model = file_model or FileAccess_model()
+    records = ReelRecords_model()
+    sources = list()
+    for path,result in zip(xlsx_paths,file_model.get_rows_many(xlsx_paths)):
+        if isinstance(result,Exception):
+            raise result
+        sources.append((result,path))
+    try:
+        records.set_records_many(sources)
+    except DuplicateBarcodeError as e:
+        print(f"Reels with duplicate barcodes were not inserted: {e}")
+    for log_path in log_paths:
+        replayed = replay_scan_log(records,read_scan_log(log_path))
+        print(f"{log_path}: replayed {replayed} scans")
+    return records
+
+def main(argv:list[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild a ReelStock save file from the daily scan logs")
+    parser.add_argument("logs",nargs="+",help="scan log files to replay, oldest first")
+    parser.add_argument("--xlsx",action="append",default=[],help="spreadsheet exported from sap the stocktake was started with. Repeat for each file")
+    parser.add_argument("-o","--output",help="where to write the rebuilt save file, relative to the save directory. Defaults to a new save file")
+    parser.add_argument("--json",action="store_true",help="write json instead of the compact format")
+    args = parser.parse_args(argv)
+
+    file_model = FileAccess_model()
+    records = rebuild(args.logs,args.xlsx,file_model)
+    output = args.output or "save_file_"+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    if args.json:
+        file_model.save_progress(output,records.to_json_str())
+    else:
+        file_model.save_progress_bytes(output,records.to_compact_bytes())
+    report = records.get_report()
+    print(f"Wrote {output}: {report['found_count']} found, {report['unknown_count']} unknown, {report['missing_count']} missing")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,24 +1,62 @@
 
 from __future__ import annotations
+from typing import Iterator
 from enum import Enum
 import random 
 from errors import DuplicateBarcodeError
 import json
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from operator import attrgetter
+import struct
+import sys
+import zlib
         
+_shared_values:dict = {}    # int weight/width -> one shared int object, so a million reels don't each hold their own copy of the same number
+
+def _shared(value):
+    """ Return a shared copy of an int value, or any other value unchanged"""
+    if type(value) is int:
+        return _shared_values.setdefault(value,value)
+    return value
+
+def _none_last(value)->tuple:
+    """ Sort key that puts None after every other value, eg. unknown reels have no material or width"""
+    return (value is None, 0 if value is None else value)
+
 class ReelRecord:
-    """ dataclass to hold information about a reel of paper"""
+    """ dataclass to hold information about a reel of paper
+        Records are kept compact as there can be a million of them: __slots__ instead of a per record __dict__,
+        material strings are interned, weight/width ints are shared and the found/unknown flags are bits of one int"""
     data_names = ["Barcode","Weight","Width","Material"]
+    __slots__ = ("barcode","weight","width","material","fileID","_flags")
+    _FOUND = 1
+    _UNKNOWN = 2
     def __init__(self,barcode,weight=None,width=None,material=None,fileID=None):
         #stock data obtained from csv file
         self.barcode:str = barcode
-        self.weight:float = weight
-        self.width:int = width
-        self.material:int = material
+        self.weight:float = _shared(weight)
+        self.width:int = _shared(width)
+        self.material:int = sys.intern(material) if type(material) is str else material
         self.fileID:int = fileID
 
         #stocktake data added by performing a stocktake
-        self.found = False          #record has been found during a stocktake
-        self.unknownRecord=False    #record is for a reel that was discovered during stocktake (not in the database that was loaded to check stock against)
+        self._flags = 0     # found / unknownRecord bits
+    @property
+    def found(self)->bool:
+        """ record has been found during a stocktake"""
+        return bool(self._flags & ReelRecord._FOUND)
+    @found.setter
+    def found(self,value:bool):
+        self._flags = (self._flags | ReelRecord._FOUND) if value else (self._flags & ~ReelRecord._FOUND)
+    @property
+    def unknownRecord(self)->bool:
+        """ record is for a reel that was discovered during stocktake (not in the database that was loaded to check stock against)"""
+        return bool(self._flags & ReelRecord._UNKNOWN)
+    @unknownRecord.setter
+    def unknownRecord(self,value:bool):
+        self._flags = (self._flags | ReelRecord._UNKNOWN) if value else (self._flags & ~ReelRecord._UNKNOWN)
     def __eq__(self,other):
         return isinstance(other,ReelRecord) and self.barcode == other.barcode
     def __repr__(self):
@@ -36,7 +74,7 @@ class ReelRecord:
         return {"barcode": self.barcode,"weight":self.weight,"width":self.width,"material":self.material,"found":self.found,"unknownRecord":self.unknownRecord,"fileID":self.fileID}
     def get_reel_data(self)->dict:
         """ Return a dictionary of record reel data only."""
-        return {k: self.__dict__[k] for k in ("barcode", "weight", "width", "material","fileID")}
+        return {"barcode":self.barcode,"weight":self.weight,"width":self.width,"material":self.material,"fileID":self.fileID}
     
     def record_from_dict(aDict:dict):
         """ Create a record from a dictionary
@@ -46,35 +84,410 @@ class ReelRecord:
         record.unknownRecord = aDict["unknownRecord"]
         return record
     
+class _PositionIndex:
+    """ Index of the characters at each position of a field's string, used for incomplete barcode/width/weight searches.
+        (position, character) maps to a bitset (python int) with a bit set for every record id that has that
+        character at that position. A search is then just an AND of one bitset per filled in filter position."""
+    def __init__(self):
+        self.positions:list[dict[str,int]] = list()
+
+    def build(self,strings:list[str]):
+        """ Build the index a position at a time. strings[i] is the field string of record id i.
+            The strings are padded to one length and joined, so the characters at a position are a slice of the joined string.
+            Each character's bitset is that slice, last record first, translated to "0"/"1" digits and read as a binary int"""
+        length = max(map(len,strings),default=0)
+        joined = "".join(map(str.ljust,strings,repeat(length),repeat("\0")))
+        if not joined.isascii():
+            self._build_per_record(strings)
+            return
+        joined = joined.encode("ascii")[::-1]
+        self.positions = list()
+        for position in range(length):
+            column = joined[length - 1 - position::length]     # characters at position, last record first
+            bitsets = dict()
+            for character in set(column) - {0}:
+                digits = bytearray(b"0" * 256)
+                digits[character] = ord("1")
+                bitsets[chr(character)] = int(b"0" + column.translate(digits),2)
+            self.positions.append(bitsets)
+
+    def _build_per_record(self,strings:list[str]):
+        """ Build the index a record at a time, for strings build() can't slice up as ascii"""
+        byte_count = (len(strings) + 7) // 8
+        bitmaps:list[dict[str,bytearray]] = list()
+        for record_id,a_string in enumerate(strings):
+            byte_index, bit = record_id >> 3, 1 << (record_id & 7)
+            for position,character in enumerate(a_string):
+                if position == len(bitmaps):
+                    bitmaps.append(dict())
+                bitmap = bitmaps[position].get(character)
+                if bitmap is None:
+                    bitmap = bitmaps[position][character] = bytearray(byte_count)
+                bitmap[byte_index] |= bit
+        self.positions = [{character: int.from_bytes(bitmap,"little") for character,bitmap in position.items()} for position in bitmaps]
+
+    def add(self,record_id:int,a_string:str):
+        for position,character in enumerate(a_string):
+            if position == len(self.positions):
+                self.positions.append(dict())
+            self.positions[position][character] = self.positions[position].get(character,0) | (1 << record_id)
+
+    def match(self,filter:list[str],candidates:int)->int:
+        """ Narrow the candidates bitset down to records matching every non empty position of the filter"""
+        for position,character in enumerate(filter):
+            if not character:
+                continue
+            if position >= len(self.positions):
+                return 0
+            candidates &= self.positions[position].get(character,0)
+            if not candidates:
+                return 0
+        return candidates
+
+_BIT_SELECTORS = bytes.maketrans(b"01",b"\x00\x01")    # binary digits -> compress() selectors
+
+def bitset_select(items:list,bitset:int)->Iterator:
+    """ Iterate the items at the positions of the set bits of a bitset (python int), in ascending order.
+        The bitset's binary digits, lowest first, are the compress() selectors so the items are picked in C, not a python loop"""
+    return compress(items,bin(bitset)[:1:-1].encode("ascii").translate(_BIT_SELECTORS))
+
 class ReelRecords_model:
 
     """ A collection of ReelRecord's providing functions to manipulate those records"""
+    JOURNAL_EVENTS = ("found","unfound","unknown","deleted")     # scan events that can be written to the scan journal
+
+    #Compact snapshot format:
+    #   SNAPSHOT_MAGIC, uint8 version, then a zlib compressed body of length prefixed (uint32 little endian) sections:
+    #   json meta {count, fileID, materials} | barcodes joined by \x00 | material index (int32) | weight (int64) | width (int64)
+    #   | fileID (int32) | found bitset | unknown bitset
+    #   Integer columns are little endian. Missing values (eg. unknown reels have no weight) are stored as the column's NULL value
+    SNAPSHOT_MAGIC = b"RSTK"
+    SNAPSHOT_VERSION = 1
+    _NULL_INT32 = -1
+    _NULL_INT64 = -2**63
+    _FOUND_DIGITS = bytes(b"01"[bool(flags & ReelRecord._FOUND)] for flags in range(256))      # ReelRecord._flags -> b"0"/b"1"
+    _UNKNOWN_DIGITS = bytes(b"01"[bool(flags & ReelRecord._UNKNOWN)] for flags in range(256))
+    PROGRESS_FIELDS = ("material","width","fileID")     # record fields get_progress() counts found/total reels by
+    REPORT_COLUMNS = ("barcode","weight","width","material","fileID")   # keys of ReelRecord.get_reel_data, the columns of the report tables
+    REPORT_TABLES = ("missing","unknown")               # reel lists shown in the report window
+    EXPORT_TABLES = ("missing","unknown","found")       # reel lists get_report_reels can return
     def __init__(self):
-        self.records:list[ReelRecord] = [] 
+        self._records:dict[str,ReelRecord] = {}     # barcode -> record, in record order. A dict so lookups and deletes don't walk the records
         self.fileID:dict[int,str] = {}   # Map filename where data was loaded from to an id number. id is stored in each reelRecord so we can determine where it came from 
 
+        #Indexes kept in step with self._records so per scan lookups don't have to walk the whole list
+        self._found_barcodes:set[str] = set()           # barcodes of every record marked as found
+        self._unknown_barcodes:set[str] = set()         # barcodes of records that were not in the loaded stocktake data
+        self._found_known_barcodes:set[str] = set()     # barcodes of records from the stocktake data that have been found
+
+        #Report aggregates. Kept in record order so the report lists don't have to walk the whole list. A record that is
+        #re-added out of order (marked not found again, or found after other records were appended) or a sort marks the
+        #order stale and the next report restores it in one pass
+        self._missing_records:dict[str,ReelRecord] = {}         # barcode -> record, for every record not marked as found
+        self._found_unknown_records:dict[str,ReelRecord] = {}   # barcode -> record, for unknown records marked as found
+        self._report_order_stale = False
+        self._progress_totals:dict[str,Counter] = {field:Counter() for field in self.PROGRESS_FIELDS}  # field -> value -> known records with that value
+        self._progress_found:dict[str,Counter] = {field:Counter() for field in self.PROGRESS_FIELDS}   # field -> value -> of those, how many are found
+
+        #Records grouped by (material, width) for grouped display. Built by the first getGroups/get_group_counts call and then kept up to date
+        self._groups:dict[tuple,dict[str,ReelRecord]] = None    # (material, width) -> barcode -> record of the group in record order (None when not built)
+        self._group_found:Counter = None                    # (material, width) -> found records in the group
+        self._group_keys:list[tuple] = None                 # group keys in display order, None when a group has been added or removed
+
+        #Positional search index for get_records_filtered. Built when records are loaded and then kept up to date
+        self._search_ids:dict[str,int] = None           # barcode -> search record id (None when the index hasn't been built)
+        self._search_barcodes:list[str] = None          # search record id -> barcode. Ids follow record order, deleted records leave None
+        self._search_all = 0                            # bitset of every live search record id
+        self._search_indexes:dict[str,_PositionIndex] = None  # "barcode"/"width"/"weight" -> index of that field
+
+    @property
+    def records(self)->list[ReelRecord]:
+        """ Every record, in record order"""
+        return list(self._records.values())
+
     def clear_records(self):
         """ Clear all records"""
         self.__init__()
 
     def to_json_str(self)->str:
         """ Convert my reelRecords to a json sting. Convenient for saving state as a json file"""
-        return json.dumps({"reelData":[r.to_dict() for r in self.records],"fileID":self.fileID},indent=2)     
+        return json.dumps({"reelData":[r.to_dict() for r in self._records.values()],"fileID":self.fileID},indent=2)     
+
+    def to_compact_bytes(self)->bytes:
+        """ Convert my reelRecords to the compact columnar snapshot format. Roughly a tenth the size of to_json_str()"""
+        records = list(self._records.values())
+        materials:dict[str,int] = dict()    # dictionary encoding of material strings
+        NULL_INT32,NULL_INT64 = self._NULL_INT32,self._NULL_INT64
+        material_idx = array("i",[NULL_INT32 if r.material is None else materials.setdefault(r.material,len(materials)) for r in records])
+        weights = array("q",[NULL_INT64 if r.weight is None else int(r.weight) for r in records])
+        widths = array("q",[NULL_INT64 if r.width is None else int(r.width) for r in records])
+        fileIDs = array("i",[NULL_INT32 if r.fileID is None else int(r.fileID) for r in records])
+        # found/unknown bitsets from the record flag bits: one "0"/"1" digit per record, last record first, read as a binary int
+        flags = bytes(r._flags for r in records)[::-1]
+        bitset_bytes = (len(records) + 7) // 8
+        found = int(b"0" + flags.translate(self._FOUND_DIGITS),2).to_bytes(bitset_bytes,"little")
+        unknown = int(b"0" + flags.translate(self._UNKNOWN_DIGITS),2).to_bytes(bitset_bytes,"little")
+
+        for column in (material_idx,weights,widths,fileIDs):
+            if sys.byteorder == "big":
+                column.byteswap()
+        meta = {"count":len(records),"fileID":self.fileID,"materials":list(materials)}
+        sections = [json.dumps(meta).encode("utf-8"),
+                    "\x00".join(r.barcode for r in records).encode("utf-8"),
+                    material_idx.tobytes(),weights.tobytes(),widths.tobytes(),fileIDs.tobytes(),
+                    bytes(found),bytes(unknown)]
+        body = b"".join(struct.pack("<I",len(section)) + section for section in sections)
+        return self.SNAPSHOT_MAGIC + struct.pack("<B",self.SNAPSHOT_VERSION) + zlib.compress(body)
+
+    def load_from_compact_bytes(self,data:bytes):
+        """ Convert a compact snapshot (see to_compact_bytes) into a reelrecords object
+            Raises ValueError if the snapshot is truncated or corrupt, without changing the records already loaded"""
+        if data[:len(self.SNAPSHOT_MAGIC)] != self.SNAPSHOT_MAGIC:
+            raise ValueError("Not a compact ReelStock snapshot")
+        try:
+            records,fileID = self._decode_compact_bytes(data)
+        except (zlib.error,struct.error,IndexError,KeyError,TypeError) as e:
+            raise ValueError(f"Compact snapshot is truncated or corrupt: {e}") from e
+        self._rebuild_index(records)
+        self.fileID = fileID
+
+    def _decode_compact_bytes(self,data:bytes)->tuple[list[ReelRecord],dict[int,str]]:
+        """ Decode a compact snapshot -> (records, fileID)"""
+        version = data[len(self.SNAPSHOT_MAGIC)]
+        if version != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported compact snapshot version: {version}")
+        body = zlib.decompress(data[len(self.SNAPSHOT_MAGIC) + 1:])
+
+        sections = list()
+        offset = 0
+        while offset < len(body):
+            (length,) = struct.unpack_from("<I",body,offset)
+            offset += 4
+            if offset + length > len(body):
+                raise ValueError("Compact snapshot is truncated")
+            sections.append(body[offset:offset + length])
+            offset += length
+        if len(sections) != 8:
+            raise ValueError(f"Compact snapshot has {len(sections)} sections, expected 8")
+        meta_bytes,barcode_bytes,material_bytes,weight_bytes,width_bytes,fileID_bytes,found,unknown = sections
+
+        meta = json.loads(meta_bytes)
+        count = meta["count"]
+        materials = meta["materials"]
+        barcodes = barcode_bytes.decode("utf-8").split("\x00") if count else []
+        columns = [array("i",material_bytes),array("q",weight_bytes),array("q",width_bytes),array("i",fileID_bytes)]
+        if len(barcodes) != count or any(len(column) != count for column in columns) or min(len(found),len(unknown)) < (count + 7) // 8:
+            raise ValueError("Compact snapshot columns don't match its record count")
+        for column in columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+        material_idx,weights,widths,fileIDs = columns
+
+        records = list()
+        for i in range(count):
+            record = ReelRecord(barcodes[i],
+                                None if weights[i] == self._NULL_INT64 else weights[i],
+                                None if widths[i] == self._NULL_INT64 else widths[i],
+                                None if material_idx[i] == self._NULL_INT32 else materials[material_idx[i]],
+                                None if fileIDs[i] == self._NULL_INT32 else fileIDs[i])
+            record.found = bool(found[i >> 3] & (1 << (i & 7)))
+            record.unknownRecord = bool(unknown[i >> 3] & (1 << (i & 7)))
+            records.append(record)
+        return records,{int(k): v for k,v in meta["fileID"].items()}
+
+    def load_from_snapshot(self,data:bytes):
+        """ Load a save file snapshot, detecting whether it is in the compact format or json
+            data:bytes - raw contents of the save file"""
+        if data[:len(self.SNAPSHOT_MAGIC)] == self.SNAPSHOT_MAGIC:
+            self.load_from_compact_bytes(data)
+        else:
+            self.load_from_json_str(data.decode("utf-8"))
 
     def load_from_json_str(self,json_string:str):
         """ Convert a json string into a reelrecords object"""
         dictRecords = json.loads(json_string) 
-        self.records = list()
+        records = list()
         for dictRecord in dictRecords["reelData"]:
             record = ReelRecord.record_from_dict(dictRecord)
-            self.records.append(record)
+            records.append(record)
+        self._rebuild_index(records)
         fileID_str_keys:dict[str,str] = dictRecords["fileID"]
         self.fileID:dict[int:str] = {int(k): v for k,v in fileID_str_keys.items()}  #have to restore int-ness of keys as json objects only allow string keys.
             
+    def to_journal_str(self,event:str,barcode:str)->str:
+        """ Convert a single scan event to a one line json string for appending to the scan journal
+            event:str - one of JOURNAL_EVENTS
+            barcode:str - barcode of the record the event happened to"""
+        if event not in self.JOURNAL_EVENTS:
+            raise ValueError(f"Unknown journal event: {event}")
+        return json.dumps({"event":event,"barcode":barcode})
+
+    def apply_journal_str(self,journal_string:str)->int:
+        """ Replay the scan events of a journal on top of the currently loaded records.
+            Replaying is idempotent so a journal that overlaps the snapshot it belongs to is harmless.
+            A partially written last line (power lost mid write) is ignored.
+            -> number of events applied"""
+        applied = 0
+        for line in journal_string.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            event, barcode = entry.get("event"), entry.get("barcode")
+            if event == "unknown":
+                if not self.barcode_exists(barcode):
+                    self.insert_unknown_reel(barcode)
+            elif event == "found":
+                self.mark_as_found(barcode)
+            elif event == "unfound":
+                if self.barcode_exists(barcode):
+                    self.mark_as_not_found(barcode)
+            elif event == "deleted":
+                self.delete_record(barcode)
+            else:
+                continue
+            applied += 1
+        return applied
+
+    def _rebuild_index(self,records:list[ReelRecord]):
+        """ Replace every record with records, rebuilding the found/unknown sets and report aggregates from them.
+            Used when the records are replaced wholesale (eg. loading a save file)"""
+        self._records = dict()
+        self._found_barcodes = set()
+        self._unknown_barcodes = set()
+        self._found_known_barcodes = set()
+        self._missing_records = dict()
+        self._found_unknown_records = dict()
+        self._report_order_stale = False
+        self._progress_totals = {field:Counter() for field in self.PROGRESS_FIELDS}
+        self._progress_found = {field:Counter() for field in self.PROGRESS_FIELDS}
+        self._groups = None         # groups are rebuilt on the next getGroups
+        self._search_ids = None
+        for record in records:
+            self._index_record(record,count_progress=False)
+        self._count_progress_many(records)
+        self._build_search_index()
+
+    def _index_record(self,record:ReelRecord,count_progress:bool=True):
+        """ Add a record to the end of the records, the found/unknown sets and the report and progress counts
+            count_progress - False when the caller adds a batch of records to the progress counts itself with _count_progress_many"""
+        self._records[record.barcode] = record
+        if record.unknownRecord:
+            self._unknown_barcodes.add(record.barcode)
+        if record.found:
+            self._found_barcodes.add(record.barcode)
+            if not record.unknownRecord:
+                self._found_known_barcodes.add(record.barcode)
+            else:
+                self._found_unknown_records[record.barcode] = record
+        else:
+            self._missing_records[record.barcode] = record
+        if count_progress and not record.unknownRecord:
+            for field,totals in self._progress_totals.items():
+                totals[getattr(record,field)] += 1
+            if record.found:
+                self._count_progress(record,1)
+        if self._groups is not None:
+            key = (record.material,record.width)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = dict()
+                self._group_keys = None
+            group[record.barcode] = record
+            if record.found:
+                self._group_found[key] += 1
+        if self._search_ids is not None:
+            record_id = len(self._search_barcodes)
+            self._search_ids[record.barcode] = record_id
+            self._search_barcodes.append(record.barcode)
+            self._search_all |= 1 << record_id
+            for field,a_string in self._search_strings(record).items():
+                self._search_indexes[field].add(record_id,a_string)
+
+    def _unindex_record(self,record:ReelRecord):
+        """ Remove a record from the records, the found/unknown sets and the report and progress counts"""
+        if self._search_ids is not None:
+            record_id = self._search_ids.pop(record.barcode)
+            self._search_barcodes[record_id] = None
+            self._search_all &= ~(1 << record_id)   # searches start from _search_all, so the id's position bits can stay set. Ids aren't reused
+        self._records.pop(record.barcode,None)
+        self._unknown_barcodes.discard(record.barcode)
+        self._found_barcodes.discard(record.barcode)
+        self._found_known_barcodes.discard(record.barcode)
+        self._missing_records.pop(record.barcode,None)
+        self._found_unknown_records.pop(record.barcode,None)
+        if not record.unknownRecord:
+            if record.found:
+                self._count_progress(record,-1)
+            for field,totals in self._progress_totals.items():
+                value = getattr(record,field)
+                totals[value] -= 1
+                if totals[value] == 0:
+                    del totals[value]
+                    self._progress_found[field].pop(value,None)
+        if self._groups is not None:
+            key = (record.material,record.width)
+            group = self._groups[key]
+            del group[record.barcode]
+            if record.found:
+                self._group_found[key] -= 1
+            if not group:
+                del self._groups[key]
+                self._group_found.pop(key,None)
+                self._group_keys = None
+
+    def _set_found(self,record:ReelRecord,found:bool):
+        """ Set the found flag of a record and keep the found sets and report aggregates in step with it"""
+        if record.found == found:
+            return
+        record.found = found
+        if self._groups is not None:
+            self._group_found[(record.material,record.width)] += 1 if found else -1
+        in_order = next(reversed(self._records.values())) is record    # re-adding anything but the newest record puts it out of record order
+        if found:
+            self._found_barcodes.add(record.barcode)
+            self._missing_records.pop(record.barcode,None)
+            if not record.unknownRecord:
+                self._found_known_barcodes.add(record.barcode)
+                self._count_progress(record,1)
+            else:
+                self._found_unknown_records[record.barcode] = record
+                self._report_order_stale |= not in_order
+        else:
+            self._found_barcodes.discard(record.barcode)
+            if not record.unknownRecord:
+                self._found_known_barcodes.discard(record.barcode)
+                self._count_progress(record,-1)
+            self._found_unknown_records.pop(record.barcode,None)
+            self._missing_records[record.barcode] = record
+            self._report_order_stale |= not in_order
+
+    def _count_progress(self,record:ReelRecord,found:int):
+        """ Add found (1 or -1) to the found count of each of the known record's progress groups"""
+        for field,found_counts in self._progress_found.items():
+            found_counts[getattr(record,field)] += found
+
+    def _count_progress_many(self,records:list[ReelRecord]):
+        """ Add a batch of new records to the progress counts. Counter counts in C, so this is much faster than
+            counting each record as it is indexed when loading hundreds of thousands of reels"""
+        known = [r for r in records if not r._flags & ReelRecord._UNKNOWN]
+        found = [r for r in known if r._flags & ReelRecord._FOUND]
+        for field in self.PROGRESS_FIELDS:
+            self._progress_totals[field].update(map(attrgetter(field),known))
+            self._progress_found[field].update(map(attrgetter(field),found))
+
+    def _restore_report_order(self):
+        """ Put the report aggregates back into record order, if anything has put them out of it"""
+        if not self._report_order_stale:
+            return
+        self._missing_records = {r.barcode:r for r in self._records.values() if not r.found}
+        self._found_unknown_records = {r.barcode:r for r in self._records.values() if r.found and r.unknownRecord}
+        self._report_order_stale = False
+
     def _append(self,record:ReelRecord):
         """ Append a new ReelRecord to the collection"""
-        if record.barcode not in [r.barcode for r in self.records]:
-            self.records.append(record)
+        if record.barcode not in self._records:
+            self._index_record(record)
         else:
             raise DuplicateBarcodeError(f"Duplicate barcode: {record.barcode} not inserted")
         
@@ -82,119 +495,137 @@ class ReelRecords_model:
         """ Find record that matches the barcode and return a reference to it
             barcode:str - barcode string to search for
             returns a ReelRecord if a barcode was found, otherwise returns None object"""
-        for record in self.records:
-            if record.barcode==barcode:
-                return record
-        return None
+        return self._records.get(barcode)
      
     def getRandomRecord(self)->ReelRecord:
         """get a random record from the records. Used for testing"""
-        random_record = self.records[random.randint(0,len(self.records)-1)]
-        return random_record
+        return random.choice(self.records)
     
     def allRecordsFound(self) -> bool:
         """ Return True if all records are marked as found"""
-        record:ReelRecord = None 
-        for record in self.records:
-            if record.found == False:
-                return False
-        return True
+        return len(self._found_barcodes) == len(self._records)
     
     def getRandomRecordNotFoundAlready(self)->ReelRecord:
         """ same as getRandomRecord only must return a record that hasn't been found already"""
         if self.allRecordsFound():
             return None
-        
-        while True:
-            record = self.getRandomRecord()
-            if record.found!=True:
-                break
-        return record
+        return random.choice(list(self._missing_records.values()))
         
     def __iter__(self):
-        return iter(self.records)
+        return iter(self._records.values())
     
     def sort_records(self,sortkey="material"):
         """ Sorts the ReelRecords in place, by the sortkey
             sortkey:str - can only be "material" at the moment"""
         if sortkey=="material":
-            self.records.sort(key=lambda r: r.material)
+            records = sorted(self._records.values(),key=lambda r: _none_last(r.material))   # a stable sort, so the groups' record order is unchanged
+            self._records = {r.barcode:r for r in records}
+            self._report_order_stale = True
+            self._build_search_index()  # search ids follow record order so the search index has to be rebuilt
 
     def sort_by(self,sortKey):
         """ Return records iterrable sorted by sortKey"""
         if sortKey == "weight":
-            return sorted(self.records,key = lambda r: r.weight)
+            return sorted(self._records.values(),key = lambda r: _none_last(r.weight))
         if sortKey == "height":
-            return sorted(self.records,key = lambda r: r.width)
+            return sorted(self._records.values(),key = lambda r: _none_last(r.width))
         if sortKey == "paperType":
-            return sorted(self.records,key = lambda r: r.material)
-        
-    def getGroups(self,max_group_size=30,hideFound=False):
-        """ Return a list of lists of records where each list is a group of records grouped by the sortKey
-            if hideFound is true, groups will only contain records that have not been found"""
-        groupedList = [[]]
-        groupNumber = 0
+            return sorted(self._records.values(),key = lambda r: _none_last(r.material))
 
-        sortKey="paperType"
-        sortedRecords:list = self.sort_by(sortKey=sortKey)
-        
+    def _get_group_keys(self)->list[tuple]:
+        """ Return the (material, width) group keys in display order, building the groups first if they haven't been built.
+            Unknown reels have no material or width so their group comes last"""
+        if self._groups is None:
+            self._groups = dict()
+            for record in self._records.values():
+                group = self._groups.get((record.material,record.width))
+                if group is None:
+                    group = self._groups[(record.material,record.width)] = dict()
+                group[record.barcode] = record
+            self._group_found = Counter((r.material,r.width) for r in self._records.values() if r._flags & ReelRecord._FOUND)
+            self._group_keys = None
+        if self._group_keys is None:
+            self._group_keys = sorted(self._groups,key=lambda key:(_none_last(key[0]),_none_last(key[1])))
+        return self._group_keys
 
-        sortKey = "width" #decided to split groups again by width of reel
-        groupValue = getattr(sortedRecords[0],sortKey)
-        groupRecordCount = 0
-        
-        for record in sortedRecords:
-            if(hideFound==True):
-                if record.found==True:
+    def getGroups(self,max_group_size=30,hideFound=False):
+        """ Return a list of lists of records where each list is a group of records with the same material and width,
+            ordered by material then width. Groups bigger than max_group_size are split so each fits on a single window.
+            if hideFound is true, groups will only contain records that have not been found"""
+        groupedList = list()
+        for key in self._get_group_keys():
+            group = self._groups[key]
+            found_count = self._group_found[key]
+            if hideFound and found_count:
+                if found_count == len(group):
                     continue
-            #keep group sizing small enought to fit on a single window
-            groupRecordCount +=1
-            if groupRecordCount > max_group_size:
-                groupNumber += 1
-                groupedList.append([])
-                groupRecordCount=0
-
-            recordGroupValue = getattr(record,sortKey)
-            if groupValue != recordGroupValue:
-                groupNumber += 1
-                groupValue = recordGroupValue
-                groupedList.append([])
-                groupRecordCount=0
-            groupedList[groupNumber].append(record)
-            
+                records = [record for record in group.values() if not record.found]
+            else:
+                records = list(group.values())
+            for start in range(0,len(records),max_group_size):
+                groupedList.append(records[start:start + max_group_size])
         return groupedList
 
+    def get_group_counts(self)->list[tuple]:
+        """ Return the found and total record counts of every (material, width) group without walking the records
+            -> [(material, width, found count, total count)] in the same order as getGroups"""
+        return [(key[0],key[1],self._group_found[key],len(self._groups[key])) for key in self._get_group_keys()]
+
     def _known_records_count(self)->int:
-        count = 0
-        for record in self.records:
-            if record.unknownRecord==False:
-                count+=1
-        return count   
+        return len(self._records) - len(self._unknown_barcodes)
     """Functions that must be implemented for the  presenter"""
     def set_records(self,rows:list[list[str]],filepath:str):
         """ loads reel data provided as a list of rows where each list element is column data
-            rows:list[list[str]] - reel data to be added to the records
+            rows:list[list[str]] - reel data to be added to the records. Any iterable of rows (eg. a generator) will do
             filepath:str - the filepath where the data was loaded from. """
-        
+        self.set_records_many([(rows,filepath)])
+
+    def set_records_many(self,sources:list[tuple[list[list[str]],str]]):
+        """ loads reel data from several files in a single pass.
+            sources:list[tuple[rows,filepath]] - (rows, filepath) pairs in the order the files should be assigned fileIDs
+            Duplicates within a file and across files are all collected and raised together as one DuplicateBarcodeError
+            after every non duplicate row has been inserted."""
+        duplicateBarcodeErrors = list()
+        for rows,filepath in sources:
+            fileID = self._get_fileID_for(filepath)
+            duplicateBarcodeErrors.extend(self._extend(
+                ReelRecord(barcode=str(row[0]),width=int(row[1]), weight=int(row[2]),material=str(row[3]),fileID=fileID)
+                for row in rows))
+        self._build_search_index()
+
+        if len(duplicateBarcodeErrors) > 0:
+            raise DuplicateBarcodeError(duplicateBarcodeErrors)
+        else:
+            return None    
+
+    def _get_fileID_for(self,filepath:str)->int:
+        """ Return the fileID for a filepath, assigning the next free id if the filepath hasn't been loaded before"""
         if filepath not in self.fileID.values():  # only add a filepath if it hasn't already been loaded
             fileID = len(self.fileID)  # assign a fileID to each record that will map to the filepath that was used to load the data.
             self.fileID[fileID] = filepath    # Add a new filepath to the records dictionary that will map the fileID (stored in every record) to the filepath that id refers to.
         else:
             print(f'filepath {filepath} was already in self.fileID')
             fileID = next((k for k, v in self.fileID.items() if v == filepath), None)  # get the key that corresponds to the filepath
-            
-        duplicateBarcodeErrors = list()    
-        for row in rows:
-            new_record = ReelRecord(barcode=str(row[0]),width=int(row[1]), weight=int(row[2]),material=str(row[3]),fileID=int(fileID))
-            try:
-                self._append(new_record)
-            except DuplicateBarcodeError as e:
-                duplicateBarcodeErrors.append(new_record.barcode)
+        return int(fileID)
 
-        if len(duplicateBarcodeErrors) > 0:
-            raise DuplicateBarcodeError(duplicateBarcodeErrors)
-        else:
-            return None    
+    def _extend(self,new_records)->list[str]:
+        """ Bulk append of ReelRecords. Duplicates are checked against the records (which also hold every
+            record inserted earlier in the same call) so the whole insert is linear in the number of records.
+            The search index is dropped, call _build_search_index once every batch has been added
+            new_records - iterable of ReelRecord
+            -> list of barcodes that were not inserted because they were duplicates"""
+        duplicates = list()
+        index = self._records
+        added = list()
+        self._search_ids = None     # adding to the search index costs O(n) per record, rebuilding it afterwards is linear
+        for record in new_records:
+            if record.barcode in index:
+                duplicates.append(record.barcode)
+                continue
+            added.append(record)
+            self._index_record(record,count_progress=False)
+        self._count_progress_many(added)
+        return duplicates
 
     def get_records(self,hide_found=False)->list[list[str]]:
         """ Gets all reel records in the form of a list of rows where each list element is column data.
@@ -202,7 +633,7 @@ class ReelRecords_model:
             -> list[list[str]]"""
         rows:list[list[str]] = list()
         rows.append(ReelRecord.data_names)
-        for record in self.records:
+        for record in self._records.values():
             if hide_found:
                 if record.found!=True:
                     rows.append(record.to_str_list())
@@ -210,30 +641,77 @@ class ReelRecords_model:
                 rows.append(record.to_str_list())
         return rows
         
-    def get_records_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None):
-        """ Gets all reel records as in get_records() but filters by any filter that is passed in."""
+    def get_records_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None,offset:int=0,limit:int=None):
+        """ Gets all reel records as in get_records() but filters by any filter that is passed in.
+            offset, limit - optionally return only a page of the matching records (limit=None returns all of them)"""
         rows:list[list[str]] = list()
         rows.append(ReelRecord.data_names)
+        for position,record in enumerate(self.iter_records_filtered(barcode_filter,width_filter,weight_filter)):
+            if position < offset:
+                continue
+            if limit is not None and position >= offset + limit:
+                break
+            rows.append(record.to_str_list())
+        return rows
 
-        for record in self.records:
-            record_matches_filter=True
+    def get_barcodes_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None)->list[str]:
+        """ Return the barcodes of records matching the filters, in record order"""
+        matches = self._match_filters(barcode_filter,width_filter,weight_filter)
+        return list(bitset_select(self._search_barcodes,matches))
 
-            if barcode_filter:      
-                if not self.str_matches_filter(a_string=record.barcode,filter=barcode_filter):
-                    record_matches_filter = False
+    def count_records_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None)->int:
+        """ Return the number of records matching the filters without building any rows"""
+        return self._match_filters(barcode_filter,width_filter,weight_filter).bit_count()
 
-            if width_filter:
-                if not self.str_matches_filter(a_string=str(record.width),filter=width_filter):
-                    record_matches_filter = False
+    def iter_records_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None):
+        """ Iterate the records matching the filters in record order. Filters are lists of single characters per position, "" for any"""
+        matches = self._match_filters(barcode_filter,width_filter,weight_filter)
+        return map(self._records.__getitem__,bitset_select(self._search_barcodes,matches))
 
-            if weight_filter:
-                if not self.str_matches_filter(a_string=str(record.weight),filter=weight_filter):
-                    record_matches_filter = False     
+    def match_records_filtered(self,barcode_filter:list[str]=None,width_filter:list[str]=None,weight_filter:list[str]=None,within:int=None)->int:
+        """ Return a search match of the records matching the filters, for get_match_delta.
+            A match is a bitset of search record ids, so it is only meaningful until the records are next loaded or sorted
+            within - a previous match to narrow down when these filters only add characters to the ones it was made with.
+                     Only its records are checked. None checks every record"""
+        return self._match_filters(barcode_filter,width_filter,weight_filter,within)
+
+    def get_match_delta(self,old:int|None,new:int|None)->tuple[list[str],list[str]]:
+        """ Compare two search matches from match_records_filtered, without looking at the records both or neither contain.
+            None stands for every record
+            -> (barcodes of records in old but not in new, barcodes of records in new but not in old), in record order"""
+        if self._search_ids is None:
+            self._build_search_index()
+        everything = self._search_all     # leaves out records deleted since the matches were made
+        old = everything if old is None else old & everything
+        new = everything if new is None else new & everything
+        return list(bitset_select(self._search_barcodes,old & ~new)),list(bitset_select(self._search_barcodes,new & ~old))
+
+    def _match_filters(self,barcode_filter,width_filter,weight_filter,within:int=None)->int:
+        """ Return the bitset of search record ids matching all the filters
+            within - bitset of the only search record ids to check, None for every record"""
+        if self._search_ids is None:
+            self._build_search_index()
+        matches = self._search_all if within is None else within & self._search_all
+        for field,filter in (("barcode",barcode_filter),("width",width_filter),("weight",weight_filter)):
+            if filter and matches:
+                matches = self._search_indexes[field].match(filter,matches)
+        return matches
+
+    def _search_strings(self,record:ReelRecord)->dict[str,str]:
+        """ The strings of a record that incomplete barcode searches match against"""
+        return {"barcode":record.barcode,"width":str(record.width),"weight":str(record.weight)}
+
+    def _build_search_index(self):
+        """ Build the positional search index for all records"""
+        records = list(self._records.values())
+        self._search_barcodes = list(self._records)
+        self._search_ids = dict(zip(self._search_barcodes,range(len(records))))
+        self._search_all = (1 << len(records)) - 1
+        self._search_indexes = dict()
+        for field in ("barcode","width","weight"):
+            self._search_indexes[field] = _PositionIndex()
+            self._search_indexes[field].build(list(map(str,map(attrgetter(field),records))))
 
-            if record_matches_filter:
-                rows.append(record.to_str_list())
-        return rows
-    
     def str_matches_filter(self,a_string:str,filter:list[str])->bool:
         """ Return True if non None characters in the filter match the characters at the same index in a_string"""
 
@@ -258,14 +736,15 @@ class ReelRecords_model:
                 index_with_a_value = index
         return index_with_a_value
 
+    def get_barcodes(self)->list[str]:
+        """ Return the barcodes of all records in record order"""
+        return list(self._records)
+
     def barcode_exists(self,barcode:str)->bool:
         """ Returns True if a specified barcode exists in the currently loaded records
             barcode:str - barcode to search for
             -> bool - True if the barcode is found in the records"""
-        for record in self.records:
-            if record.barcode==barcode:
-                return True
-        return False
+        return barcode in self._records
     
     def insert_unknown_reel(self,barcode:str):
         """ Create a new record, with unknown flag marked and append it to the current records
@@ -275,9 +754,9 @@ class ReelRecords_model:
         self._append(new_record)
     def delete_record(self,barcode:str):
         """Delete a record with the given barcode"""
-        for record in self.records:
-            if record==ReelRecord(barcode):
-                self.records.remove(record)
+        record = self._records.get(barcode)
+        if record is not None:
+            self._unindex_record(record)
         
     def mark_as_found(self,barcode:str)->bool:
         """ Find the record containing the barcode parameter and mark it as found
@@ -285,14 +764,34 @@ class ReelRecords_model:
             If the record is not found it returns false"""
         foundRecord = self.findRecord(barcode)
         if foundRecord != None: 
-            foundRecord.found=True
+            self._set_found(foundRecord,True)
             return True
         else:  
             return False
+    def scan_barcodes(self,barcodes:list[str])->list[tuple[bool,bool,bool]]:
+        """ Apply a burst of scans in one pass. Each barcode is handled exactly as a single scan would be, in order,
+            so a barcode scanned twice in the burst is a duplicate the second time.
+            Unknown barcodes are inserted as unknown reels and every barcode not already found is marked as found.
+            -> (known, duplicate, inserted) for each barcode. known - it was in the loaded stocktake data,
+               duplicate - it had already been found, inserted - it was added as a new unknown reel"""
+        results = list()
+        for barcode in barcodes:
+            record = self._records.get(barcode)
+            inserted = record is None
+            if inserted:
+                record = ReelRecord(barcode=barcode)
+                record.unknownRecord = True
+                self._append(record)
+            duplicate = record.found
+            if not duplicate:
+                self._set_found(record,True)
+            results.append((not record.unknownRecord,duplicate,inserted))
+        return results
+
     def mark_as_not_found(self,barcode:str):
         """ Find the record containing the barcode and mark it as not found."""
         foundRecord = self.findRecord(barcode)
-        foundRecord.found=False
+        self._set_found(foundRecord,False)
         
     def get_test_barcode(self)->str:
         unknownBarcodes=["5318008","112358132Z","2997924589"] #test barcodes that won't be in the records  
@@ -308,47 +807,94 @@ class ReelRecords_model:
     def get_found_barcodes(self)->list[str]|None:
         """ Return a list of barcodes which have already been found
             returns: list[str]"""
-        return [r.barcode for r in self.records if r.found]
+        return [r.barcode for r in self._records.values() if r.barcode in self._found_barcodes]
         
     def get_unknown_barcodes(self)->list[str]|None:
         """ Return a list of barcodes which are unknown
             returns: list[str]"""
-        return [r.barcode for r in self.records if r.unknownRecord]
+        return [r.barcode for r in self._records.values() if r.barcode in self._unknown_barcodes]
     
     def get_found_unknown_barcodes(self)->list[str]:
-        return [r.barcode for r in self.records if r.unknownRecord and r.found]
+        self._restore_report_order()
+        return list(self._found_unknown_records)
 
     def get_found_known_barcodes(self)->list[str]:
-        return [r.barcode for r in self.records if not r.unknownRecord and r.found]
+        return [r.barcode for r in self._records.values() if r.barcode in self._found_known_barcodes]
 
     def is_record_known(self,barcode:str)->bool:
-        for record in self.records:
-            if record.barcode==barcode and record.unknownRecord==False:
-                return True
-        return False
+        return barcode in self._records and barcode not in self._unknown_barcodes
     def is_record_unknown(self,barcode:str)->bool:
-        for record in self.records:
-            if record.barcode==barcode and record.unknownRecord==True:
-                return True
-        return False
+        return barcode in self._unknown_barcodes
     
     def is_record_found(self,barcode:str)->bool:
-        for record in self.records:
-            if record.barcode==barcode and record.found==True:
-                return True
-        return False
+        return barcode in self._found_barcodes
+    def get_counts(self)->dict[str,int]:
+        """ Return the stocktake's found, unknown and missing counts, without walking the records
+            found_count - known reels found, unknown_count - unknown reels found, missing_count - known reels not found yet"""
+        found_count = len(self._found_known_barcodes)
+        return {"found_count":found_count,
+                "unknown_count":len(self._found_unknown_records),
+                "missing_count":self._known_records_count() - found_count}
+
+    def get_progress(self)->dict[str,list[tuple]]:
+        """ Return found and total counts of the known reels grouped by each of PROGRESS_FIELDS, without walking the records
+            -> field -> [(value, found count, total count)] sorted by value"""
+        progress = dict()
+        for field,totals in self._progress_totals.items():
+            found_counts = self._progress_found[field]
+            groups = [(value,found_counts[value],total) for value,total in totals.items()]
+            progress[field] = sorted(groups,key=lambda group:_none_last(group[0]))
+        return progress
+
+    def get_missing_reels(self)->list[dict]:
+        """ Return the reel data of every record not marked as found, in record order"""
+        self._restore_report_order()
+        return [r.get_reel_data() for r in self._missing_records.values()]
+
+    def get_unknown_reels(self)->list[dict]:
+        """ Return the reel data of every unknown record that has been found, in record order"""
+        self._restore_report_order()
+        return [r.get_reel_data() for r in self._found_unknown_records.values()]
+
+    def get_report_reels(self,table:str,sort_by:str|tuple[str,...]=None,descending:bool=False,contains:str=None)->tuple[int,Iterator[dict]]:
+        """ Return one of the report's reel lists, filtered and sorted, for filling a table or writing an export a chunk at a time.
+            The reels are picked, filtered and sorted straight away so scans made while the table fills don't change it,
+            the reel data dictionaries are only made as the iterator is read
+            table - one of EXPORT_TABLES. "missing" - reels not marked as found, "unknown" - unknown reels that have been found,
+                    "found" - reels from the stocktake data that have been found
+            sort_by - one of REPORT_COLUMNS, a tuple of them (eg. ("material","width")) or None for record order.
+                      Reels with no value for a column (unknown reels) are always last
+            contains - only reels with this text (ignoring case) in one of their REPORT_COLUMNS
+            -> (number of reels, iterator of reel data dictionaries)"""
+        self._restore_report_order()
+        if table == "missing":
+            records = list(self._missing_records.values())
+        elif table == "unknown":
+            records = list(self._found_unknown_records.values())
+        elif table == "found":
+            found_known = ReelRecord._FOUND
+            records = [r for r in self._records.values() if r._flags & (ReelRecord._FOUND | ReelRecord._UNKNOWN) == found_known]
+        else:
+            raise ValueError(f"Unknown report table {table}, expected one of {self.EXPORT_TABLES}")
+        if contains:
+            text = contains.lower()
+            columns = [attrgetter(column) for column in self.REPORT_COLUMNS]
+            records = [r for r in records if any(text in str(column(r)).lower() for column in columns if column(r) is not None)]
+        if sort_by is not None:
+            sort_columns = (sort_by,) if isinstance(sort_by,str) else tuple(sort_by)
+            for column in reversed(sort_columns):     # stable sorts, last column first, give the combined order
+                if column not in self.REPORT_COLUMNS:
+                    raise ValueError(f"Can't sort the report by {column}, expected one of {self.REPORT_COLUMNS}")
+                value = attrgetter(column)
+                no_value = [r for r in records if value(r) is None]
+                records = sorted((r for r in records if value(r) is not None),key=value,reverse=descending) + no_value
+        return len(records),(r.get_reel_data() for r in records)
+
     def get_report(self)->dict:
         """ Return a summary of the stocktake"""
-        found_known_barcodes = self.get_found_known_barcodes()
-        found_unknown_barcodes = self.get_found_unknown_barcodes()
-
-        known_record_count = self._known_records_count()
-        report = dict()
-        report["found_count"] = len(found_known_barcodes)
-        report["unknown_count"] = len(found_unknown_barcodes)
-        report["missing_count"] = known_record_count - len(found_known_barcodes)
-        report["missing_reels"] = [r.get_reel_data() for r in self.records if r.found==False]
-        report["unknown_reels"] = [r.get_reel_data() for r in self.records if (r.unknownRecord and r.found==True)]
+        report = self.get_counts()
+        report["missing_reels"] = self.get_missing_reels()
+        report["unknown_reels"] = self.get_unknown_reels()
         return report
 
     def get_fileID(self)->dict[int,str]:
@@ -0,0 +1,186 @@
+from __future__ import annotations
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+from xml.sax.saxutils import escape
+import csv
+import os
+import zipfile
+
+""" Stocktake report export. Reel lists are streamed to csv, tsv or xlsx files one row at a time, so only one row of
+    a report is held in memory however many reels it has. Files are written next to their destination and renamed
+    into place once complete, so a cancelled or failed export never leaves a half written report behind."""
+
+EXPORT_FORMATS = ("csv","tsv","xlsx")
+
+def format_for_path(filepath:str)->str:
+    """ Export format from a file's extension. Raises ValueError for an extension that isn't one of EXPORT_FORMATS"""
+    export_format = Path(filepath).suffix.lower().lstrip(".")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Can't export to {filepath}, the file must end in one of {', '.join('.' + f for f in EXPORT_FORMATS)}")
+    return export_format
+
+class Delimited_report_writer:
+    """ Writes rows to a csv (or tsv with delimiter="\\t") file. Empty values (None) are written as empty fields"""
+    def __init__(self,filepath:str,delimiter:str=","):
+        self.filepath = Path(filepath)
+        self._tmp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        self._file = open(self._tmp_path,"w",newline="",encoding="utf-8")
+        self._writer = csv.writer(self._file,delimiter=delimiter)
+
+    def write_row(self,values:list)->None:
+        self._writer.writerow(["" if value is None else value for value in values])
+
+    def close(self)->None:
+        """ Finish the file and move it into place"""
+        self._file.close()
+        os.replace(self._tmp_path,self.filepath)
+
+    def abort(self)->None:
+        """ Stop writing and remove the partly written file"""
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+class Xlsx_report_writer:
+    """ Writes rows to the first sheet of a new xlsx workbook.
+        The sheet xml is streamed straight into the zip. Strings are written inline rather than through a shared string
+        table, which would have to be held in memory until the end. Ints and floats are written as numbers"""
+
+    CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>')
+    ROOT_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>')
+    WORKBOOK = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>')
+    WORKBOOK_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>')
+    SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    SHEET_END = '</sheetData></worksheet>'
+    BUFFER_ROWS = 1000      # rows of sheet xml collected before each write to the zip, which is slow per call
+
+    def __init__(self,filepath:str,sheet_name:str="Report"):
+        self.filepath = Path(filepath)
+        self._tmp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        self._book = zipfile.ZipFile(self._tmp_path,"w",compression=zipfile.ZIP_DEFLATED)
+        self._book.writestr("[Content_Types].xml",self.CONTENT_TYPES)
+        self._book.writestr("_rels/.rels",self.ROOT_RELS)
+        self._book.writestr("xl/workbook.xml",self.WORKBOOK.format(sheet_name=escape(sheet_name,{'"':"&quot;"})))
+        self._book.writestr("xl/_rels/workbook.xml.rels",self.WORKBOOK_RELS)
+        self._sheet = self._book.open("xl/worksheets/sheet1.xml","w",force_zip64=True)
+        self._sheet.write(self.SHEET_START.encode())
+        self._row_number = 0
+        self._column_letters:list[str] = list()     # column index -> "A", "B" ... "AA"
+        self._buffer:list[str] = list()
+
+    def _add_column_letters(self,column_count:int)->None:
+        while len(self._column_letters) < column_count:
+            number,letters = len(self._column_letters) + 1,""
+            while number:
+                number,remainder = divmod(number - 1,26)
+                letters = chr(ord("A") + remainder) + letters
+            self._column_letters.append(letters)
+
+    def write_row(self,values:list)->None:
+        self._row_number += 1
+        row = self._row_number
+        if len(values) > len(self._column_letters):
+            self._add_column_letters(len(values))
+        cells = list()
+        for letters,value in zip(self._column_letters,values):
+            if value is None:
+                continue
+            if type(value) is int or type(value) is float:
+                cells.append(f'<c r="{letters}{row}"><v>{value}</v></c>')
+            else:
+                cells.append(f'<c r="{letters}{row}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+        self._buffer.append(f'<row r="{row}">{"".join(cells)}</row>')
+        if len(self._buffer) >= self.BUFFER_ROWS:
+            self._flush()
+
+    def _flush(self)->None:
+        self._sheet.write("".join(self._buffer).encode())
+        self._buffer.clear()
+
+    def close(self)->None:
+        """ Finish the workbook and move it into place"""
+        self._flush()
+        self._sheet.write(self.SHEET_END.encode())
+        self._sheet.close()
+        self._book.close()
+        os.replace(self._tmp_path,self.filepath)
+
+    def abort(self)->None:
+        """ Stop writing and remove the partly written file"""
+        self._sheet.close()
+        self._book.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+def make_report_writer(filepath:str,export_format:str=None):
+    """ Create the writer for filepath
+        export_format - one of EXPORT_FORMATS, or None to go by the file's extension"""
+    export_format = export_format or format_for_path(filepath)
+    if export_format == "csv":
+        return Delimited_report_writer(filepath,delimiter=",")
+    if export_format == "tsv":
+        return Delimited_report_writer(filepath,delimiter="\t")
+    if export_format == "xlsx":
+        return Xlsx_report_writer(filepath)
+    raise ValueError(f"Unknown export format {export_format}, expected one of {EXPORT_FORMATS}")
+
+class Report_export:
+    """ An export of a stream of reels to a file that is written a chunk at a time, so the gui can keep running between chunks.
+        A header row of the column names is written first
+        reels - reel data dictionaries, read as the file is written
+        columns - keys of the reel data dictionaries to write, in column order
+        count - how many reels there are, for progress messages"""
+
+    def __init__(self,filepath:str,reels:Iterator[dict],columns:list[str],count:int,export_format:str=None):
+        self.filepath = filepath
+        self.columns = list(columns)
+        self.count = count
+        self.written = 0
+        self._reels = reels
+        self._writer = make_report_writer(filepath,export_format)
+        self._writer.write_row(self.columns)
+
+    def write_rows(self,max_rows:int=None)->bool:
+        """ Write up to max_rows more reels (all of them when None). The file is finished once every reel is written
+            -> True when the export is complete"""
+        columns = self.columns
+        write_row = self._writer.write_row
+        written = 0
+        try:
+            for reel in islice(self._reels,max_rows):
+                write_row([reel.get(column) for column in columns])
+                written += 1
+        except BaseException:
+            self._writer.abort()
+            raise
+        self.written += written
+        if max_rows is not None and written == max_rows:
+            return False
+        self._writer.close()
+        return True
+
+    def cancel(self)->None:
+        """ Stop the export and remove the partly written file"""
+        self._writer.abort()
+
+def export_reels(filepath:str,reels:Iterator[dict],columns:list[str],export_format:str=None)->int:
+    """ Write every reel to filepath in one go
+        -> number of reels written"""
+    export = Report_export(filepath,reels,columns,count=None,export_format=export_format)
+    export.write_rows()
+    return export.written
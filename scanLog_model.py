@@ -0,0 +1,118 @@
+from __future__ import annotations
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+import os
+import threading
+
+""" The daily scan log. Every scan is appended to logs/<date>.txt as an audit trail that the stocktake can be
+    rebuilt from (see rebuild_from_scan_log.py) if the save files are ever lost.
+    Each line is: <timestamp>\t<outcome>\t<barcode>
+    Logs written before outcomes were recorded hold just the barcode on each line."""
+
+SCAN_OUTCOMES = ("found","duplicate","unknown","invalid","unfound","deleted")
+
+class ScanLog_model:
+    """ Appends scan log lines through one file handle that is kept open and rotated to a new file at midnight.
+
+        How often the log is fsync'd to disk is set by durability:
+        - "event"       fsync after every write
+        - "count"       fsync once fsync_every lines have been written since the last fsync
+        - "interval"    fsync at most fsync_interval_ms after a line was written
+        Lines are always flushed to the operating system on write, so only a power loss or OS crash can lose the
+        lines that haven't been fsync'd yet."""
+
+    DURABILITY_MODES = ("event","count","interval")
+    LOG_SUFFIX = ".txt"
+
+    def __init__(self,log_dir:Path,durability:str="interval",fsync_every:int=50,fsync_interval_ms:int=1000):
+        if durability not in self.DURABILITY_MODES:
+            raise ValueError(f"Unknown scan log durability mode: {durability}")
+        self.log_dir = Path(log_dir)
+        self.durability = durability
+        self.fsync_every = fsync_every
+        self.fsync_interval_ms = fsync_interval_ms
+        self._lock = threading.Lock()   # the interval fsync runs on a timer thread
+        self._file = None
+        self._rotate_at = 0.0           # time.time() of the next midnight, when a new daily file is started
+        self._unsynced = 0              # lines written since the last fsync
+        self._sync_timer:threading.Timer = None
+
+    def log_path(self,day:date)->Path:
+        """ Path of the log file for day. eg. logs/2025-09-21.txt"""
+        return self.log_dir / f'{day.strftime("%Y-%m-%d")}{self.LOG_SUFFIX}'
+
+    def write(self,entries:list[tuple[float,str,str]])->None:
+        """ Append scan log lines.
+            entries - (time.time() of the scan, outcome, barcode) for each scan, in the order they were scanned"""
+        if not entries:
+            return
+        with self._lock:
+            for timestamp,outcome,barcode in entries:
+                if timestamp >= self._rotate_at or self._file is None:
+                    self._open_for(timestamp)
+                self._file.write(f"{datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds')}\t{outcome}\t{barcode}\n")
+            self._file.flush()
+            self._unsynced += len(entries)
+            if self.durability == "event" or (self.durability == "count" and self._unsynced >= self.fsync_every):
+                self._sync()
+            elif self.durability == "interval" and self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.fsync_interval_ms / 1000,self._sync_from_timer)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def close(self)->None:
+        """ fsync and close the current log file"""
+        with self._lock:
+            self._close_file()
+
+    def _open_for(self,timestamp:float)->None:
+        """ Close the current log file and open the one for the day timestamp falls on"""
+        self._close_file()
+        day = date.fromtimestamp(timestamp)
+        self.log_dir.mkdir(parents=True,exist_ok=True)
+        self._file = open(self.log_path(day),"a",encoding="utf-8")
+        self._rotate_at = datetime.combine(day + timedelta(days=1),dt_time()).timestamp()
+
+    def _close_file(self)->None:
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._file = None
+
+    def _sync(self)->None:
+        """ fsync the current log file. The lock must be held"""
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _sync_from_timer(self)->None:
+        with self._lock:
+            self._sync_timer = None
+            if self._file is not None and not self._file.closed and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+def read_scan_log(filepath)->list[tuple[str|None,str,str]]:
+    """ Read a scan log file
+        -> (timestamp string or None, outcome, barcode) for each line.
+           Lines from logs written before outcomes were recorded are given the outcome "scanned" and no timestamp.
+           A partially written last line (power lost mid write) is skipped."""
+    entries = list()
+    with open(filepath,"r",encoding="utf-8",errors="replace") as f:
+        text = f.read()
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    elif lines:
+        lines.pop()     # no newline on the last line so it may be cut short
+    for line in lines:
+        fields = line.rstrip("\r").split("\t")
+        if len(fields) == 1 and fields[0]:
+            entries.append((None,"scanned",fields[0]))
+        elif len(fields) == 3 and fields[2]:
+            entries.append((fields[0],fields[1],fields[2]))
+    return entries
@@ -1,13 +1,223 @@
-from typing import Any,Callable,Protocol
+from typing import Any,Callable,Iterator,Protocol
+from queue import SimpleQueue, Empty
+import threading
+import time
 
 class Presenter(Protocol):
     """ interface to the Presenter. That is functions that the presenter must implement for interaction with the scanner"""
     def barcode_scanned(self,barcode:str):
         ...
 
+class Scan_source(Protocol):
+    """ A device barcodes are read from. read_barcodes is run on the scanner thread and frames the raw input into barcodes"""
+    def read_barcodes(self,stop:threading.Event)->Iterator[str]:
+        """ Yield each barcode as it is completed. Blocking reads must time out regularly so stop can be checked
+            Raises OSError if the device goes away"""
+        ...
+    def close(self)->None:
+        ...
+
+class Evdev_scan_source(Scan_source):
+    """ Reads a scanner in USB HID keyboard mode directly from its linux input device (eg. /dev/input/by-id/usb-Zebra...-event-kbd).
+        The scanner is setup to send an F13 prefix and an F14 suffix with each barcode. The device is grabbed so the scan
+        isn't also typed into the window as key presses. Needs the evdev package and read access to the device"""
+
+    START_KEYS = ("KEY_F13",)
+    END_KEYS = ("KEY_F14","KEY_ENTER","KEY_KPENTER")
+    SHIFT_KEYS = ("KEY_LEFTSHIFT","KEY_RIGHTSHIFT")
+    KEY_CHARACTERS = {"KEY_MINUS":("-","_"),"KEY_DOT":(".",">"),"KEY_SLASH":("/","?"),"KEY_SPACE":(" "," ")}
+
+    def __init__(self,device_path:str):
+        import evdev
+        self.evdev = evdev
+        self.device = evdev.InputDevice(device_path)
+        self.device.grab()
+
+    def _key_character(self,key_name:str,shift:bool)->str:
+        """ Convert an evdev key name to the character it types, or '' if it doesn't type one"""
+        if key_name in self.KEY_CHARACTERS:
+            return self.KEY_CHARACTERS[key_name][shift]
+        name = key_name[4:]     # strip KEY_
+        if len(name) == 1 and name.isalnum():
+            return name if shift or name.isdigit() else name.lower()
+        if name.startswith("KP") and len(name) == 3 and name[2].isdigit():
+            return name[2]
+        return ""
+
+    def read_barcodes(self,stop:threading.Event)->Iterator[str]:
+        import select
+        ecodes = self.evdev.ecodes
+        buffer = []
+        shift = False
+        while not stop.is_set():
+            ready,_,_ = select.select([self.device.fd],[],[],0.2)
+            if not ready:
+                continue
+            for event in self.device.read():
+                if event.type != ecodes.EV_KEY:
+                    continue
+                key_name = ecodes.KEY.get(event.code)
+                if isinstance(key_name,list):
+                    key_name = key_name[0]
+                if key_name in self.SHIFT_KEYS:
+                    shift = event.value != 0
+                    continue
+                if event.value != 1:     # only key down, not up (0) or auto repeat (2)
+                    continue
+                if key_name in self.START_KEYS:
+                    buffer.clear()
+                elif key_name in self.END_KEYS:
+                    code = "".join(buffer).strip()
+                    buffer.clear()
+                    if code:
+                        yield code
+                elif key_name:
+                    buffer.append(self._key_character(key_name,shift))
+
+    def close(self)->None:
+        try:
+            self.device.ungrab()
+        except OSError:
+            pass
+        self.device.close()
+
+class Serial_scan_source(Scan_source):
+    """ Reads a scanner in USB CDC (virtual com port) or RS232 mode, eg. /dev/ttyACM0 or COM3.
+        Each barcode is ended with a carriage return and/or line feed. Needs the pyserial package"""
+
+    def __init__(self,port:str,baudrate:int=9600):
+        import serial
+        self.serial = serial.Serial(port,baudrate=baudrate,timeout=0.2)
+
+    def read_barcodes(self,stop:threading.Event)->Iterator[str]:
+        buffer = bytearray()
+        while not stop.is_set():
+            data = self.serial.read(self.serial.in_waiting or 1)
+            if not data:
+                continue
+            buffer += data
+            *lines,rest = buffer.replace(b"\r",b"\n").split(b"\n")
+            buffer = bytearray(rest)
+            for line in lines:
+                code = "".join(c for c in line.decode("ascii",errors="ignore") if c.isprintable()).strip()
+                if code:
+                    yield code
+
+    def close(self)->None:
+        self.serial.close()
+
+class Fake_scan_source(Scan_source):
+    """ Replays a recorded stream of scans, for testing and benchmarking without a scanner.
+        scans - barcodes, or (seconds since the start of the recording, barcode) to keep the recorded timing
+        rate - scans per second to replay at, ignoring any recorded timing. None replays at the recorded timing
+        speed - how many times faster than recorded to replay"""
+
+    def __init__(self,scans:list,rate:float=None,speed:float=1.0):
+        self.scans = [scan if isinstance(scan,tuple) else (None,scan) for scan in scans]
+        self.rate = rate
+        self.speed = speed
+
+    @classmethod
+    def from_scan_log(cls,filepath:str,rate:float=None,speed:float=1.0):
+        """ Replay the scans recorded in a daily scan log (see scanLog_model)"""
+        from datetime import datetime
+        from scanLog_model import read_scan_log
+        scans = list()
+        first = None
+        for timestamp,outcome,barcode in read_scan_log(filepath):
+            if outcome in ("unfound","deleted"):
+                continue
+            if timestamp is None:
+                scans.append(barcode)
+                continue
+            seconds = datetime.fromisoformat(timestamp).timestamp()
+            first = seconds if first is None else first
+            scans.append((seconds - first,barcode))
+        return cls(scans,rate=rate,speed=speed)
+
+    def read_barcodes(self,stop:threading.Event)->Iterator[str]:
+        start = time.perf_counter()
+        for number,(offset,barcode) in enumerate(self.scans):
+            if self.rate:
+                due = number / self.rate
+            else:
+                due = (offset or 0) / self.speed
+            delay = start + due - time.perf_counter()
+            if delay > 0 and stop.wait(delay):
+                return
+            if stop.is_set():
+                return
+            yield barcode
+
+    def close(self)->None:
+        ...
+
+def make_scan_source(device:str)->Scan_source:
+    """ Create the scan source for device
+        /dev/input/... - a scanner in HID keyboard mode read with evdev
+        fake:<scan log path>[@<scans per second>] - replay a scan log
+        anything else - a serial port, eg. /dev/ttyACM0 or COM3"""
+    if device.startswith("fake:"):
+        path,_,rate = device[5:].partition("@")
+        return Fake_scan_source.from_scan_log(path,rate=float(rate) if rate else None)
+    if device.startswith("/dev/input/"):
+        return Evdev_scan_source(device)
+    return Serial_scan_source(device)
+
 class Scanner_z3678_model:
-    ...
+    """ Reads barcodes from the Zebra DS3678 scanner on a background thread.
+
+        Scans are time stamped when they are framed and queued. The presenter drains them with get_scans() from the Tk thread.
+        With no device the model does nothing and scans are captured as key presses by the view (Tk_view.capture_scanner)"""
+
+    RECONNECT_DELAY_S = 2.0     # wait before reopening a device that has gone away (scanner base unplugged)
+
+    def __init__(self,device:str=None,make_source:Callable[[str],Scan_source]=make_scan_source):
+        self.device = device
+        self.make_source = make_source
+        self._scans:SimpleQueue[tuple[float,str]] = SimpleQueue()
+        self._stop = threading.Event()
+        self._thread:threading.Thread = None
+
+    def _run(self)->None:
+        while not self._stop.is_set():
+            try:
+                source = self.make_source(self.device)
+            except Exception as e:
+                print(f"Failed to open scanner {self.device}: {e}")
+                self._stop.wait(self.RECONNECT_DELAY_S)
+                continue
+            try:
+                for barcode in source.read_barcodes(self._stop):
+                    self._scans.put((time.time(),barcode))
+                if isinstance(source,Fake_scan_source):
+                    return      # a recording has finished, there is nothing to reconnect to
+            except OSError as e:
+                print(f"Lost connection to scanner {self.device}: {e}")
+                self._stop.wait(self.RECONNECT_DELAY_S)
+            finally:
+                source.close()
 
     """Functions that must be implemented for the  presenter"""
     def startScanner(self,presenter:Presenter):
-        ...
\ No newline at end of file
+        if self.device is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,name="scanner",daemon=True)
+        self._thread.start()
+
+    def stopScanner(self)->None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def get_scans(self)->list[tuple[float,str]]:
+        """ Return and remove the scans read since the last call
+            -> (time.time() the barcode was read, barcode) for each scan in the order scanned"""
+        scans = list()
+        while True:
+            try:
+                scans.append(self._scans.get_nowait())
+            except Empty:
+                return scans
@@ -1,22 +1,51 @@
-from typing import Protocol
+from typing import Protocol, Callable
 from fileAccess_model import resource_path
-import sys
-print(sys.version)
+import heapq
+import os
+import shutil
+import subprocess
+import threading
 
 class Sound_backend(Protocol):
+    """ Decodes and plays sounds. Called from the Sound_player thread only"""
+    def load(self,file_path:str):
+        """ Decode a wave file ready for playing
+            file_path -> file path of the wave file relative to the app
+            -> a sound object that is passed back to play and stop"""
+        ...
+    def play(self,sound)->None:
+        """ Start playing a loaded sound and return straight away"""
+        ...
+    def stop(self,sound)->None:
+        """ Stop a sound if it is still playing"""
+        ...
+    def is_busy(self)->bool:
+        """ -> True while any sound is playing"""
+        ...
 
-    def play_file(self,file_path:str,wait_time:int):
-        """ Play a wave file
-            file_path -> file path of the wave file to play
-            wait_time -> time to wait if there is a sound already playing. Used to allow customisable overlap of multiple sounds"""
+class Null_sound_backend(Sound_backend):
+    """ Plays nothing. Used when no audio library or device is available"""
+    def load(self,file_path:str):
+        return file_path
+    def play(self,sound):
+        ...
+    def stop(self,sound):
         ...
+    def is_busy(self)->bool:
+        return False
 
 class Debug_sound_backend(Sound_backend):
     def __init__(self):
         ...
-    def play_file(self,file_path:str,wait_time):
+    def load(self,file_path:str):
+        return file_path
+    def play(self,sound):
         """debug prints instead of sound"""
-        print(f'playing {file_path} using direct_backend')
+        print(f'playing {sound} using direct_backend')
+    def stop(self,sound):
+        ...
+    def is_busy(self)->bool:
+        return False
 
 class pygame_sound_backend(Sound_backend):
     """implements Sound_backend audio using pygame"""
@@ -29,30 +58,225 @@ class pygame_sound_backend(Sound_backend):
         self.pygame = pygame
         self.pygame.mixer.init()
 
-    def play_file(self,file_path:str,wait_time:int=0):
-        if self.pygame.mixer.get_busy():
-            self.pygame.time.wait(wait_time)  # 5 ms sleep to avoid pegging CPU - Look at threading at a later date for this
-        sound = self.pygame.mixer.Sound(resource_path(file_path))
+    def load(self,file_path:str):
+        return self.pygame.mixer.Sound(resource_path(file_path))
 
-        
+    def play(self,sound):
         sound.play()
 
+    def stop(self,sound):
+        sound.stop()
+
+    def is_busy(self)->bool:
+        return self.pygame.mixer.get_busy()
+
+class simpleaudio_sound_backend(Sound_backend):
+    """implements Sound_backend audio using simpleaudio, a much smaller install than pygame"""
+
+    def __init__(self):
+        import simpleaudio
+        self.simpleaudio = simpleaudio
+        self._playing = list()  # (wave object, play object) of sounds started and not yet seen finished
+
+    def load(self,file_path:str):
+        return self.simpleaudio.WaveObject.from_wave_file(resource_path(file_path))
+
+    def play(self,sound):
+        self._playing = [item for item in self._playing if item[1].is_playing()]
+        self._playing.append((sound,sound.play()))
+
+    def stop(self,sound):
+        for wave,play in self._playing:
+            if wave is sound:
+                play.stop()
+
+    def is_busy(self)->bool:
+        return any(play.is_playing() for _,play in self._playing)
+
+class aplay_sound_backend(Sound_backend):
+    """implements Sound_backend audio by running the ALSA aplay command, for a Raspberry Pi without pygame or simpleaudio.
+        aplay reads the file each time it plays so sounds are only checked to exist when loaded"""
+
+    def __init__(self):
+        self.aplay = shutil.which("aplay")
+        if self.aplay is None:
+            raise OSError("aplay was not found")
+        self._playing = list()  # (file path, process) of sounds started and not yet seen finished
+
+    def load(self,file_path:str):
+        path = resource_path(file_path)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def play(self,sound):
+        self._playing = [item for item in self._playing if item[1].poll() is None]
+        process = subprocess.Popen([self.aplay,"-q",sound],stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        self._playing.append((sound,process))
+
+    def stop(self,sound):
+        for path,process in self._playing:
+            if path == sound and process.poll() is None:
+                process.terminate()
+
+    def is_busy(self)->bool:
+        return any(process.poll() is None for _,process in self._playing)
+
+SOUND_BACKENDS = {
+    "pygame":pygame_sound_backend,
+    "simpleaudio":simpleaudio_sound_backend,
+    "aplay":aplay_sound_backend,
+    "debug":Debug_sound_backend,
+    "null":Null_sound_backend,
+}
+
+def make_sound_backend(name:str="auto")->Sound_backend:
+    """ Create the sound backend called name, one of SOUND_BACKENDS or "auto".
+        "auto" uses the first of pygame, simpleaudio and aplay that can be started.
+        Falls back to the null backend if the backend can't be started, so a missing library or audio device never stops the app"""
+    names = ["pygame","simpleaudio","aplay"] if name == "auto" else [name]
+    for backend_name in names:
+        try:
+            return SOUND_BACKENDS[backend_name]()
+        except Exception as e:
+            print(f"Sound backend {backend_name} not available: {e}")
+    return Null_sound_backend()
+
+class Sound_player:
+    """ Plays sounds on a background thread so the Tk thread never waits on audio.
+
+        The backend is created by make_backend on the player thread when start() is first called (or the first sound
+        is queued), so importing the audio library and starting the mixer never holds up the window appearing.
+        Every wav in sound_dir is then decoded once. Sounds are queued with a priority,
+        ALERT sounds (the good/bad chimes) jump ahead of queued VOICE prompts. interrupt() drops the voice prompts
+        that are queued and stops the ones playing, so prompts for an old scan don't hold up the next one.
+        wait_time is how long a sound waits for one that is already playing before it starts anyway,
+        this gives the customisable overlap used to chain "unknown ... and ... duplicate" """
+
+    ALERT = 0
+    VOICE = 1
+
+    def __init__(self,make_backend:Callable[[],Sound_backend],sound_dir:str="assets/sounds"):
+        self.make_backend = make_backend
+        self.backend:Sound_backend = None   # set on the player thread
+        self.sound_dir = sound_dir
+        self._sounds = dict()           # file path -> loaded sound
+        self._queue:list[tuple] = list()    # heap of (priority, order queued, file path, wait_time)
+        self._queued = 0
+        self._playing_voice = list()    # voice prompts started since the last interrupt, stopped by interrupt()
+        self._interrupts = 0            # incremented by interrupt(), lets the player thread drop a prompt it was waiting to play
+        self._condition = threading.Condition()
+        self._thread:threading.Thread = None
+
+    def start(self)->None:
+        """ Start the player thread, which creates the backend and preloads the sounds. Does nothing if already started"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run,name="sound_player",daemon=True)
+            self._thread.start()
+
+    def play(self,file_path:str,wait_time:int=0,priority:int=VOICE)->None:
+        """ Queue a sound to play. Returns straight away"""
+        self.start()
+        with self._condition:
+            heapq.heappush(self._queue,(priority,self._queued,file_path,wait_time))
+            self._queued += 1
+            self._condition.notify_all()
+
+    def interrupt(self)->None:
+        """ Drop queued voice prompts and stop any that are playing"""
+        with self._condition:
+            self._queue = [item for item in self._queue if item[0] != self.VOICE]
+            heapq.heapify(self._queue)
+            self._interrupts += 1
+            playing,self._playing_voice = self._playing_voice,list()
+            self._condition.notify_all()
+            backend = self.backend
+        if backend is None:
+            return
+        for sound in playing:
+            try:
+                backend.stop(sound)
+            except Exception as e:
+                print(f"Failed to stop sound: {e}")
+
+    def _preload(self)->None:
+        try:
+            sound_files = sorted(os.listdir(resource_path(self.sound_dir)))
+        except OSError as e:
+            print(f"Failed to find sounds to preload: {e}")
+            return
+        for name in sound_files:
+            if name.lower().endswith(".wav"):
+                self._load(f"{self.sound_dir}/{name}")
+
+    def _load(self,file_path:str):
+        sound = self._sounds.get(file_path)
+        if sound is None:
+            try:
+                sound = self.backend.load(file_path)
+            except Exception as e:
+                print(f"Failed to load sound {file_path}: {e}")
+                return None
+            self._sounds[file_path] = sound
+        return sound
+
+    def _run(self)->None:
+        backend = self.make_backend()
+        with self._condition:
+            self.backend = backend
+        self._preload()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                priority,_,file_path,wait_time = heapq.heappop(self._queue)
+                interrupts = self._interrupts
+                if wait_time and self.backend.is_busy():
+                    # wait for the playing sound, cut short by an interrupt
+                    self._condition.wait_for(lambda: self._interrupts != interrupts,timeout=wait_time / 1000)
+                    if priority == self.VOICE and self._interrupts != interrupts:
+                        continue    # a new scan came in while waiting, this prompt is stale
+            sound = self._load(file_path)
+            if sound is None:
+                continue
+            with self._condition:
+                if priority == self.VOICE:
+                    if self._interrupts != interrupts:
+                        continue
+                    self._playing_voice.append(sound)
+            try:
+                self.backend.play(sound)
+            except Exception as e:
+                print(f"Failed to play sound {file_path}: {e}")
+
 class Sound_model:
-    def __init__(self,backend:Sound_backend=pygame_sound_backend()):
-        self.backend = backend
+    def __init__(self,backend:Sound_backend=None,backend_name:str="auto"):
+        """ backend - backend to play sounds with. If None the backend named backend_name is created by make_sound_backend
+            when start() is called, or the first sound is played"""
+        if backend is None:
+            self.player = Sound_player(lambda: make_sound_backend(backend_name))
+        else:
+            self.player = Sound_player(lambda: backend)
+    def start(self):
+        """ Start the audio backend in the background. Called once the window is up"""
+        self.player.start()
+    def interrupt(self):
+        """ A new scan is being handled, drop voice prompts left over from the last one"""
+        self.player.interrupt()
     def play_file(self,file_path:str,wait_time:int=0):
-        self.backend.play_file(file_path,wait_time=0)
+        self.player.play(file_path,wait_time=0)
     def play_duplicate_bc(self,wait_time=0):
-        self.backend.play_file("assets/sounds/duplicate.wav",wait_time)
+        self.player.play("assets/sounds/duplicate.wav",wait_time)
     def play_unknown_bc(self,wait_time=0):
-        self.backend.play_file("assets/sounds/unknown.wav",wait_time)
+        self.player.play("assets/sounds/unknown.wav",wait_time)
     def play_found_bc(self,wait_time=0):
-        self.backend.play_file("assets/sounds/found.wav",wait_time)
+        self.player.play("assets/sounds/found.wav",wait_time)
     def play_incorrect_bc(self,wait_time=0):
-        self.backend.play_file("assets/sounds/incorrect_format.wav",wait_time)
+        self.player.play("assets/sounds/incorrect_format.wav",wait_time)
     def play_good(self,wait_time=0):
-        self.backend.play_file("assets/sounds/good.wav",wait_time)
+        self.player.play("assets/sounds/good.wav",wait_time,priority=Sound_player.ALERT)
     def play_bad(self,wait_time=0):
-        self.backend.play_file("assets/sounds/bah_bow.wav",wait_time)
+        self.player.play("assets/sounds/bah_bow.wav",wait_time,priority=Sound_player.ALERT)
     def play_and(self,wait_time=0):
-        self.backend.play_file("assets/sounds/and.wav",wait_time)
+        self.player.play("assets/sounds/and.wav",wait_time)
@@ -1,8 +1,12 @@
 from __future__ import annotations
-from typing import Protocol
+from typing import Iterator,Protocol
 from errors import DuplicateBarcodeError
 from datetime import datetime
+import time
 from fileAccess_model import resource_path
+from persistence_worker import Persistence_worker
+from reportExport_model import Report_export
+from itertools import islice
 
 VERSION = "v0.3.0-alpha - 7f3a1eb"
 class View(Protocol):
@@ -17,12 +21,20 @@ class View(Protocol):
         ...
     def create_filepath(self)->str:
         ...
-    def display_records(self,rows:list[list[str]])->None:
+    def get_export_filepath(self,title:str)->str:
+        ...
+    def display_records(self,rows:list[list[str]],found_barcodes=None,unknown_barcodes=None)->None:
+        ...
+    def detach_records(self,barcodes)->None:
+        ...
+    def reattach_records(self,barcodes)->None:
         ...
     def unknown_reel_found(self,barcode:str):
         ...
     def known_reel_found(self,barcode:str):
         ...
+    def reels_found(self,known_barcodes:list[str],unknown_barcodes:list[str],jump_to:str=None):
+        ...
     def clear_found(self,barcode:str):
         ...
     def display_popup(self,title:str,message:str)->None:
@@ -31,7 +43,11 @@ class View(Protocol):
         ...   
     def highlight_barcode(self,barcode:str)->None:
         ...
-    def show_report(self,found_count:int, unknown_count:int, missing_count:int, missing_reels:list[dict], unknown_reels:list[dict]):
+    def show_report(self,found_count:int, unknown_count:int, missing_count:int, columns:list[str]):
+        ...
+    def fill_report_table(self,table:str,reels:Iterator[dict],count:int):
+        ...
+    def show_progress(self,counts:dict[str,int],progress:dict[str,list[tuple]]):
         ...
     def setTitle(self,title:str)->None:
         ...
@@ -57,16 +73,30 @@ class View(Protocol):
         ...
     def get_search_filter_weight(self)->list[str]:
         ...
+    def after(self,ms:int,func)->str:
+        ...
+    def after_cancel(self,id:str)->None:
+        ...
+    def after_idle(self,func)->str:
+        ...
+    def close(self)->None:
+        ...
 class File_model(Protocol):
     """ Interface to the file model for file i/o"""
     def get_rows(self)->list[list[str]]:
         ...
+    def get_rows_many(self,filepaths:list[str])->list:
+        ...
     def save_progress(self, filepath:str,json_records:str)->None:
         ...
     def load_progress(self, filepath:str)->None:
         ...
+    def save_progress_bytes(self, filepath:str,data:bytes)->None:
+        ...
+    def load_progress_bytes(self, filepath:str)->bytes:
+        ...
 
-    def log_scanned_barcode(self, barcode: str):
+    def log_scanned_barcode(self, barcode: str, outcome: str = "found", timestamp: float = None):
         ...
     def get_latest_save_path(self)->str:
         ...
@@ -76,10 +106,27 @@ class File_model(Protocol):
         ...
     def archive_tests(self)->None:
         ...
+    def append_journal(self,filepath:str,event:str)->None:
+        ...
+    def append_journal_many(self,filepath:str,events:list[str])->None:
+        ...
+    def log_scanned_barcodes(self,entries:list[tuple[float,str,str]])->None:
+        ...
+    def close_files(self)->None:
+        ...
+    def load_journal(self,filepath:str)->str:
+        ...
+    def clear_journal(self,filepath:str)->None:
+        ...
 class Records_model(Protocol):
     """ Interface to the records model"""
+    REPORT_COLUMNS:tuple[str,...]   # keys of the reel data dictionaries in reports
+    REPORT_TABLES:tuple[str,...]    # reel lists shown in the report window
+    EXPORT_TABLES:tuple[str,...]    # reel lists get_report_reels can return
     def set_records(self,rows:list[list[str]],filepath:str)->None:
         ...
+    def set_records_many(self,sources:list[tuple[list[list[str]],str]])->None:
+        ...
     def get_records(self,hide_found:bool)->list[list[str]]:
         ...
     def barcode_exists(self,barcode:str)->bool:
@@ -90,6 +137,8 @@ class Records_model(Protocol):
         ...
     def mark_as_not_found(self,barcode:str):
         ...
+    def scan_barcodes(self,barcodes:list[str])->list[tuple[bool,bool,bool]]:
+        ...
     def get_test_barcode(self)->str|None:
         ...
     def get_found_barcodes(self)->list[str]|None:
@@ -106,12 +155,30 @@ class Records_model(Protocol):
         ...
     def is_record_found(self,barcode:str)->bool:
         ...
+    def get_counts(self)->dict[str,int]:
+        ...
+    def get_progress(self)->dict[str,list[tuple]]:
+        ...
+    def get_missing_reels(self)->list[dict]:
+        ...
+    def get_unknown_reels(self)->list[dict]:
+        ...
+    def get_report_reels(self,table:str,sort_by:str|tuple[str,...]=None,descending:bool=False,contains:str=None)->tuple[int,Iterator[dict]]:
+        ...
     def get_report(self)->dict:
         ...
     def to_json_str(self)->str:
         ...
     def load_from_json_str(self,json_str):
         ...
+    def to_compact_bytes(self)->bytes:
+        ...
+    def load_from_snapshot(self,data:bytes):
+        ...
+    def to_journal_str(self,event:str,barcode:str)->str:
+        ...
+    def apply_journal_str(self,journal_str:str)->int:
+        ...
     def clear_records(self)->None:
         ...
     def get_fileID(self)->dict[int,str]:
@@ -120,11 +187,23 @@ class Records_model(Protocol):
         ...   
     def get_records_filtered(self,barcode_filter=None,width_filter=None,weight_filter=None):
         ...
+    def match_records_filtered(self,barcode_filter=None,width_filter=None,weight_filter=None,within=None):
+        ...
+    def get_match_delta(self,old,new)->tuple[list[str],list[str]]:
+        ...
 class Scanner_model(Protocol):
     """ Interface to the barcode scanner model"""
     def startScanner(self,presenter:Stocktake_presenter) -> None:
         ...
+    def stopScanner(self) -> None:
+        ...
+    def get_scans(self) -> list[tuple[float,str]]:
+        ...
 class Sound_model(Protocol):
+    def start(self)->None:
+        ...
+    def interrupt(self)->None:
+        ...
     def play_duplicate_bc(self,wait_time:int=0):
         ...
     def play_unknown_bc(self,wait_time:int=0):
@@ -143,8 +222,17 @@ class Sound_model(Protocol):
 
 class Stocktake_presenter:
 
-    AUTOSAVE_COUNT = 1                  #Autosave will happen after this many scans
+    AUTOSAVE_COUNT = 100                #Every scan is journaled. The journal is compacted into a full snapshot after this many scans
     AUTOSAVE_COUNT_NEW_FILE = 10        #Autosave will create a new file after this many autosaves have been done
+    SEARCH_DELAY_MS = 150               #A search runs once no search digit has been typed for this long
+    COMPACT_SAVE_FILES = True           #Save snapshots in the compact binary format instead of json. Either format is detected on load
+    PERSISTENCE_ERROR_POLL_MS = 250     #How often write errors from the persistence worker thread are checked for and reported
+    SCANNER_POLL_MS = 20                #How often barcodes read by the scanner model's thread are collected and processed
+    PROGRESS_UPDATE_MS = 250            #The progress panel is redrawn at most this often, however fast scans come in
+    EXPORT_COLUMNS = ("barcode","material","width","weight","fileID")  #Columns written to report exports, in order. Any of the records model's REPORT_COLUMNS
+    EXPORT_ORDER = ("material","width") #Exported reels are ordered by these columns. None keeps the order they were loaded in
+    EXPORT_CHUNK_ROWS = 5000            #Rows written per after() callback while exporting, so scanning carries on during a big export
+    CLIPBOARD_PREVIEW_ROWS = 1000       #The copy buttons copy at most this many reels. Export the report for the full list
 
     def __init__(self,file_model:File_model,records_model:Records_model,view:View,scanner_model:Scanner_model,sound_model:Sound_model):
         self.file_model = file_model
@@ -152,15 +240,22 @@ class Stocktake_presenter:
         self.view = view
         self.scanner_model = scanner_model
         self.sound_model = sound_model
+        self.persistence = Persistence_worker(file_model)  #All save file, journal and log writes go through this background thread
         self._file_loaded = False 
         self._save_filepath = None
         self.filepath = None
-        self.barcodes_already_hidden = list() #When the gui hides barcodes that has been found, we keep track of those barcodes here in the presenter.
+        self.barcodes_already_hidden = set() #When the gui hides barcodes that has been found, we keep track of those barcodes here in the presenter.
+        self._view_hidden:set[str] = set()  #Barcodes of rows the view currently has detached outside of a search (hidden found reels)
+        self._view_matches = None           #Search match from the records model of the rows the view is showing, None when not showing a search
 
         self.scan_count = 0             #count of current scans that have been done
         self.file_paths = []            #file path arguments that were passed on loading app. (for dragging xls file onto exe )
         self.voice_enabled = True       #Start with voice alerts enabled
         self.in_search_mode = False     #Start not in search mode
+        self._search_after_id = None    #id of the pending (debounced) search from the view's after(), None if no search is pending
+        self._progress_after_id = None  #id of the pending progress panel redraw from the view's after(), None if none is pending
+        self._exports:list[tuple[str,Report_export]] = list()   #(table, export) of report exports still being written, oldest first
+        self._last_search = None        #(filters, search match) of the search currently displayed. A refined search only looks through its matches
         self.hide_found = False
     def set_file_paths(self,paths:list[str]):
         self.file_paths = paths
@@ -171,7 +266,8 @@ class Stocktake_presenter:
         self._file_loaded=False
         self._save_filepath = None
         self.filepath = None
-        self.barcodes_already_hidden = list()
+        self.barcodes_already_hidden = set()
+        self._view_hidden = set()
         self.records_model.clear_records()
 
     def run(self)->None:
@@ -182,28 +278,107 @@ class Stocktake_presenter:
             self.handle_start_new_btn()     # A filepath was passed that needs to be loaded as a new stocktake test
 
         self.scanner_model.startScanner(self)
-        self.view.mainloop()
+        self.view.after(self.SCANNER_POLL_MS,self._poll_scanner)
+        self.view.after(self.PERSISTENCE_ERROR_POLL_MS,self._poll_persistence_errors)
+        self.view.after_idle(self.sound_model.start)    # start audio in the background once the window has been drawn
+        try:
+            self.view.mainloop()
+        finally:
+            self.scanner_model.stopScanner()
+            self._finish_exports()
+            self.persistence.close()    # everything queued is written before the app exits
+
+    def _poll_scanner(self)->None:
+        """ Process the barcodes the scanner model has read since the last poll. Reschedules itself with the view's after()"""
+        scans = self.scanner_model.get_scans()
+        if scans:
+            self.barcodes_scanned([barcode for _,barcode in scans],[timestamp for timestamp,_ in scans])
+        self.view.after(self.SCANNER_POLL_MS,self._poll_scanner)
+
+    def _poll_persistence_errors(self)->None:
+        """ Report any writes that failed on the persistence worker thread. Reschedules itself with the view's after()"""
+        for error in self.persistence.get_errors():
+            self._send_message(message=error)
+        self.view.after(self.PERSISTENCE_ERROR_POLL_MS,self._poll_persistence_errors)
+
+    def handle_close(self)->None:
+        """ The main window is being closed. Wait for pending writes so no scans are lost, then close"""
+        self.scanner_model.stopScanner()
+        self._finish_exports()
+        self.persistence.close()
+        self.view.close()
     
+    def _schedule_progress_update(self)->None:
+        """ Redraw the progress panel once PROGRESS_UPDATE_MS has passed. Changes made before then are drawn by the same redraw"""
+        if self._progress_after_id is None:
+            self._progress_after_id = self.view.after(self.PROGRESS_UPDATE_MS,self._update_progress)
+
+    def _update_progress(self)->None:
+        self._progress_after_id = None
+        self.view.show_progress(self.records_model.get_counts(),self.records_model.get_progress())
+
     def _update_file_legend(self):
         """update the legend for each of the files loaded"""
         fileID = self.records_model.get_fileID()
         self.view.set_file_legend(fileID)
 
     def _display_records(self,hide_found:bool=None)->None:
-        """Fetch all record rows from the records_model and send them to view for displaying."""
-        rows = self.records_model.get_records(hide_found=hide_found)
-        self.view.display_records(rows)
+        """Fetch all record rows from the records_model and send them to view for displaying.
+            This is a full rebuild of the view, only needed when records are loaded. Hiding/showing and searching
+            use _set_hidden_records to send the view just the rows that change"""
+        rows = self.records_model.get_records(hide_found=False)
+        # found/unknown highlighting is applied by the view in one batch along with the rows
+        self.view.display_records(rows,found_barcodes=self.records_model.get_found_known_barcodes(),
+                                  unknown_barcodes=self.records_model.get_found_unknown_barcodes())
+        self._view_hidden = set()
+        self._view_matches = None   # search matches are only meaningful until records are loaded
+        self._last_search = None
+        if hide_found:
+            self.barcodes_already_hidden = set(self.records_model.get_found_barcodes())
+            self._set_hidden_records(self.barcodes_already_hidden)
         self._update_file_legend()
-
-        found_known_reels = self.records_model.get_found_known_barcodes()
-        found_unknown_reels = self.records_model.get_found_unknown_barcodes()
-
-        if hide_found==False:
-            for barcode in found_unknown_reels:
-                self.view.unknown_reel_found(barcode)
-    
-            for barcode in found_known_reels:
-                self.view.known_reel_found(barcode)
+        self._schedule_progress_update()
+
+    def _set_hidden_records(self,hidden:set[str])->None:
+        """ Make the view hide exactly the rows in hidden by detaching/reattaching only the rows that differ from
+            what the view is hiding now.
+            hidden:set[str] - barcodes that should not be displayed"""
+        to_detach = hidden - self._view_hidden
+        to_reattach = self._view_hidden - hidden
+        if to_reattach:
+            self.view.reattach_records(to_reattach)
+        if to_detach:
+            self.view.detach_records(to_detach)
+        self._view_hidden = set(hidden)
+
+    def _show_search_matches(self,matches)->None:
+        """ Make the view show only the rows of a search match from the records model, or every row when matches is None.
+            The records model works out the rows that stop or start being shown from its search index, so only those
+            rows are detached/reattached. Found reels hidden by hide found are shown during a search"""
+        if matches is None and self._view_matches is None:
+            return
+        if self._view_matches is None:
+            self._set_hidden_records(set())     # hidden found reels that match the search are shown
+        no_longer_shown,newly_shown = self.records_model.get_match_delta(self._view_matches,matches)
+        if newly_shown:
+            self.view.reattach_records(newly_shown)
+        if no_longer_shown:
+            self.view.detach_records(no_longer_shown)
+        self._view_matches = matches
+
+    def _cancel_search(self)->None:
+        """ Cancel any pending search, forget the last search results and show every row again, less any hidden found reels"""
+        if self._search_after_id is not None:
+            self.view.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        self._last_search = None
+        self.in_search_mode = False
+        self._show_search_matches(None)
+
+    def _exit_search_mode(self)->None:
+        """ Go back to showing all records (less any hidden found reels) after a search"""
+        self._cancel_search()
+        self._set_hidden_records(self.barcodes_already_hidden if self.hide_found else set())
 
         
     def _append_or_overwrite(self)->bool:
@@ -257,6 +432,8 @@ class Stocktake_presenter:
                 self.records_model.set_records(rows,filepath=self.filepath)
             except  DuplicateBarcodeError as e:
                 self.view.display_popup(title="Load File Error", message="The following is a list of reels that were NOT inserted because they have the same ID as a one already loaded:\n " + str(e)) #need to convert set records exeptions to a single string i think for this to work.
+            # the current save file's snapshot doesn't have the new reels, so scans of them can't be journaled against it
+            self._start_new_save_file()
         finally: # A failed loading of data into rows, or a success, either way we need to display records to either display the new data or clear the previously displayed data
             self._display_records()
             
@@ -264,47 +441,62 @@ class Stocktake_presenter:
 
     def handle_autoload(self,paths)->None:
         """Automatically loads stocktake data if a path was available on bootup in sys.argv[1:]
-            This gives the ability to drag an xls file onto the pyinstaller executeable and have it load"""
-        for path in paths:
-            try:
-                rows = self.file_model.get_rows(path) 
-            except FileNotFoundError as e:
-                self.view.display_popup(title="Load File", message = "File wasn't found, or you didn't select a file")
-            except ValueError as e:
-                self.view.display_popup(title="Load File", message = "Failed to load a file due to valueError.  Load button expects an Exel file format. Were you loading the correct file?")
+            This gives the ability to drag an xls file onto the pyinstaller executeable and have it load
+            All files are parsed in parallel and added to the records in one batch, in the order they were given
+            so fileIDs are always assigned the same way. The records are saved and displayed once."""
+        results = self.file_model.get_rows_many(paths)
+        sources = list()
+        for path,result in zip(paths,results):
+            if isinstance(result,FileNotFoundError):
+                self.view.display_popup(title="Load File", message = f"File wasn't found, or you didn't select a file: {path}")
+            elif isinstance(result,ValueError):
+                self.view.display_popup(title="Load File", message = f"Failed to load {path} due to valueError.  Load button expects an Exel file format. Were you loading the correct file?")
+            elif isinstance(result,Exception):
+                raise result
             else: # Successfully loaded a file which is stored in rows so we can try creating reel records from this
-                self._file_loaded = True
-                try:
-                    self.records_model.set_records(rows,filepath=path)
-                except  DuplicateBarcodeError as e:
-                    self.view.display_popup(title="Load File Error", message="The following is a list of reels that were NOT inserted because they have the same ID as a one already loaded:\n " + str(e)) #need to convert set records exeptions to a single string i think for this to work.
-                else:
-                    ...
-                    self.file_model.archive_tests() 
-                    self._autosave()    
-            finally: # A failed loading of data into rows, or a success, either way we need to display records to either display the new data or clear the previously displayed data
-        
-                self._display_records()
+                sources.append((result,path))
+
+        if sources:
+            self._file_loaded = True
+            try:
+                self.records_model.set_records_many(sources)
+            except  DuplicateBarcodeError as e:
+                self.view.display_popup(title="Load File Error", message="The following is a list of reels that were NOT inserted because they have the same ID as a one already loaded:\n " + str(e)) #need to convert set records exeptions to a single string i think for this to work.
+            self.persistence.flush()    # don't archive save files that are still being written
+            self.file_model.archive_tests() 
+            self._start_new_save_file()
+        # A failed loading of data into rows, or a success, either way we need to display records to either display the new data or clear the previously displayed data
+        self._display_records()
         
-                #self.view.setTitle(f"Loaded file: {paths}")
+        #self.view.setTitle(f"Loaded file: {paths}")
 
     def handle_report_btn(self, event=None) -> None:
-        report = self.records_model.get_report()
-        
-        self.view.show_report(found_count=report["found_count"],unknown_count=report["unknown_count"], missing_count=report["missing_count"], missing_reels=report["missing_reels"],unknown_reels=report["unknown_reels"])
+        counts = self.records_model.get_counts()
+        self.view.show_report(found_count=counts["found_count"],unknown_count=counts["unknown_count"], missing_count=counts["missing_count"],
+                              columns=list(self.records_model.REPORT_COLUMNS))
+        for table in self.records_model.REPORT_TABLES:
+            self.handle_report_table_change(table)
         #self.view.display_popup(title="Report Button",message="Rebort button is not yet implemented")
 
+    def handle_report_table_change(self,table:str,sort_by:str=None,descending:bool=False,contains:str="") -> None:
+        """ (Re)fill one of the report window's reel tables, sorted and filtered by the records model
+            table - one of the records model's REPORT_TABLES"""
+        count,reels = self.records_model.get_report_reels(table,sort_by=sort_by,descending=descending,contains=contains)
+        self.view.fill_report_table(table,reels,count)
+
     def handle_hide_btn(self) -> None:
-        self._display_records(hide_found=True)
         self.hide_found=True
+        self._cancel_search()
         found_barcodes = self.records_model.get_found_barcodes()
         if found_barcodes:
-            self.barcodes_already_hidden.extend(found_barcodes)
+            self.barcodes_already_hidden.update(found_barcodes)
+        self._set_hidden_records(self.barcodes_already_hidden)
 
     def handle_show_btn(self) -> None:
         self.hide_found=False
-        self._display_records(hide_found=False)
-        self.barcodes_already_hidden = list()
+        self._cancel_search()
+        self.barcodes_already_hidden = set()
+        self._set_hidden_records(set())
 
     def handle_test_btn(self) -> None:
         # generate an existing barcode or a unique barcode at radom with wighting for new barcode as less likely
@@ -319,16 +511,31 @@ class Stocktake_presenter:
             self.barcode_scanned(test_barcode)
 
     def _save_current_progress(self)->None:
-        """ Save the current progress of a stocktake test so it can be re-loaded later if need be."""
-        json_string = self.records_model.to_json_str()
-        try:
-            self.file_model.save_progress(self._save_filepath,json_string)
-        except FileNotFoundError as e:
-            self.view.display_popup(title="Save Progress", message = f"File was not found to save progress to:{self._save_filepath} ")
-            self._send_message(message="failed  saved",bell=False)
+        """ Save the current progress of a stocktake test so it can be re-loaded later if need be.
+            The snapshot is serialised here and written by the persistence worker, which clears the journal
+            for this save file once the snapshot is on disk. A failed write is reported by _poll_persistence_errors"""
+        if self.COMPACT_SAVE_FILES:
+            snapshot = self.records_model.to_compact_bytes()
         else:
-            ...
-            #self._send_message(message="Progress saved",bell=False)
+            snapshot = self.records_model.to_json_str()
+        self.persistence.save_snapshot(self._save_filepath,snapshot)
+
+    def _journal(self,event:str,barcode:str)->None:
+        """ Append a scan event to the journal of the current save file.
+            If there is no save file yet (new stocktake or just resumed) a snapshot is taken first for the journal to belong to"""
+        if self._save_filepath == None or self._save_filepath == "":
+            self.handle_save_btn()
+            return  # the snapshot already contains this event
+        self.persistence.append_journal(self._save_filepath,self.records_model.to_journal_str(event,barcode))
+
+    def _journal_many(self,events:list[tuple[str,str]])->None:
+        """ Append several (event, barcode) scan events to the journal of the current save file as one write"""
+        if not events:
+            return
+        if self._save_filepath == None or self._save_filepath == "":
+            self.handle_save_btn()
+            return  # the snapshot already contains these events
+        self.persistence.append_journal_many(self._save_filepath,[self.records_model.to_journal_str(event,barcode) for event,barcode in events])
     
     def handle_save_btn(self)->None:
         """ Does whatever needs to be done when the save stocktake progress button has been pressed"""
@@ -343,40 +550,52 @@ class Stocktake_presenter:
         self._save_current_progress()
         return
         
-    def _autosave(self)->None:
-        if (self.scan_count % self.AUTOSAVE_COUNT_NEW_FILE) == 0:
-            self._save_filepath=None
-            self.handle_save_btn()
-            files_to_delete = self.file_model.get_old_save_paths(num_of_files_to_keep=3)
-            for f in files_to_delete:
-                self.file_model.delete_file(f)
-        elif (self.scan_count % self.AUTOSAVE_COUNT) == 0:
+    def _autosave(self,previous_scan_count:int=None)->None:
+        """ Compact the scan journal into a snapshot every AUTOSAVE_COUNT scans,
+            starting a new save file every AUTOSAVE_COUNT_NEW_FILE snapshots
+            previous_scan_count - scan_count before a burst of scans, so a multiple of AUTOSAVE_COUNT passed in the burst is noticed.
+                                  Defaults to one scan ago"""
+        if previous_scan_count is None:
+            previous_scan_count = self.scan_count - 1
+        new_file_count = self.AUTOSAVE_COUNT * self.AUTOSAVE_COUNT_NEW_FILE
+        if self.scan_count // new_file_count != previous_scan_count // new_file_count:
+            self._start_new_save_file()
+        elif self.scan_count // self.AUTOSAVE_COUNT != previous_scan_count // self.AUTOSAVE_COUNT:
             self.handle_save_btn()
         return
 
+    def _start_new_save_file(self)->None:
+        """ Snapshot the records to a new save file, which later scans are journaled against, and delete old save files.
+            Needed whenever records are loaded, as the journal of the current save file can only be replayed on its own snapshot"""
+        self._save_filepath=None
+        self.handle_save_btn()
+        self.persistence.delete_old_saves(num_of_files_to_keep=3)
+
     def handle_load_stocktake_btn_old(self):
         load_file_path = self.view.get_filepath()
+        self.persistence.flush()    # the file being loaded may still have writes queued
         try:
-            json_string = self.file_model.load_progress(load_file_path)
+            snapshot = self.file_model.load_progress_bytes(load_file_path)
+            self.records_model.load_from_snapshot(snapshot)
         except FileNotFoundError as e:
             self.view.display_popup(title="Load Progress", message = "File was not found to load")
         except PermissionError as e:
             self.view.display_popup(title="Load Progress", message = "Permission Error while trying to open the stocktake file")
-        except UnicodeDecodeError as e:
+        except (UnicodeDecodeError,ValueError) as e:
             self.view.display_popup(title="Load Progress", message = "Failed to decode file. Maybe you opened the wrong file.")
 
         else:
-            self.records_model.load_from_json_str(json_string)
             self._save_filepath = None #reset existing safe filepath if one exists
             self._file_loaded=True
             self._display_records()
 
     def auto_load_save_file(self):
-        
+        self.persistence.flush()
         load_file_path = self.file_model.get_latest_save_path()
             
         try:
-            json_string = self.file_model.load_progress(load_file_path)
+            snapshot = self.file_model.load_progress_bytes(load_file_path)
+            self.records_model.load_from_snapshot(snapshot)
         except FileNotFoundError as e:
             load_new_file = self.view.display_popup_yes_no(title="Auto Load Progress failed", message=f"Auto-load failed to find a save file {load_file_path}, do you want to start a new stocktake"
                                            ,detail="Clicking yes will open a dialog box where you need to find the excel spreadhseet exported from sap." +
@@ -385,37 +604,83 @@ class Stocktake_presenter:
                 self.manual_load_xls()
                 if not self._file_loaded:
                     self.auto_load_save_file()
-                else:
-                    self._autosave()
             else:
                 self.view.close()
             #self.view.display_popup(title="Load Progress", message = f"File: {load_file_path} was not found to load")
         except PermissionError as e:
             self.view.display_popup(title="Load Progress", message = "Permission Error while trying to open the stocktake file")
-        except UnicodeDecodeError as e:
+        except (UnicodeDecodeError,ValueError) as e:
             self.view.display_popup(title="Load Progress", message = "Failed to decode file. Maybe you opened the wrong file.")
 
         else:
-            self.records_model.load_from_json_str(json_string)
+            replayed = self.records_model.apply_journal_str(self.file_model.load_journal(load_file_path))
             self._save_filepath = None #reset existing safe filepath if one exists
             self._file_loaded=True
             self._display_records()
             self._send_message(message=f"Loaded previous save file:\n-{load_file_path}\t")
+            if replayed:
+                self._send_message(message=f"Replayed {replayed} scans from the scan journal",bell=False)
 
-    def handle_scanner_code(self,barcode:str) -> None:
-        self.barcode_scanned(barcode=barcode)
+    def handle_scanner_code(self,barcode:str,timestamp:float=None) -> None:
+        """ timestamp - time.time() the scanner read the barcode. None for now"""
+        self.barcode_scanned(barcode=barcode,timestamp=timestamp)
 
     def handle_copy_missing_btn(self):
         """ Copy missing reels data to the clipboard"""
-        report = self.records_model.get_report()
-        reel_data_text = self._convert_dict_list_to_str(report["missing_reels"])
-        self.view.copy_lines_to_clipboard(reel_data_text)
+        self._copy_reels_to_clipboard("missing")
         
     def handle_copy_unknown_btn(self):
         """ Copy unknown reels data to the clipboard"""
-        report=self.records_model.get_report()
-        reel_data_text = self._convert_dict_list_to_str(report["unknown_reels"])
+        self._copy_reels_to_clipboard("unknown")
+
+    def _copy_reels_to_clipboard(self,table:str):
+        """ Copy a preview of one of the report's reel lists, at most CLIPBOARD_PREVIEW_ROWS reels, to the clipboard"""
+        count,reels = self.records_model.get_report_reels(table)
+        reel_data_text = self._convert_dict_list_to_str(islice(reels,self.CLIPBOARD_PREVIEW_ROWS))
         self.view.copy_lines_to_clipboard(reel_data_text)
+        if count > self.CLIPBOARD_PREVIEW_ROWS:
+            self._send_message(f"Copied the first {self.CLIPBOARD_PREVIEW_ROWS} of {count} {table} reels to the clipboard. Export the report for the full list",bell=False)
+
+    def handle_export_btn(self,table:str):
+        """ Export one of the report's reel lists to a csv, tsv or xlsx file chosen by the user.
+            The file is written EXPORT_CHUNK_ROWS reels at a time from the view's after() so scanning carries on while it's written
+            table - one of the records model's EXPORT_TABLES"""
+        filepath = self.view.get_export_filepath(title=f"Export {table} reels")
+        if not filepath:
+            return
+        count,reels = self.records_model.get_report_reels(table,sort_by=self.EXPORT_ORDER)
+        try:
+            export = Report_export(filepath,reels,self.EXPORT_COLUMNS,count)
+        except (OSError,ValueError) as e:
+            self.view.display_popup(title="Export Error",message=f"Couldn't export the {table} reels.\n{e}")
+            return
+        self._exports.append((table,export))
+        if len(self._exports) == 1:
+            self.view.after(0,self._write_exports)
+
+    def _write_exports(self)->None:
+        """ Write the next chunk of the oldest unfinished export. Reschedules itself with the view's after() until every export is done"""
+        table,export = self._exports[0]
+        try:
+            done = export.write_rows(self.EXPORT_CHUNK_ROWS)
+        except OSError as e:
+            self._exports.pop(0)
+            self._send_message(message=f"Export of {table} reels to {export.filepath} failed: {e}")
+        else:
+            if done:
+                self._exports.pop(0)
+                self._send_message(message=f"Exported {export.written} {table} reels to {export.filepath}",bell=False)
+        if self._exports:
+            self.view.after(1,self._write_exports)
+
+    def _finish_exports(self)->None:
+        """ Write the rest of any unfinished exports. Called when the app is closing"""
+        while self._exports:
+            table,export = self._exports.pop(0)
+            try:
+                export.write_rows()
+            except OSError as e:
+                print(f"Export of {table} reels to {export.filepath} failed: {e}")
 
     def handle_pretend_found(self,barcode:str):
         
@@ -440,16 +705,24 @@ class Stocktake_presenter:
         if self.records_model.is_record_unknown(barcode=barcode):   #unknown records are deleted. User must have scanned an unknown barcode that they now want to remove
             self.records_model.delete_record(barcode=barcode)   
             self.view.delete_record(barcode=barcode)
+            self._journal("deleted",barcode)
+            self._log_scanned_barcode(barcode=barcode,outcome="deleted")
+            self._schedule_progress_update()
             self._autosave()
 
 
         if self.records_model.is_record_known(barcode=barcode):    
             self.records_model.mark_as_not_found(barcode=barcode)
             self.view.clear_found(barcode)
+            self._journal("unfound",barcode)
+            self._log_scanned_barcode(barcode=barcode,outcome="unfound")
+            self._schedule_progress_update()
             self._autosave()
 
-    def _log_scanned_barcode(self,barcode:str):
-        self.file_model.log_scanned_barcode(barcode)
+    def _log_scanned_barcode(self,barcode:str,outcome:str,timestamp:float=None):
+        """ Append the scan to the daily scan log, an audit trail the stocktake can be rebuilt from if save files are lost
+            outcome - one of scanLog_model.SCAN_OUTCOMES"""
+        self.persistence.log_scanned_barcode(barcode,outcome,timestamp)
 
     def _check_data_loaded(self)->bool:
         if self._file_loaded == False:
@@ -480,81 +753,128 @@ class Stocktake_presenter:
             return False
         return True
     
-    def barcode_scanned(self,barcode:str) -> bool:
+    def barcode_scanned(self,barcode:str,timestamp:float=None) -> bool:
         """ Processes scanned barcode
             barcode:stl -  Barcode that was scanned by the barcode scanner
+            timestamp - time.time() the barcode was read if it was read before now, for the scan log
             -> Returns false if there was an issue with the barcode"""
+        results = self.barcodes_scanned([barcode],[timestamp])
+        return results[0] if results else False
+
+    def barcodes_scanned(self,barcodes:list[str],timestamps:list[float]=None) -> list[bool]:
+        """ Processes a burst of scanned barcodes, in the order they were scanned.
+            Each barcode is handled as if it was scanned on its own and gets the same message, but the records are
+            updated in one pass, the view is redrawn once, the journal and scan log are written as one request each and
+            a single sound summarises the burst.
+            barcodes - barcodes read by the barcode scanner
+            timestamps - time.time() each barcode was read, for the scan log. None for now
+            -> a result for each barcode, False if there was an issue with it"""
         
         #Whenever a barcode is scanned we change back into barcode scanning view 
-        if self.in_search_mode:
-            self._display_records(hide_found=self.hide_found)
+        if self.in_search_mode or self._search_after_id is not None:
+            self._exit_search_mode()
 
         # only do anything with a  barcode if a records file has already been loaded
         if not self._check_data_loaded():
-            return False
-        
-        result = True
-
-        incorrect_bc = not self._check_barcode_is_valid_looking(barcode)    #Barcode does not match the format that preprint reel barcodes are expected to be in
-        found_bc = self.records_model.is_record_known(barcode)                            #Barcode is of a Reel id that is in the stocktake data
-        duplicate_bc = self.records_model.is_record_found(barcode)                        #Barcode belongs to a record that has already been marked as found
-
-        self._log_scanned_barcode(barcode=barcode)  #emergency backup of scanned barcodes
-
-        #insert any unknown barcodes into the test records
-        if not self.records_model.barcode_exists(barcode):  
-            self.records_model.insert_unknown_reel(barcode)
-
-        #only update the records if the scanned barcode has not already been found
-        if not duplicate_bc:
-            self.records_model.mark_as_found(barcode)             
-        else:
-            #barcode has already been found. You are scanning the same barcode twice
-            result=False
-            
-        #Only highlight the barcode if it hasn't been hidden with the hide found option
-        if barcode not in self.barcodes_already_hidden:
-            if found_bc:
-                self.view.known_reel_found(barcode)
+            return [False] * len(barcodes)
+        if not barcodes:
+            return []
+        timestamps = timestamps or [None] * len(barcodes)
+
+        results = list()
+        log_entries = list()
+        journal_events = list()
+        known_to_show = list()
+        unknown_to_show = list()
+        messages = list()
+        any_good = any_incorrect = any_unknown = any_duplicate = False
+        now = time.time()
+
+        for barcode,timestamp,(found_bc,duplicate_bc,inserted) in zip(barcodes,timestamps,self.records_model.scan_barcodes(barcodes)):
+            incorrect_bc = not self._check_barcode_is_valid_looking(barcode)    #Barcode does not match the format that preprint reel barcodes are expected to be in
+                                                                                #found_bc - Barcode is of a Reel id that is in the stocktake data
+                                                                                #duplicate_bc - Barcode belongs to a record that had already been marked as found
+            if duplicate_bc:
+                outcome = "duplicate"
+            elif incorrect_bc:
+                outcome = "invalid"
+            elif not found_bc:
+                outcome = "unknown"
             else:
-                self.view.unknown_reel_found(barcode) 
-
-            self.view.jump_to_barcode(barcode)
-            self.view.highlight_barcode(barcode)
-
-        self.scan_count += 1
-        self._autosave()
+                outcome = "found"
+            log_entries.append((timestamp or now,outcome,barcode))  #emergency backup of scanned barcodes
+
+            #unknown barcodes have been inserted into the test records
+            if inserted:
+                journal_events.append(("unknown",barcode))
+            #only the records of barcodes that had not already been found are updated
+            if not duplicate_bc:
+                journal_events.append(("found",barcode))
+            results.append(not duplicate_bc)
+
+            #Only highlight the barcode if it hasn't been hidden with the hide found option
+            if barcode not in self.barcodes_already_hidden:
+                if found_bc:
+                    known_to_show.append(barcode)
+                else:
+                    unknown_to_show.append(barcode)
 
-        #play appropriate sounds and log messages
-        if found_bc and incorrect_bc==False and duplicate_bc==False:
-            self.sound_model.play_good() #only play a good ding when we scanned a known barcode for the first time
-            if self.voice_enabled: self.sound_model.play_found_bc(wait_time=150)
-        else:
-            self.sound_model.play_bad()
-            wait_time = 1500
+            if found_bc and incorrect_bc==False and duplicate_bc==False:
+                any_good = True
+                continue
             message_to_log:str = f'Barcode: {barcode} scanned '
             if incorrect_bc:
                 message_to_log = message_to_log + 'was of incorrect format'
-                if self.voice_enabled: self.sound_model.play_incorrect_bc(wait_time=wait_time)   #if incorrect format we don't care if it is a duplicate and will always be unknown so don't need to be informed of that either
+                any_incorrect = True
             else:
-                unknown_playing = False
                 if not found_bc: 
                     message_to_log = message_to_log + 'was not found in the stocktake data '
-                    if self.voice_enabled: self.sound_model.play_unknown_bc(wait_time=wait_time)
-                    wait_time=300
-                    unknown_playing = True
-
+                    any_unknown = True
                 if duplicate_bc: 
-                    if unknown_playing: 
-                        if self.voice_enabled: self.sound_model.play_and(wait_time=wait_time)
-                        wait_time = 500
+                    if not found_bc:
                         message_to_log = message_to_log + 'and '
-
-                    if self.voice_enabled: self.sound_model.play_duplicate_bc(wait_time=wait_time)
                     message_to_log = message_to_log + 'has already been scanned '
+                    any_duplicate = True
+            messages.append(message_to_log)
+
+        self.persistence.log_scanned_barcodes(log_entries)
+        self._journal_many(journal_events)
+
+        shown = known_to_show + unknown_to_show
+        if shown:
+            jump_to = next(barcode for barcode in reversed(barcodes) if barcode not in self.barcodes_already_hidden)
+            self.view.reels_found(known_to_show,unknown_to_show,jump_to=jump_to)
+        self._schedule_progress_update()
+
+        previous_scan_count = self.scan_count
+        self.scan_count += len(barcodes)
+        self._autosave(previous_scan_count)
+
+        #play one sound for the burst and log messages. Voice prompts still queued for the last scan are dropped
+        self.sound_model.interrupt()
+        if not (any_incorrect or any_unknown or any_duplicate):
+            if any_good:
+                self.sound_model.play_good() #only play a good ding when every barcode was a known barcode scanned for the first time
+                if self.voice_enabled: self.sound_model.play_found_bc(wait_time=150)
+        else:
+            self.sound_model.play_bad()
+            if self.voice_enabled:
+                wait_time = 1500
+                if any_incorrect:
+                    self.sound_model.play_incorrect_bc(wait_time=wait_time)   #if incorrect format we don't care if it is a duplicate and will always be unknown so don't need to be informed of that either
+                    wait_time = 300
+                if any_unknown:
+                    self.sound_model.play_unknown_bc(wait_time=wait_time)
+                    wait_time = 300
+                if any_duplicate:
+                    if any_unknown:
+                        self.sound_model.play_and(wait_time=wait_time)
+                        wait_time = 500
+                    self.sound_model.play_duplicate_bc(wait_time=wait_time)
+        for message_to_log in messages:
             self._send_message(message=message_to_log,bell=False)   
 
-        return result
+        return results
     
     def _convert_dict_list_to_str(self, list_dict:list[dict[list]]) ->str:
         """ Returns a string representation of a list of dictionaries 
@@ -567,25 +887,33 @@ class Stocktake_presenter:
         self.voice_enabled = self.view.is_voice_enabled()
 
     def search_by_filter(self):
-        """Search reel records based on filter specified in the view"""
+        """Search reel records based on filter specified in the view
+            Called on every digit typed, so the search itself is delayed until typing pauses for SEARCH_DELAY_MS.
+            Each call cancels the search that was still waiting to run."""
+        if self._search_after_id is not None:
+            self.view.after_cancel(self._search_after_id)
+        self._search_after_id = self.view.after(self.SEARCH_DELAY_MS,self._run_search)
+
+    def _run_search(self):
+        """Run the search with the filters that are currently in the view"""
+        self._search_after_id = None
+        filters = (self.view.get_search_filter_barcode(),self.view.get_search_filter_width(),self.view.get_search_filter_weight())
+        barcode_filter,width_filter,weight_filter = filters
+        within = None
+        if self.in_search_mode and self._last_search is not None and self._is_refined_search(self._last_search[0],filters):
+            within = self._last_search[1]   # A refined search can only match a subset of the last results, so only those are checked
+        matches = self.records_model.match_records_filtered(barcode_filter=barcode_filter,width_filter=width_filter,weight_filter=weight_filter,within=within)
+        # Rows that don't match are only detached, so found/unknown highlighting is kept
+        self._show_search_matches(matches)
         self.in_search_mode=True
-        barcode_filter = self.view.get_search_filter_barcode()
-        width_filter = self.view.get_search_filter_width()
-        weight_filter = self.view.get_search_filter_weight() 
-
-        rows = self.records_model.get_records_filtered(barcode_filter=barcode_filter,width_filter=width_filter,weight_filter=weight_filter)
-        self.view.display_records(rows)
-        #self._update_file_legend()
-
-        found_known_reels = self.records_model.get_found_known_barcodes()
-        found_unknown_reels = self.records_model.get_found_unknown_barcodes()
-
-        #I think this will throw an exception in view if i try to highlight a barcode that isn't in the search filter
-        #I'll be back
-        """
-        for barcode in found_unknown_reels:
-            self.view.unknown_reel_found(barcode)
-
-        for barcode in found_known_reels:
-            self.view.known_reel_found(barcode)
-            """
\ No newline at end of file
+        self._last_search = (filters,matches)
+
+    def _is_refined_search(self,old_filters,new_filters)->bool:
+        """ Return True if every character set in the old filters is set to the same character in the new filters"""
+        for old_filter,new_filter in zip(old_filters,new_filters):
+            old_filter = old_filter or []
+            new_filter = new_filter or []
+            for position,character in enumerate(old_filter):
+                if character and (position >= len(new_filter) or new_filter[position] != character):
+                    return False
+        return True
@@ -0,0 +1,31 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT),str(ROOT / "benchmarks")]
+
+from reelRecords_model import ReelRecords_model
+from stocktake_presenter import Stocktake_presenter
+from headless import Headless_view, Headless_sound_model, Headless_scanner_model, Temp_file_model
+
+""" Shared fixtures. Presenters are driven with the headless stand-ins in benchmarks/headless.py and keep their save files,
+    journals and scan logs in the test's temporary directory"""
+
+@pytest.fixture
+def make_presenter(tmp_path):
+    """ -> function that starts a presenter on the files in tmp_path, as if the app was (re)started
+        spreadsheets - {filepath: rows} the file dialog and autoload can open
+        Presenters are closed at the end of the test"""
+    presenters = list()
+    def make(spreadsheets:dict[str,list[list]]=None)->Stocktake_presenter:
+        file_model = Temp_file_model(tmp_path)
+        for filepath,rows in (spreadsheets or {}).items():
+            file_model.add_spreadsheet(filepath,rows)
+        presenter = Stocktake_presenter(file_model,ReelRecords_model(),Headless_view(),Headless_scanner_model(),Headless_sound_model())
+        presenters.append(presenter)
+        return presenter
+    yield make
+    for presenter in presenters:
+        presenter.persistence.close()
@@ -0,0 +1,58 @@
+import time
+
+from headless import Temp_file_model
+from rebuild_from_scan_log import rebuild
+from scanner_z3678_model import Fake_scan_source, Scanner_z3678_model
+from synthetic_data import make_rows
+
+""" Rebuilding a stocktake from the daily scan logs, and replaying the logs through the fake scanner"""
+
+ROWS = make_rows(20)
+
+def scanned_stocktake(make_presenter):
+    """ Run a stocktake with a burst of scans, a cleared reel and a deleted unknown reel
+        -> (its records, the scan logs it wrote)"""
+    presenter = make_presenter({"a.xlsx":ROWS})
+    presenter.handle_autoload(["a.xlsx"])
+    presenter.barcodes_scanned([ROWS[0][0],ROWS[1][0],"9900000001",ROWS[0][0],"9900000002","SHORT"])
+    presenter.handle_pretend_found(ROWS[1][0])
+    presenter.handle_pretend_found("9900000001")
+    presenter.barcodes_scanned([ROWS[2][0]])
+    presenter.persistence.close()
+    return presenter.records_model,sorted(str(path) for path in presenter.file_model.full_path_log_dir.glob("*.txt"))
+
+def test_rebuild_matches_the_stocktake(make_presenter,tmp_path):
+    records,logs = scanned_stocktake(make_presenter)
+    file_model = Temp_file_model(tmp_path)
+    file_model.add_spreadsheet("a.xlsx",ROWS)
+
+    rebuilt = rebuild(logs,["a.xlsx"],file_model)
+    assert rebuilt.get_barcodes() == records.get_barcodes()
+    assert rebuilt.get_found_barcodes() == records.get_found_barcodes()
+    assert rebuilt.get_unknown_barcodes() == records.get_unknown_barcodes()
+    assert rebuilt.get_report() == records.get_report()
+
+def test_rebuild_from_old_log_format(tmp_path):
+    log = tmp_path / "old.txt"
+    log.write_text(f"{ROWS[3][0]}\n9900000001\n{ROWS[3][0]}\n{ROWS[4][0][:5]}",encoding="utf-8")    # last line was cut short
+    file_model = Temp_file_model(tmp_path)
+    file_model.add_spreadsheet("a.xlsx",ROWS)
+
+    rebuilt = rebuild([str(log)],["a.xlsx"],file_model)
+    assert rebuilt.get_found_barcodes() == [ROWS[3][0],"9900000001"]
+    assert rebuilt.get_unknown_barcodes() == ["9900000001"]
+
+def test_fake_scanner_replays_scans_from_the_log(make_presenter):
+    _,logs = scanned_stocktake(make_presenter)
+    expected = [ROWS[0][0],ROWS[1][0],"9900000001",ROWS[0][0],"9900000002","SHORT",ROWS[2][0]]
+    assert [barcode for _,barcode in Fake_scan_source.from_scan_log(logs[0]).scans] == expected
+
+    scanner = Scanner_z3678_model(f"fake:{logs[0]}@1000")
+    scanner.startScanner(None)
+    scans = list()
+    deadline = time.monotonic() + 5
+    while len(scans) < len(expected) and time.monotonic() < deadline:
+        scans += scanner.get_scans()
+        time.sleep(0.01)
+    scanner.stopScanner()
+    assert [barcode for _,barcode in scans] == expected
@@ -0,0 +1,190 @@
+import random
+import struct
+import zlib
+
+import pytest
+
+from reelRecords_model import ReelRecords_model, bitset_select
+from synthetic_data import make_rows
+
+""" ReelRecords_model: journal replay, compact snapshots and the positional search index"""
+
+ROWS = make_rows(300,seed=1)
+
+def loaded(rows=ROWS,filepath="a.xlsx")->ReelRecords_model:
+    records = ReelRecords_model()
+    records.set_records(rows,filepath)
+    return records
+
+def state(records:ReelRecords_model)->tuple[list[dict],dict[int,str]]:
+    """ Everything a save file holds about records, for comparing two models"""
+    return [record.to_dict() for record in records.records],records.get_fileID()
+
+def scan_burst(records:ReelRecords_model,barcodes:list[str])->list[str]:
+    """ Scan barcodes as Stocktake_presenter.barcodes_scanned does -> the journal lines it writes"""
+    journal = list()
+    for barcode,(_,duplicate,inserted) in zip(barcodes,records.scan_barcodes(barcodes)):
+        if inserted:
+            journal.append(records.to_journal_str("unknown",barcode))
+        if not duplicate:
+            journal.append(records.to_journal_str("found",barcode))
+    return journal
+
+def linear_match(records:ReelRecords_model,barcode_filter,width_filter,weight_filter)->list[str]:
+    """ The barcodes matching the filters, checked one record at a time with str_matches_filter"""
+    return [record.barcode for record in records.records
+            if records.str_matches_filter(record.barcode,barcode_filter)
+            and records.str_matches_filter(str(record.width),width_filter)
+            and records.str_matches_filter(str(record.weight),weight_filter)]
+
+def random_filter(rand:random.Random,a_string:str,length:int,fill:float)->list[str]:
+    """ A search filter of length boxes with each character of a_string filled in with probability fill"""
+    return [c if rand.random() < fill else "" for c in a_string[:length]] + [""] * (length - len(a_string[:length]))
+
+
+def test_journal_replay_across_burst_clear_and_delete():
+    live = loaded()
+    snapshot = live.to_compact_bytes()
+    barcodes = live.get_barcodes()
+    journal = scan_burst(live,[barcodes[0],barcodes[1],"9900000001",barcodes[2],"9900000002",barcodes[1]])
+    live.mark_as_not_found(barcodes[1])
+    journal.append(live.to_journal_str("unfound",barcodes[1]))
+    live.delete_record("9900000001")
+    journal.append(live.to_journal_str("deleted","9900000001"))
+    journal += scan_burst(live,["9900000001",barcodes[3]])
+
+    replayed = ReelRecords_model()
+    replayed.load_from_snapshot(snapshot)
+    assert replayed.apply_journal_str("\n".join(journal)) == len(journal)
+    assert state(replayed) == state(live)
+    assert replayed.get_found_barcodes() == live.get_found_barcodes()
+    assert replayed.get_unknown_barcodes() == live.get_unknown_barcodes()
+    assert replayed.get_counts() == live.get_counts()
+
+def test_journal_replay_is_idempotent_and_skips_a_torn_last_line():
+    live = loaded()
+    barcodes = live.get_barcodes()
+    journal = scan_burst(live,[barcodes[5],"9900000003"])
+    live.delete_record("9900000003")
+    journal.append(live.to_journal_str("deleted","9900000003"))
+
+    replayed = loaded()
+    text = "\n".join(journal)
+    replayed.apply_journal_str(text)
+    replayed.apply_journal_str(text + "\n" + live.to_journal_str("found",barcodes[6])[:-5])
+    assert state(replayed) == state(live)
+
+def test_journal_replay_after_clearing_records():
+    live = loaded()
+    live.clear_records()
+    live.set_records(ROWS[:10],"b.xlsx")
+    snapshot = live.to_compact_bytes()
+    journal = scan_burst(live,[ROWS[0][0],ROWS[20][0]])     # ROWS[20] was cleared with the first spreadsheet so is unknown now
+
+    replayed = ReelRecords_model()
+    replayed.load_from_snapshot(snapshot)
+    replayed.apply_journal_str("\n".join(journal))
+    assert state(replayed) == state(live)
+    assert replayed.get_unknown_barcodes() == [ROWS[20][0]]
+
+def test_compact_snapshot_round_trip():
+    records = loaded()
+    records.set_records(make_rows(20,first_barcode=6130000000),"b.xlsx")
+    barcodes = records.get_barcodes()
+    records.scan_barcodes([barcodes[0],barcodes[-1],"9900000001","SHORT"])
+    records.delete_record(barcodes[7])
+
+    restored = ReelRecords_model()
+    restored.load_from_compact_bytes(records.to_compact_bytes())
+    assert state(restored) == state(records)
+    assert restored.get_counts() == records.get_counts()
+    assert restored.get_progress() == records.get_progress()
+
+def test_compact_snapshot_round_trip_of_no_records():
+    restored = loaded()
+    restored.load_from_compact_bytes(ReelRecords_model().to_compact_bytes())
+    assert restored.get_barcodes() == []
+
+def test_compact_snapshot_matches_json():
+    records = loaded()
+    records.scan_barcodes([ROWS[3][0],"9900000001"])
+    from_json = ReelRecords_model()
+    from_json.load_from_snapshot(records.to_json_str().encode("utf-8"))
+    from_compact = ReelRecords_model()
+    from_compact.load_from_snapshot(records.to_compact_bytes())
+    assert state(from_compact) == state(from_json)
+
+@pytest.mark.parametrize("cut",[5,6,20,-40,-1])
+def test_truncated_compact_snapshot_raises_value_error(cut):
+    snapshot = loaded().to_compact_bytes()
+    records = loaded(ROWS[:5],"b.xlsx")
+    before = state(records)
+    with pytest.raises(ValueError):
+        records.load_from_compact_bytes(snapshot[:cut])
+    assert state(records) == before
+
+def test_corrupt_compact_snapshot_raises_value_error():
+    records = loaded()
+    snapshot = bytearray(records.to_compact_bytes())
+    snapshot[len(snapshot) // 2] ^= 0xFF
+    before = state(records)
+    with pytest.raises(ValueError):
+        records.load_from_compact_bytes(bytes(snapshot))
+    assert state(records) == before
+
+def test_compact_snapshot_with_missing_sections_raises_value_error():
+    body = zlib.decompress(loaded().to_compact_bytes()[5:])
+    (meta_length,) = struct.unpack_from("<I",body)
+    only_meta = body[:4 + meta_length]
+    with pytest.raises(ValueError):
+        ReelRecords_model().load_from_compact_bytes(ReelRecords_model.SNAPSHOT_MAGIC + bytes([ReelRecords_model.SNAPSHOT_VERSION]) + zlib.compress(only_meta))
+
+def test_search_index_matches_linear_filter():
+    rand = random.Random(2)
+    records = loaded()
+    barcodes = records.get_barcodes()
+    for barcode in rand.sample(barcodes,30):
+        records.delete_record(barcode)
+    for n in range(10):
+        records.insert_unknown_reel(f"99000000{n:02}")
+    records.delete_record("9900000003")
+    records.insert_unknown_reel("9900000003")   # reinserted after a delete
+    records.insert_unknown_reel("ABC")          # shorter than the filters
+
+    for _ in range(300):
+        record = rand.choice(records.records)
+        filters = (random_filter(rand,record.barcode,10,0.3),random_filter(rand,str(record.width),4,0.3),random_filter(rand,str(record.weight),4,0.2))
+        expected = linear_match(records,*filters)
+        assert records.get_barcodes_filtered(*filters) == expected
+        assert records.count_records_filtered(*filters) == len(expected)
+        assert list(bitset_select(records._search_barcodes,records.match_records_filtered(*filters))) == expected
+
+def test_refined_search_within_previous_match():
+    rand = random.Random(3)
+    records = loaded()
+    for _ in range(100):
+        barcode = rand.choice(records.get_barcodes())
+        wide = random_filter(rand,barcode,10,0.2)
+        narrow = [c or (barcode[i] if rand.random() < 0.3 else "") for i,c in enumerate(wide)]
+        within = records.match_records_filtered(wide)
+        records.delete_record(rand.choice(records.get_barcodes()))     # reels deleted since the previous match drop out of it
+        assert records.match_records_filtered(narrow,within=within) == records.match_records_filtered(narrow)
+
+def test_match_delta():
+    records = loaded()
+    old = records.match_records_filtered(list("612"))
+    new = records.match_records_filtered(list("6120"))
+    removed = records.get_barcodes()[-1]
+    records.delete_record(removed)
+
+    no_longer,newly = records.get_match_delta(old,new)
+    old_barcodes = set(linear_match(records,list("612"),[""],[""]))
+    new_barcodes = set(linear_match(records,list("6120"),[""],[""]))
+    assert no_longer == [barcode for barcode in records.get_barcodes() if barcode in old_barcodes - new_barcodes]
+    assert newly == []
+    assert removed not in no_longer
+
+    everything_else,none = records.get_match_delta(None,new)
+    assert none == []
+    assert set(everything_else) == set(records.get_barcodes()) - new_barcodes
+    assert records.get_match_delta(new,None) == ([],everything_else)
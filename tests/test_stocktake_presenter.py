@@ -0,0 +1,75 @@
+from synthetic_data import make_rows
+
+""" Stocktake_presenter driven headless: what a restarted app loads back from the save files and journal"""
+
+A_ROWS = make_rows(5)
+B_ROWS = make_rows(5,first_barcode=6130000000)
+
+def restart(presenter,make_presenter):
+    """ Close presenter, writing everything it has queued, and start a new one on the same files"""
+    presenter.persistence.close()
+    restarted = make_presenter()
+    restarted.auto_load_save_file()
+    return restarted
+
+def append_spreadsheet(presenter,filepath:str)->None:
+    """ Load filepath with the load button, answering yes to appending it to the reels already loaded"""
+    presenter.view.filepath = filepath
+    presenter.view.answer_yes = True
+    presenter.handle_load_btn()
+
+def test_scans_of_appended_spreadsheet_survive_restart(make_presenter):
+    presenter = make_presenter({"a.xlsx":A_ROWS,"b.xlsx":B_ROWS})
+    presenter.handle_autoload(["a.xlsx"])
+    presenter.barcodes_scanned([A_ROWS[0][0]])
+    append_spreadsheet(presenter,"b.xlsx")
+    presenter.barcodes_scanned([B_ROWS[0][0]])
+    presenter.barcodes_scanned([B_ROWS[1][0]])
+
+    records = restart(presenter,make_presenter).records_model
+    assert records.get_barcodes() == [row[0] for row in A_ROWS + B_ROWS]
+    assert records.get_found_barcodes() == [A_ROWS[0][0],B_ROWS[0][0],B_ROWS[1][0]]
+    assert records.get_fileID() == {0:"a.xlsx",1:"b.xlsx"}
+
+def test_appended_spreadsheet_survives_restart_without_scans(make_presenter):
+    presenter = make_presenter({"a.xlsx":A_ROWS,"b.xlsx":B_ROWS})
+    presenter.handle_autoload(["a.xlsx"])
+    append_spreadsheet(presenter,"b.xlsx")
+
+    records = restart(presenter,make_presenter).records_model
+    assert records.get_barcodes() == [row[0] for row in A_ROWS + B_ROWS]
+
+def test_scans_after_restart_are_kept(make_presenter):
+    presenter = make_presenter({"a.xlsx":A_ROWS})
+    presenter.handle_autoload(["a.xlsx"])
+    presenter.barcodes_scanned([A_ROWS[0][0],"9900000001"])
+    presenter = restart(presenter,make_presenter)
+    presenter.barcodes_scanned([A_ROWS[1][0]])
+
+    records = restart(presenter,make_presenter).records_model
+    assert records.get_found_barcodes() == [A_ROWS[0][0],A_ROWS[1][0],"9900000001"]
+    assert records.get_unknown_barcodes() == ["9900000001"]
+
+def test_clears_and_deletes_are_replayed_after_restart(make_presenter):
+    presenter = make_presenter({"a.xlsx":A_ROWS})
+    presenter.handle_autoload(["a.xlsx"])
+    presenter.barcodes_scanned([A_ROWS[0][0],A_ROWS[1][0],"9900000001","9900000002"])
+    presenter.handle_pretend_found(A_ROWS[1][0])    # clears a found reel
+    presenter.handle_pretend_found("9900000001")    # deletes an unknown reel
+    presenter.barcodes_scanned([A_ROWS[1][0]])
+
+    records = restart(presenter,make_presenter).records_model
+    assert records.get_barcodes() == [row[0] for row in A_ROWS] + ["9900000002"]
+    assert records.get_found_barcodes() == [A_ROWS[0][0],A_ROWS[1][0],"9900000002"]
+
+def test_burst_past_an_autosave_is_replayed_after_restart(make_presenter):
+    rows = make_rows(300)
+    presenter = make_presenter({"a.xlsx":rows})
+    presenter.AUTOSAVE_COUNT = 50
+    presenter.handle_autoload(["a.xlsx"])
+    presenter.barcodes_scanned([row[0] for row in rows[:40]])
+    presenter.barcodes_scanned([row[0] for row in rows[40:120]])   # snapshots mid burst, the rest is journaled
+    presenter.barcodes_scanned(["9900000001",rows[0][0]])
+
+    records = restart(presenter,make_presenter).records_model
+    assert records.get_found_barcodes() == [row[0] for row in rows[:120]] + ["9900000001"]
@@ -1,7 +1,8 @@
 from tkinter import Tk,PhotoImage,Frame,Button,Text,messagebox,Toplevel,Label,NORMAL,END,INSERT,DISABLED,Event,Entry,TclError,Widget,BooleanVar,Checkbutton
-from typing import Any,Callable,Protocol
+from typing import Any,Callable,Iterator,Protocol
+from itertools import islice
 from tkinter.filedialog import askopenfilename,asksaveasfilename
-from tkinter.ttk import Treeview,Scrollbar,Style
+from tkinter.ttk import Treeview,Scrollbar,Style,Progressbar
 from fileAccess_model import resource_path
 
 #Here I set the interface that the presenter must use. 
@@ -23,7 +24,7 @@ class Presenter(Protocol):
         ...
     def handle_load_stocktake_btn(self) -> None:
         ...
-    def handle_scanner_code(self) -> None:
+    def handle_scanner_code(self,barcode:str) -> None:
         ...
     def handle_copy_unknown_btn(self):
         ...
@@ -39,12 +40,20 @@ class Presenter(Protocol):
         ...
     def continue_existing_btn(self):
         ...
+    def handle_close(self)->None:
+        ...
     def handle_voice_enabled_checkbutton(self):
         ...
     def search_by_filter(self):
         ...
+    def handle_report_table_change(self,table:str,sort_by:str=None,descending:bool=False,contains:str=""):
+        ...
+    def handle_export_btn(self,table:str):
+        ...
 
 class Tk_view(Tk):
+    REPORT_CHUNK_ROWS = 500         # report table rows inserted per after() callback
+    REPORT_CHUNK_DELAY_MS = 1       # gap between chunks, lets Tk redraw and handle scans between them
     def __init__(self,test_scan_enabled = False)->None:
         super().__init__()
         self.title("Reel Stocktake")
@@ -74,6 +83,10 @@ class Tk_view(Tk):
                 ]
         self.test_scan_enabled = test_scan_enabled
         self.presenter:Presenter = None
+        self.records_tree:Treeview = None       # created by the first display_records call
+        self.timing_overlay:Label = None        # created by the first show_timing_overlay call
+        self._report_window:Toplevel = None             # the open report window, None if there isn't one
+        self._report_tables:dict[str,dict] = dict()     # "missing"/"unknown" -> widgets and fill state of the open report window's tables
      
     def close(self):
         """close the applicaiton windows"""
@@ -268,6 +281,8 @@ class Tk_view(Tk):
         self.set_help(self.loaded_files_tree,"Excel reel inventory files will be listed here after they are loaded.\n" +
             "The text color here will match the reel data text color.")
         
+        self._create_ui_progress_widgets()
+
         self.messageFrame = Frame(master=self.fileLegendFrame)
         self.messageFrame.grid(row=2,column=0,sticky="nsew")
         self.messageFrame.columnconfigure(0,weight=1)
@@ -276,13 +291,43 @@ class Tk_view(Tk):
                                         "\n The most recent status message will be on the top")
 
         Label(master=self.messageFrame,font=self.section_font,text="Errors and Information Log").grid(row=0,column=0,pady=self.section_pady)
-        self.messageTextBox = Text(master=self.messageFrame,height=30)
+        self.messageTextBox = Text(master=self.messageFrame,height=20)     # shorter to leave room for the progress panel
         self.messageTextBox.grid(row=1,column=0,sticky="ew")
         self.messageTextBox.config(state=DISABLED)
               
+    def _create_ui_progress_widgets(self):
+        #Stocktake progress panel, between the file legend and the message log. Filled in by show_progress
+        self.progressFrame = Frame(master=self.fileLegendFrame)
+        self.progressFrame.grid(row=1,column=0,sticky="nsew")
+        self.progressFrame.columnconfigure(0,weight=1)
+
+        Label(master=self.progressFrame,font=self.section_font,text="Stocktake Progress").grid(row=0,column=0,pady=self.section_pady)
+        self.progress_summary = Label(master=self.progressFrame,text="No reel data loaded")
+        self.progress_summary.grid(row=1,column=0,sticky="w")
+
+        self.progress_tree = Treeview(master=self.progressFrame,columns=("Found","Total","Remaining"),show="tree headings",height=8)
+        self._set_group_tag_text_colors(self.progress_tree)
+        self.progress_tree.column("#0",width=300,stretch=True)
+        self.progress_tree.heading("#0",text="Group",anchor="w")
+        for col in ("Found","Total","Remaining"):
+            self.progress_tree.column(col,width=110,stretch=False,anchor="e")
+            self.progress_tree.heading(col,text=col,anchor="e")
+        progress_scrollbar = Scrollbar(master=self.progressFrame,orient="vertical",command=self.progress_tree.yview)
+        self.progress_tree.configure(yscrollcommand=progress_scrollbar.set)
+        self.progress_tree.grid(row=2,column=0,sticky="nsew")
+        progress_scrollbar.grid(row=2,column=1,sticky="ns")
+        self._progress_headings = {"material":"Material","width":"Width","fileID":"File"}
+        for field,heading in self._progress_headings.items():
+            self.progress_tree.insert("","end",iid=field,text=heading,open=(field == "material"))
+
+        self.set_help(self.progress_tree,"Found and total reels from the stocktake data for each material, width and file.\n" +
+            "Groups where every reel has been found are highlighted green.\n" +
+            "Unknown reels are not included. Updated a few times a second while scanning")
+
     def create_ui(self,presenter:Presenter):
         """Creates all components of the tkinter user interface"""
         self.presenter = presenter
+        self.protocol("WM_DELETE_WINDOW", presenter.handle_close)  # let pending saves finish before the window goes
         self._create_ui_top_level_gui_frames()   
         # Or explicitly for all Labels only
         self.option_add("*Label.Font", ("TkDefaultFont", 13))
@@ -549,17 +594,24 @@ class Tk_view(Tk):
     
     def create_filepath(self)->str:
         return asksaveasfilename(title="Save stocktake progress to this file")
+
+    def get_export_filepath(self,title:str)->str:
+        return asksaveasfilename(title=title,defaultextension=".xlsx",
+                                 filetypes=[("Excel workbook","*.xlsx"),("Comma separated","*.csv"),("Tab separated","*.tsv")])
     
-    def show_report(self,found_count:int, unknown_count:int, missing_count:int, missing_reels:list[dict], unknown_reels:list[dict]):
+    def show_report(self,found_count:int, unknown_count:int, missing_count:int, columns:list[str]):
         """ Display a report in a new window showing the completed stocktake results.
+            The missing and unknown reel tables start empty and are filled by fill_report_table
             
             found_count:int - The number of reels from the stocktake records that were found
             unknown_count:int - The number of new reels found that were not in the stocktake records
             missing_count:int - The number of reels that were not found from the stocktake records
-            missing_reels:list[dict] - reel data for the missing reels in the form of a list of dictionaries. Each dictionary is one reels information
-            unknown_reels:list[dict] - reel data for the reels found that were not in the stocktake data. Each dictionary is one reels information """
+            columns:list[str] - column names of the reel tables, the keys of the reel data dictionaries """
+        if self._report_window is not None:
+            self._report_window.destroy()   # one report at a time, the old one's tables would still be filling
         
         report_window = Toplevel()
+        self._report_window = report_window
         report_window.transient(self)
         report_window.title(f'Stocktake Report')
         report_window.rowconfigure(0,weight=1,pad=5)
@@ -639,66 +691,136 @@ class Tk_view(Tk):
         stats_tree.insert(parent="",index="end",values=("Number of Unknown Reels Found",unknown_count))
         stats_tree.insert(parent="",index="end",values=("Number of Reels Not Found",missing_count))
 
-        unknown_title=Label(master=unknown_reels_frame,text="Reels found that were not in the stocktake data")
-        unknown_title.grid(row=0,column=1)
-        unknown_title.config(bg=unknown_title.master["bg"])
-
-        unknown_copy_to_clipboard = Button(master=unknown_reels_frame,text="Copy data to clipboard",command=self.presenter.handle_copy_unknown_btn)
-        unknown_copy_to_clipboard.grid(row=0,column=0)
-
-        if len(unknown_reels) > 0:
-            column_headings = [key for key in unknown_reels[0].keys()]
-            unknown_reels_tree = Treeview(master=unknown_reels_frame,columns=column_headings,show="headings")
-
-            unknown_reels_tree.grid(row=1,column=0,padx=10,pady=10,columnspan=3)
-            # Create vertical scrollbar
-            unknown_scrollbar = Scrollbar(master=unknown_reels_frame, orient="vertical", command=unknown_reels_tree.yview)
-            unknown_scrollbar.grid(row=1, column=3, sticky="ns")
-            unknown_reels_tree.configure(yscrollcommand=unknown_scrollbar.set)
-
-            for heading in column_headings:
-                unknown_reels_tree.heading(heading, text=heading)
-                unknown_reels_tree.column(column=heading, stretch=True,minwidth=100)
-
-            for reel in unknown_reels:
-                unknown_reels_tree.insert(parent="",index="end",values=list(reel.values()))
-
-        
-        missing_title=Label(master=missing_reels_frame,text="Reels not found in the stocktake")
-        missing_title.config(bg=missing_title.master["bg"])
-
-        missing_copy_to_clipboard = Button(master=missing_reels_frame,text="Copy data to clipboard", command=self.presenter.handle_copy_missing_btn)
-        missing_copy_to_clipboard.grid(row=0,column=0)
-
-        missing_title.grid(row=0,column=1)
-        if len(missing_reels) > 0:
-            column_headings = [key for key in missing_reels[0].keys()]
-            missing_reels_tree = Treeview(master=missing_reels_frame,columns=column_headings,show="headings")
-            self._set_group_tag_text_colors(missing_reels_tree)
-            missing_reels_tree.grid(row=1,column=0,padx=10,pady=10, sticky="nse",columnspan=3)
-            # Create vertical scrollbar
-            missing_scrollbar = Scrollbar(master=missing_reels_frame, orient="vertical", command=missing_reels_tree.yview)
-            missing_scrollbar.grid(row=1, column=3, sticky="ns")
-            missing_reels_tree.configure(yscrollcommand=missing_scrollbar.set)
-
-            for heading in column_headings:
-                missing_reels_tree.heading(heading, text=heading)
-                missing_reels_tree.column(column=heading, stretch=True,minwidth=100)
-
-            for reel in missing_reels:               
-                group_number = list(reel.values())[4]
-
-                if group_number == None or str(group_number).lower()=="none":
-                    tags = ()
-                else:
-                    tags = self.group_color_tags[int(group_number)]
-
-                missing_reels_tree.insert(parent="",index="end",values=list(reel.values()),tags = tags)
-
-        
+        export_found_button = Button(master=stats_frame,text="Export found reels...",command=lambda: self.presenter.handle_export_btn("found"))
+        export_found_button.grid(row=2,column=0,pady=(5,0))
+
+        self._report_tables = dict()
+        self._create_report_table(master=unknown_reels_frame,table="unknown",title="Reels found that were not in the stocktake data",
+                                  copy_command=self.presenter.handle_copy_unknown_btn,columns=columns)
+        self._create_report_table(master=missing_reels_frame,table="missing",title="Reels not found in the stocktake",
+                                  copy_command=self.presenter.handle_copy_missing_btn,columns=columns)
+        report_window.bind("<Destroy>",lambda e: self._on_report_window_destroy(report_window) if e.widget is report_window else None)
+
+    def _create_report_table(self,master:Frame,table:str,title:str,copy_command:Callable,columns:list[str]):
+        """ Create one of the report window's reel tables, with its copy button, filter box and fill progress bar.
+            Clicking a column heading sorts by that column, clicking it again reverses the order.
+            Sorting and filtering are done by the presenter, which refills the table with fill_report_table"""
+        buttons_frame = Frame(master=master,bg=master["bg"])
+        buttons_frame.grid(row=0,column=0)
+        copy_button = Button(master=buttons_frame,text="Copy data to clipboard",command=copy_command)
+        copy_button.grid(row=0,column=0)
+        export_button = Button(master=buttons_frame,text="Export...",command=lambda: self.presenter.handle_export_btn(table))
+        export_button.grid(row=0,column=1)
+        title_label = Label(master=master,text=title)
+        title_label.config(bg=title_label.master["bg"])
+        title_label.grid(row=0,column=1)
+
+        filter_frame = Frame(master=master,bg=master["bg"])
+        filter_frame.grid(row=0,column=2,sticky="e")
+        Label(master=filter_frame,text="Filter:",bg=master["bg"]).grid(row=0,column=0)
+        filter_entry = Entry(master=filter_frame,width=15)
+        filter_entry.grid(row=0,column=1)
+        filter_entry.bind("<Return>",lambda e: self._refill_report_table(table))
+        Button(master=filter_frame,text="Apply",command=lambda: self._refill_report_table(table)).grid(row=0,column=2)
+
+        tree = Treeview(master=master,columns=columns,show="headings")
+        self._set_group_tag_text_colors(tree)
+        tree.grid(row=1,column=0,padx=10,pady=10,sticky="nse",columnspan=3)
+        scrollbar = Scrollbar(master=master,orient="vertical",command=tree.yview)
+        scrollbar.grid(row=1,column=3,sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+        for heading in columns:
+            tree.heading(heading,text=heading,command=lambda column=heading: self._sort_report_table(table,column))
+            tree.column(column=heading,stretch=True,minwidth=100)
+
+        progress_frame = Frame(master=master,bg=master["bg"])
+        progress_frame.grid(row=2,column=0,columnspan=3,sticky="we")
+        progress_label = Label(master=progress_frame,text="",bg=master["bg"])
+        progress_label.grid(row=0,column=0,sticky="w")
+        progress_bar = Progressbar(master=progress_frame,orient="horizontal",length=300,mode="determinate")
+        cancel_button = Button(master=progress_frame,text="Cancel",command=lambda: self._cancel_report_fill(table,cancelled=True))
+
+        self._report_tables[table] = {"tree":tree,"filter":filter_entry,"label":progress_label,"bar":progress_bar,"cancel":cancel_button,
+                                      "sort_by":None,"descending":False,"reels":None,"count":0,"loaded":0,"after_id":None}
+
+    def _sort_report_table(self,table:str,column:str):
+        state = self._report_tables[table]
+        state["descending"] = not state["descending"] if state["sort_by"] == column else False
+        state["sort_by"] = column
+        for heading in state["tree"]["columns"]:
+            arrow = (" \u25bc" if state["descending"] else " \u25b2") if heading == column else ""
+            state["tree"].heading(heading,text=heading + arrow)
+        self._refill_report_table(table)
+
+    def _refill_report_table(self,table:str):
+        state = self._report_tables[table]
+        self.presenter.handle_report_table_change(table,sort_by=state["sort_by"],descending=state["descending"],contains=state["filter"].get().strip())
+
+    def fill_report_table(self,table:str,reels:Iterator[dict],count:int):
+        """ Replace the rows of a report table. Rows are inserted REPORT_CHUNK_ROWS at a time from after() so a report of tens of
+            thousands of reels doesn't freeze the app while it opens. A fill that is still running is stopped first
+            table - "missing" or "unknown"
+            reels - reel data dicts in display order, read as the table is filled
+            count - how many reels there are, for the progress bar"""
+        state = self._report_tables.get(table)
+        if state is None:
+            return
+        self._cancel_report_fill(table)
+        tree = state["tree"]
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        state.update(reels=reels,count=count,loaded=0)
+        if count > self.REPORT_CHUNK_ROWS:
+            state["bar"].configure(maximum=count,value=0)
+            state["bar"].grid(row=0,column=1,padx=5)
+            state["cancel"].grid(row=0,column=2)
+        self._fill_report_chunk(table)
+
+    def _fill_report_chunk(self,table:str):
+        state = self._report_tables[table]
+        state["after_id"] = None
+        tree = state["tree"]
+        start = loaded = state["loaded"]
+        for reel in islice(state["reels"],self.REPORT_CHUNK_ROWS):
+            values = list(reel.values())
+            file_number = reel.get("fileID")
+            tags = self.group_color_tags[int(file_number)] if file_number is not None else ()   # unknown reels have no file
+            tree.insert(parent="",index="end",values=values,tags=tags)
+            loaded += 1
+        state["loaded"] = loaded
+        if loaded - start == self.REPORT_CHUNK_ROWS and loaded < state["count"]:
+            state["bar"].configure(value=loaded)
+            state["label"].config(text=f"Loading {loaded} of {state['count']} reels")
+            state["after_id"] = self.after(self.REPORT_CHUNK_DELAY_MS,lambda: self._fill_report_chunk(table))
+        else:
+            self._cancel_report_fill(table)
+
+    def _cancel_report_fill(self,table:str,cancelled:bool=False):
+        """ Stop filling a report table and hide its progress bar
+            cancelled - the user pressed cancel, so the table is left partly filled"""
+        state = self._report_tables[table]
+        if state["after_id"] is not None:
+            self.after_cancel(state["after_id"])
+            state["after_id"] = None
+        state["reels"] = None
+        state["bar"].grid_remove()
+        state["cancel"].grid_remove()
+        if cancelled:
+            state["label"].config(text=f"Showing {state['loaded']} of {state['count']} reels (cancelled)")
+        else:
+            state["label"].config(text=f"{state['loaded']} reels")
+
+    def _on_report_window_destroy(self,report_window:Toplevel):
+        """ The report window is closing, stop any fills that are still running"""
+        if report_window is not self._report_window:
+            return
+        for state in self._report_tables.values():
+            if state["after_id"] is not None:
+                self.after_cancel(state["after_id"])
+        self._report_tables = dict()
+        self._report_window = None
 
-        # Layout: Treeview on left, scrollbar on right
-        #self.records_tree.grid(row=0, column=0, sticky="nse")
     def _set_group_tag_text_colors(self,aTree:Treeview):
         """ create text color tags for a treeview object"""   
         aTree.tag_configure("green", background="lightgreen")
@@ -714,13 +836,41 @@ class Tk_view(Tk):
         aTree.tag_configure("dataID_7", foreground="orange")
         aTree.tag_configure("dataID_8", foreground="blue")
 
-    def display_records(self,records:list[list[str]])->None:
+    def display_records(self,records:list[list[str]],found_barcodes=None,unknown_barcodes=None)->None:
         """ Display records in the gui.
-            records:list[list[str]] - two dimensional list.. rows of column data"""
+            records:list[list[str]] - two dimensional list.. rows of column data
+            found_barcodes - barcodes of known reels that have been found, shown green
+            unknown_barcodes - barcodes of unknown reels that have been found, shown orange
 
-        self.iid_to_barcode_map = dict() # Used for mapping treeview rows to the barcode that it contains, so I can toggle colors based on barcodes.
+            The records treeview is windowed. Only the rows that fit in the visible area are materialized as
+            treeview items, scrolling just rewrites the values and tags of those items. This keeps loading and
+            redisplaying large stocktakes fast."""
         cols = records[0]
-        data = records[1:]
+        self._all_rows:list[list[str]] = list(records[1:])     # every row the view knows about, in display order
+        self._detached:set[str] = set()                         # barcodes of rows that are hidden from the table (see detach_records)
+        self._rebuild_visible_rows()
+        self._state_tags:dict[str,str] = dict()     # barcode -> "green"/"orange" background tag
+        for barcode in found_barcodes or ():
+            self._state_tags[barcode] = "green"
+        for barcode in unknown_barcodes or ():
+            self._state_tags[barcode] = "orange"
+        self._window_start = 0
+        self._selected_barcode = None
+
+        if self.records_tree is None:
+            self._create_records_tree(cols)
+        self.records_tree.configure(columns=cols)
+        for col in cols:
+            self.records_tree.heading(col, text=col,anchor="w")
+            self.records_tree.column(col, stretch=True,anchor="w")  # ensure columns expand
+
+        self._render_window()
+
+    def _create_records_tree(self,cols:list[str]):
+        """ Create the records treeview and its scrollbar. The treeview is reused by every display_records call"""
+        self.iid_to_barcode_map = dict() # Used for mapping treeview rows to the barcode that it contains, so I can toggle colors based on barcodes. Only holds the visible rows
+        self._row_slots:list[str] = list()   # iids of the treeview items that visible rows are written into
+        self._visible_row_count = 20         # updated from the actual treeview height once it is drawn
 
         self.records_tree = Treeview(master=self.recordsFrame,columns=cols,show="headings")
         self.set_help(self.records_tree,"Reel records that have been loaded are displayed here.\n" +
@@ -731,38 +881,185 @@ class Tk_view(Tk):
                         "If toggling is done on an orange unkown reel then it will delete that reel from the records")
         self._set_group_tag_text_colors(self.records_tree)
         self.records_tree.bind("<Control-space>", self.on_ctrl_space)
-        
-   
-        for col in cols:
-            self.records_tree.heading(col, text=col,anchor="w")
-            self.records_tree.column(col, stretch=True,anchor="w")  # ensure columns expand
-
-        # Insert data rows
-        for row in data:
-            group_number = row[-1]
-            
-            #print(f'group number is {group_number}')
-            if group_number == None or str(group_number).lower()=="none":
-                tags = ()
-            else:
-                tags = self.group_color_tags[int(group_number)]
-
-            iid = self.records_tree.insert("", "end", values=row,tags=tags) #last column in row is the group number and is not displayed in the treeview but is used here to set text color for different files data
-            self.iid_to_barcode_map[row[0]] = iid
-
-
-        # Create vertical scrollbar
-        scrollbar = Scrollbar(master=self.recordsFrame, orient="vertical", command=self.records_tree.yview)
-        self.records_tree.configure(yscrollcommand=scrollbar.set)
+        self.records_tree.bind("<Configure>", self._on_records_tree_resize)
+        self.records_tree.bind("<MouseWheel>", self._on_records_mousewheel)       # windows
+        self.records_tree.bind("<Button-4>", lambda e: self._scroll_records(-3))  # X11 scroll up
+        self.records_tree.bind("<Button-5>", lambda e: self._scroll_records(3))   # X11 scroll down
+        self.records_tree.bind("<Up>", self._on_records_key_up)
+        self.records_tree.bind("<Down>", self._on_records_key_down)
+        self.records_tree.bind("<Prior>", lambda e: self._scroll_records(-self._visible_row_count) or "break")
+        self.records_tree.bind("<Next>", lambda e: self._scroll_records(self._visible_row_count) or "break")
+        self.records_tree.bind("<<TreeviewSelect>>", self._on_records_select)
+
+        # Create vertical scrollbar. It scrolls the window of rows rather than the treeview itself
+        self.records_scrollbar = Scrollbar(master=self.recordsFrame, orient="vertical", command=self._on_records_scrollbar)
 
         # Layout: Treeview on left, scrollbar on right
         self.records_tree.grid(row=0, column=0, sticky="nse")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.records_scrollbar.grid(row=0, column=1, sticky="ns")
 
         # Make sure the treeview expands with the frame
         self.recordsFrame.rowconfigure(0, weight=1)
         self.recordsFrame.columnconfigure(0, weight=0)    
-      
+
+    def _rebuild_visible_rows(self):
+        """ Rebuild the list of rows that can be scrolled through (self._rows) from all rows minus the detached ones"""
+        if self._detached:
+            detached = self._detached
+            self._rows:list[list[str]] = [row for row in self._all_rows if row[0] not in detached]
+        else:
+            self._rows = list(self._all_rows)
+        self._row_positions:dict[str,int] = {row[0]: i for i,row in enumerate(self._rows)}    # barcode -> index in self._rows
+
+    def detach_records(self,barcodes)->None:
+        """ Hide rows from the records table without forgetting them, so they can be put back with reattach_records
+            barcodes - barcodes of the rows to hide"""
+        barcodes = set(barcodes) - self._detached
+        if not barcodes:
+            return
+        self._detached |= barcodes
+        if self._selected_barcode in barcodes:
+            self._selected_barcode = None
+        self._update_after_visible_rows_change(only_detached=True)
+
+    def reattach_records(self,barcodes)->None:
+        """ Put rows hidden by detach_records back into the records table in their original position
+            barcodes - barcodes of the rows to show again"""
+        barcodes = self._detached & set(barcodes)
+        if not barcodes:
+            return
+        self._detached -= barcodes
+        self._update_after_visible_rows_change()
+
+    def _update_after_visible_rows_change(self,only_detached:bool=False):
+        """ Rebuild the visible rows and keep the row at the top of the window in place if it is still visible
+            only_detached - rows were only detached, so the currently visible rows can be filtered instead of all rows"""
+        top_barcode = self._rows[self._window_start][0] if self._window_start < len(self._rows) else None
+        if only_detached:
+            detached = self._detached
+            self._rows = [row for row in self._rows if row[0] not in detached]
+            self._row_positions = {row[0]: i for i,row in enumerate(self._rows)}
+        else:
+            self._rebuild_visible_rows()
+        self._window_start = self._row_positions.get(top_barcode,0)
+        self._render_window()
+
+    def _row_tags(self,row:list[str])->tuple:
+        """ Tags for a row: file color tag from the group number in the last column plus any found/unknown background"""
+        group_number = row[-1] if len(row) > 4 else None
+        if group_number == None or str(group_number).lower()=="none" or group_number == "":
+            tags = ()
+        else:
+            tags = self.group_color_tags[int(group_number)]
+        state_tag = self._state_tags.get(row[0])
+        if state_tag:
+            tags = tags + (state_tag,)
+        return tags
+
+    def _render_window(self):
+        """ Write the rows from self._window_start onwards into the treeview item slots.
+            Slots are created or deleted so there is exactly one per visible row"""
+        tree = self.records_tree
+        max_start = max(0,len(self._rows) - self._visible_row_count)
+        self._window_start = min(max(0,self._window_start),max_start)
+        window = self._rows[self._window_start:self._window_start + self._visible_row_count]
+
+        while len(self._row_slots) < len(window):
+            self._row_slots.append(tree.insert("", "end"))
+        while len(self._row_slots) > len(window):
+            tree.delete(self._row_slots.pop())
+
+        self.iid_to_barcode_map = dict()
+        selected_iid = None
+        for iid,row in zip(self._row_slots,window):
+            tree.item(iid, values=row, tags=self._row_tags(row))   #last column in row is the group number and is not displayed in the treeview but is used here to set text color for different files data
+            self.iid_to_barcode_map[row[0]] = iid
+            if row[0] == self._selected_barcode:
+                selected_iid = iid
+
+        if selected_iid:
+            tree.selection_set(selected_iid)
+        elif tree.selection():
+            tree.selection_remove(*tree.selection())
+        self._update_records_scrollbar()
+
+    def _update_records_scrollbar(self):
+        total = len(self._rows)
+        if total == 0:
+            self.records_scrollbar.set(0,1)
+            return
+        first = self._window_start / total
+        last = min(1,(self._window_start + self._visible_row_count) / total)
+        self.records_scrollbar.set(first,last)
+
+    def _scroll_records(self,rows:int):
+        """ Move the window of displayed rows by a number of rows (negative is up)"""
+        self._window_start += rows
+        self._render_window()
+
+    def _on_records_scrollbar(self,*args):
+        """ Scrollbar command. args are ("moveto", fraction) or ("scroll", n, "units"|"pages")"""
+        if args[0] == "moveto":
+            self._window_start = int(float(args[1]) * len(self._rows))
+            self._render_window()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self._visible_row_count
+            self._scroll_records(amount)
+
+    def _on_records_mousewheel(self,event:Event):
+        self._scroll_records(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_records_key_up(self,event:Event):
+        """ Scroll the window up when moving past the first displayed row"""
+        if self._row_slots and self.records_tree.focus() == self._row_slots[0] and self._window_start > 0:
+            self._scroll_records(-1)
+            self._select_slot(0)
+            return "break"
+
+    def _on_records_key_down(self,event:Event):
+        """ Scroll the window down when moving past the last displayed row"""
+        if self._row_slots and self.records_tree.focus() == self._row_slots[-1]:
+            self._scroll_records(1)
+            self._select_slot(len(self._row_slots) - 1)
+            return "break"
+
+    def _select_slot(self,slot:int):
+        iid = self._row_slots[slot]
+        self.records_tree.focus(iid)
+        self.records_tree.selection_set(iid)
+
+    def _on_records_select(self,event:Event):
+        """ Remember which barcode is selected so the selection follows the row as the window scrolls"""
+        selection = self.records_tree.selection()
+        if selection:
+            self._selected_barcode = self.records_tree.item(selection[0],"values")[0]
+
+    def _on_records_tree_resize(self,event:Event):
+        """ Work out how many rows fit in the treeview and re-render the window if that has changed"""
+        row_height = 0
+        heading_height = 0
+        if self._row_slots:
+            bbox = self.records_tree.bbox(self._row_slots[0])
+            if bbox:
+                heading_height,row_height = bbox[1],bbox[3]
+        if not row_height:
+            row_height = 30
+            heading_height = 35
+        visible_row_count = max(1,(event.height - heading_height) // row_height)
+        if visible_row_count != self._visible_row_count:
+            self._visible_row_count = visible_row_count
+            self._render_window()
+
+    def _refresh_row(self,barcode:str):
+        """ Rewrite the treeview item for barcode if it is currently displayed"""
+        iid = self.iid_to_barcode_map.get(barcode)
+        if iid is not None:
+            row = self._rows[self._row_positions[barcode]]
+            self.records_tree.item(iid, values=row, tags=self._row_tags(row))
+
     def set_file_legend(self,fileID:dict[int,str]):
         """clears and repoplulates the file id/filepath legend treeview widget"""
         self.loaded_files_tree.delete(*self.loaded_files_tree.get_children())
@@ -772,42 +1069,59 @@ class Tk_view(Tk):
     def unknown_reel_found(self,barcode:str):
         """ Insert an unkown reel into the table and mark it orange
             barcode:str - barcode of the reel to be inserted"""
-        if barcode not in self.iid_to_barcode_map.keys():      
-            self.iid_to_barcode_map[barcode] = self.records_tree.insert("", "end", values=[barcode,"","",""],tags=())
-        iid = self.iid_to_barcode_map[barcode]
-        #self.records_tree.item(iid, tags="orange",)
-
-        tags = self.records_tree.item(iid, 'tags') or ()
-        if isinstance(tags, str):
-            tags = (tags,)
-        self.records_tree.item(iid, tags=tags + ("orange",))
+        if barcode not in self._row_positions and barcode not in self._detached:      
+            row = [barcode,"","",""]
+            self._all_rows.append(row)
+            self._row_positions[barcode] = len(self._rows)
+            self._rows.append(row)
+        self._state_tags[barcode] = "orange"
+        if barcode in self.iid_to_barcode_map:
+            self._refresh_row(barcode)
+        else:
+            self._render_window()   # the new row may now fall inside the displayed window
+
+    def reels_found(self,known_barcodes:list[str],unknown_barcodes:list[str],jump_to:str=None):
+        """ Mark a burst of scanned reels found with a single redraw of the table.
+            Unknown reels are inserted and marked orange, known reels are marked green
+            jump_to:str - barcode to scroll to and highlight, usually the last one scanned"""
+        for barcode in unknown_barcodes:
+            if barcode not in self._row_positions and barcode not in self._detached:
+                row = [barcode,"","",""]
+                self._all_rows.append(row)
+                self._row_positions[barcode] = len(self._rows)
+                self._rows.append(row)
+            self._state_tags[barcode] = "orange"
+        for barcode in known_barcodes:
+            self._state_tags[barcode] = "green"
+        if jump_to is not None and jump_to not in self.iid_to_barcode_map and jump_to in self._row_positions:
+            self._window_start = self._row_positions[jump_to] - self._visible_row_count // 2
+        self._render_window()
+        if jump_to is not None and jump_to in self.iid_to_barcode_map:
+            self.highlight_barcode(jump_to)
 
     def known_reel_found(self,barcode:str):
         """ Mark reel in the table green"""
-        iid = self.iid_to_barcode_map[barcode]  
-        tags = self.records_tree.item(iid, 'tags') or ()
-        if isinstance(tags, str):
-            tags = (tags,)
-        
-        #self.records_tree.item(iid, tags="green",)
-        self.records_tree.item(iid, tags=self.records_tree.item(iid,'tags') + ("green",))
+        self._state_tags[barcode] = "green"
+        self._refresh_row(barcode)
 
     def clear_found(self,barcode:str):
         """Remove colored background for record in records tree"""  
-        iid = self.iid_to_barcode_map[barcode]
-        tags:tuple = self.records_tree.item(iid,'tags') or ()
-        #print(f'tags for {barcode} is {tags}')
-        tags = tuple(tag for tag in tags if tag != 'green')
-        #print(f'tags after removal of orange and gree for {barcode} is {tags}')
-        if isinstance(tags, str):
-            tags = (tags,)   
-        #self.records_tree.item(iid, tags="green",)
-        self.records_tree.item(iid, tags=tags)
+        if self._state_tags.get(barcode) == "green":
+            del self._state_tags[barcode]
+        self._refresh_row(barcode)
     
     def delete_record(self,barcode:str):
-        iid = self.iid_to_barcode_map[barcode]
-        self.records_tree.delete(iid)
-        self.iid_to_barcode_map.pop(barcode)
+        self._all_rows = [row for row in self._all_rows if row[0] != barcode]
+        self._detached.discard(barcode)
+        position = self._row_positions.pop(barcode,None)
+        if position is not None:
+            del self._rows[position]
+            for row in self._rows[position:]:
+                self._row_positions[row[0]] -= 1
+        self._state_tags.pop(barcode,None)
+        if self._selected_barcode == barcode:
+            self._selected_barcode = None
+        self._render_window()
 
 
     def display_popup(self,title:str,message:str):
@@ -818,16 +1132,68 @@ class Tk_view(Tk):
 
     def jump_to_barcode(self,barcode:str)->None:
         """move the treeview to the position of the barcode"""
-        iid = self.iid_to_barcode_map[barcode]
-        self.records_tree.see(iid)
+        if barcode in self.iid_to_barcode_map:
+            return  # already on screen
+        position = self._row_positions[barcode]
+        self._window_start = position - self._visible_row_count // 2   # put the barcode in the middle of the window
+        self._render_window()
     def highlight_barcode(self,barcode:str)->None:
         """ Highlight the barcode in the treeview"""
+        self._selected_barcode = barcode
         self.records_tree.selection_set(self.iid_to_barcode_map[barcode])
 
     def setTitle(self,title:str) ->None:
         """Set the main window title"""
         self.title(title)
 
+    def show_timing_overlay(self,breakdown:list[tuple[str,float]]):
+        """ Show how long the last scan took, and each step of it, in a small label over the top right of the window
+            breakdown - (step name, seconds) with the whole scan first. Only used when instrumentation is turned on"""
+        if self.timing_overlay is None:
+            self.timing_overlay = Label(master=self,justify="left",anchor="ne",font=("TkFixedFont",9),
+                                        background="black",foreground="lime",relief="solid",borderwidth=1)
+            self.timing_overlay.place(relx=1.0,rely=0.0,anchor="ne")
+        lines = [f"{name:<32}{seconds*1000:>8.2f} ms" for name,seconds in breakdown]
+        self.timing_overlay.config(text="\n".join(lines))
+        self.timing_overlay.lift()
+
+    def show_progress(self,counts:dict[str,int],progress:dict[str,list[tuple]]):
+        """ Update the stocktake progress panel. Existing rows are rewritten in place so the expanded groups and scroll position are kept
+            counts - found_count/unknown_count/missing_count of the whole stocktake
+            progress - field -> [(value, found count, total count)] for each of material, width and fileID"""
+        found,missing = counts["found_count"],counts["missing_count"]
+        total = found + missing
+        percent = 100 * found / total if total else 0
+        self.progress_summary.config(text=f"Found {found} of {total} reels ({percent:.1f}%)    Missing {missing}    Unknown {counts['unknown_count']}")
+
+        tree = self.progress_tree
+        for field,groups in progress.items():
+            if not tree.exists(field):
+                continue
+            field_found = sum(group_found for _,group_found,_ in groups)
+            field_total = sum(group_total for _,_,group_total in groups)
+            tree.item(field,values=(field_found,field_total,field_total - field_found))
+            wanted = list()
+            for value,group_found,group_total in groups:
+                iid = f"{field}:{value}"
+                wanted.append(iid)
+                values = (group_found,group_total,group_total - group_found)
+                tags = ("green",) if group_found == group_total else ()
+                if field == "fileID" and value is not None and value < len(self.group_color_tags):
+                    tags += self.group_color_tags[value]    # same text color as the file legend and the file's reels
+                if tree.exists(iid):
+                    tree.item(iid,values=values,tags=tags)
+                else:
+                    tree.insert(field,"end",iid=iid,text="" if value is None else str(value),values=values,tags=tags)
+            existing = tree.get_children(field)
+            wanted_set = set(wanted)
+            gone = [iid for iid in existing if iid not in wanted_set]
+            if gone:
+                tree.delete(*gone)
+            if list(tree.get_children(field)) != wanted:     # a new group was added out of order
+                for index,iid in enumerate(wanted):
+                    tree.move(iid,field,index)
+
     def copy_lines_to_clipboard(self,lines:list[str]):
         """ Copy lines of text to the clipboard
             lines:list[str] - a list of strings to copy to the clipboard."""